@@ -0,0 +1,69 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pathlib import Path
+from radiointerferometry.benchmarks.s3_stand_in import S3StandIn
+from radiointerferometry.datasource import AsyncioDataSource, AsyncS3Client, InputS3
+
+MB = 1024 * 1024
+
+
+def run(num_objects, object_size, latency, concurrencies, range_size):
+    root = Path(tempfile.mkdtemp())
+    try:
+        for i in range(num_objects):
+            path = root / "s3" / "bench" / "partitions" / f"partition_{i}.ms.zip"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(os.urandom(object_size))
+        total_mb = num_objects * object_size / MB
+
+        with S3StandIn(root / "s3", latency=latency) as server:
+            print(
+                f"{num_objects} x {object_size / MB:.1f} MB, "
+                f"{latency * 1000:.0f} ms per request, {range_size / MB:.1f} MB ranges"
+            )
+            for concurrency in concurrencies:
+                data_source = AsyncioDataSource(
+                    client=AsyncS3Client(server.endpoint, max_connections=concurrency),
+                    max_concurrency=concurrency,
+                    range_size=range_size,
+                )
+                target = root / f"download_{concurrency}"
+                requests_before = server.requests
+                start = time.time()
+                data_source.download(InputS3(bucket="bench", key="partitions/"), target)
+                elapsed = time.time() - start
+                data_source.close()
+                shutil.rmtree(target)
+                print(
+                    f"concurrency={concurrency:4d}: {elapsed:.2f}s, "
+                    f"{total_mb / elapsed:.2f} MB/s, "
+                    f"{server.requests - requests_before} requests"
+                )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Request concurrency vs throughput of AsyncioDataSource.download"
+    )
+    parser.add_argument("--objects", type=int, default=32)
+    parser.add_argument("--object-size-mb", type=float, default=8)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 128, 256]
+    )
+    parser.add_argument("--range-size-mb", type=float, default=1)
+    args = parser.parse_args()
+
+    run(
+        args.objects,
+        int(args.object_size_mb * MB),
+        args.latency_ms / 1000,
+        args.concurrency,
+        int(args.range_size_mb * MB),
+    )
@@ -0,0 +1,95 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from pathlib import Path
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, InputS3
+
+MB = 1024 * 1024
+
+
+class LatencyStorage:
+    """Local S3 stand-in: lithops localhost storage plus a fixed per-request latency."""
+
+    def __init__(self, storage, latency):
+        self.storage = storage
+        self.latency = latency
+
+    def get_object(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.storage.get_object(*args, **kwargs)
+
+    def download_file(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.storage.download_file(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+
+def sequential_download(storage, bucket, prefix, base_path):
+    """The previous LithopsDataSource.download loop: one download_file per key."""
+    for key in storage.list_keys(bucket, prefix=prefix):
+        local_path = base_path / bucket / key
+        os.makedirs(local_path.parent, exist_ok=True)
+        storage.download_file(bucket, key, str(local_path))
+
+
+def run(num_objects, object_size, latency, workers, range_size):
+    storage = LatencyStorage(Storage(backend="localhost"), latency)
+    bucket = f"bench-{uuid.uuid4().hex[:8]}"
+    prefix = "partitions/"
+    payload = os.urandom(object_size)
+    for i in range(num_objects):
+        storage.put_object(bucket, f"{prefix}partition_{i}.ms.zip", payload)
+    total_mb = num_objects * object_size / MB
+
+    base_path = Path(tempfile.mkdtemp())
+    try:
+        start = time.time()
+        sequential_download(storage, bucket, prefix, base_path / "sequential")
+        elapsed = time.time() - start
+        print(
+            f"sequential: {elapsed:.2f}s, {total_mb / elapsed:.2f} MB/s "
+            f"({num_objects} x {object_size / MB:.1f} MB)"
+        )
+
+        for max_workers in workers:
+            data_source = LithopsDataSource(
+                storage=storage, max_workers=max_workers, range_size=range_size
+            )
+            target = base_path / f"concurrent_{max_workers}"
+            start = time.time()
+            data_source.download(InputS3(bucket=bucket, key=prefix), target)
+            elapsed = time.time() - start
+            print(
+                f"concurrent workers={max_workers}: {elapsed:.2f}s, "
+                f"{total_mb / elapsed:.2f} MB/s"
+            )
+    finally:
+        shutil.rmtree(base_path, ignore_errors=True)
+        storage.delete_objects(bucket, storage.list_keys(bucket, prefix=prefix))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sequential vs concurrent LithopsDataSource.download"
+    )
+    parser.add_argument("--objects", type=int, default=32)
+    parser.add_argument("--object-size-mb", type=float, default=8)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16, 32])
+    parser.add_argument("--range-size-mb", type=float, default=2)
+    args = parser.parse_args()
+
+    run(
+        args.objects,
+        int(args.object_size_mb * MB),
+        args.latency_ms / 1000,
+        args.workers,
+        int(args.range_size_mb * MB),
+    )
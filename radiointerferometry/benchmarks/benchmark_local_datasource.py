@@ -0,0 +1,89 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from pathlib import Path
+from lithops import Storage
+from radiointerferometry.datasource import (
+    LithopsDataSource,
+    LocalDataSource,
+    InputS3,
+    OutputS3,
+)
+
+MB = 1024 * 1024
+
+
+def make_ms(path, num_files, file_size):
+    """A directory shaped like a measurement set: a few large column files."""
+    os.makedirs(path, exist_ok=True)
+    (path / "table.dat").write_bytes(os.urandom(4096))
+    for i in range(num_files):
+        (path / f"table.f{i}").write_bytes(os.urandom(file_size))
+    return path
+
+
+def round_trip(data_source, ms, bucket, base_path):
+    """Publish ms as a partition, then stage it back the way a step does."""
+    start = time.time()
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="partitions"))
+    upload_time = time.time() - start
+
+    start = time.time()
+    data_source.extract_zip(
+        InputS3(bucket=bucket, key=f"partitions/{ms.name}.zip"), base_path
+    )
+    stage_time = time.time() - start
+    return upload_time, stage_time
+
+
+def run(num_files, file_size, shared_dir):
+    base_path = Path(tempfile.mkdtemp(dir=shared_dir))
+    ms = make_ms(base_path / "work" / "partition_0.ms", num_files, file_size)
+    total_mb = (num_files * file_size + 4096) / MB
+    print(f"partition of {num_files} x {file_size / MB:.1f} MB files on {base_path}")
+
+    storage = Storage(backend="localhost")
+    bucket = f"bench-{uuid.uuid4().hex[:8]}"
+    try:
+        backends = [("s3 (lithops localhost)", LithopsDataSource(storage=storage))]
+        for link_mode in ("copy", "reflink", "hardlink"):
+            backends.append(
+                (
+                    f"local {link_mode}",
+                    LocalDataSource(base_path / f"shared_{link_mode}", link_mode),
+                )
+            )
+
+        for name, data_source in backends:
+            target = base_path / f"stage_{name.split()[-1]}"
+            upload_time, stage_time = round_trip(data_source, ms, bucket, target)
+            counters = data_source.last_transfer_counters or {}
+            print(
+                f"{name:24s} publish {upload_time:.2f}s "
+                f"({total_mb / max(upload_time, 1e-6):.0f} MB/s), "
+                f"stage {stage_time:.2f}s ({total_mb / max(stage_time, 1e-6):.0f} MB/s) "
+                f"{counters}"
+            )
+    finally:
+        shutil.rmtree(base_path, ignore_errors=True)
+        storage.delete_objects(bucket, storage.list_keys(bucket))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="LocalDataSource staging vs the S3 zip/unzip path"
+    )
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--file-size-mb", type=float, default=32)
+    parser.add_argument(
+        "--shared-dir",
+        default=None,
+        help="Directory on the filesystem to benchmark (defaults to the temp dir)",
+    )
+    args = parser.parse_args()
+
+    run(args.files, int(args.file_size_mb * MB), args.shared_dir)
@@ -0,0 +1,68 @@
+import argparse
+import json
+import time
+
+from radiointerferometry.datasource import InputS3, OutputS3, create_datasource
+from radiointerferometry.partitioning import PartitionManifest, StaticPartitioner
+from radiointerferometry.partitioning.static_partition import EXECUTORS
+from radiointerferometry.utils import get_available_cpus
+
+MB = 1024 * 1024
+
+
+def run(bucket, msin, msout, num_partitions, executors, datasource_config):
+    """Partitions the same inputs once per executor and compares throughput.
+
+    Every run writes under its own output prefix, so a manifest published
+    by one mode is never mistaken for the other's.
+    """
+    data_source = create_datasource(datasource_config)
+    print(
+        f"{num_partitions} partitions of {bucket}/{msin}, "
+        f"{get_available_cpus()} CPUs available"
+    )
+    for executor in executors:
+        partitioner = StaticPartitioner(
+            log_level="WARNING", datasource_config=datasource_config
+        )
+        start = time.time()
+        result = partitioner.partition_ms(
+            InputS3(bucket=bucket, key=msin),
+            num_partitions,
+            OutputS3(bucket=bucket, key=f"{msout.rstrip('/')}/{executor}/"),
+            executor=executor,
+        )
+        elapsed = time.time() - start
+        manifest = PartitionManifest.load(data_source.storage, bucket, result.key)
+        total_mb = manifest.total_size / MB
+        print(
+            f"{executor:>8}: {elapsed:.2f}s, {total_mb:.2f} MB of partitions, "
+            f"{total_mb / elapsed:.2f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Thread vs process partition creation in StaticPartitioner"
+    )
+    parser.add_argument("--bucket", required=True)
+    parser.add_argument("--msin", required=True, help="prefix of the input MSs")
+    parser.add_argument("--msout", default="benchmarks/partition_executor/")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--executor", nargs="+", default=list(EXECUTORS))
+    parser.add_argument(
+        "--datasource",
+        type=json.loads,
+        default=None,
+        help='datasource config as JSON, e.g. {"backend": "local", "root": "/data"}',
+    )
+    args = parser.parse_args()
+
+    run(
+        args.bucket,
+        args.msin,
+        args.msout,
+        args.partitions,
+        args.executor,
+        args.datasource,
+    )
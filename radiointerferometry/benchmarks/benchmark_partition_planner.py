@@ -0,0 +1,78 @@
+import argparse
+import time
+import numpy as np
+
+from radiointerferometry.partitioning.planner import (
+    InputTimes,
+    is_time_sorted,
+    partition_boundaries,
+    plan_partitions,
+)
+
+GB = 1024**3
+
+
+def make_inputs(num_inputs, timesteps, baselines, offset):
+    """Time-ordered subbands sharing one timeline, each starting offset steps later."""
+    inputs = []
+    for i in range(num_inputs):
+        steps = np.arange(timesteps, dtype=np.float64) * 10.0 + i * offset * 10.0
+        times = np.repeat(4.9e9 + steps, baselines)
+        inputs.append(InputTimes(f"SB{i:03d}.MS", len(times), 20, times))
+    return inputs
+
+
+def run(num_inputs, timesteps, baselines, offset, num_partitions, row_bytes):
+    inputs = make_inputs(num_inputs, timesteps, baselines, offset)
+    rows = sum(i.nrows for i in inputs)
+    print(
+        f"{num_inputs} inputs x {timesteps} timesteps x {baselines} baselines: "
+        f"{rows} rows, ~{rows * row_bytes / GB:.1f} GB of MS at {row_bytes} B/row"
+    )
+
+    start = time.time()
+    order = np.argsort(np.concatenate([i.times for i in inputs]), kind="stable")
+    sort_elapsed = time.time() - start
+    del order
+    print(f"argsort of the concatenated TIME column: {sort_elapsed:.2f}s")
+
+    start = time.time()
+    assert all(is_time_sorted(i.times) for i in inputs)
+    partitions = plan_partitions(inputs, partition_boundaries(inputs, num_partitions))
+    merge_elapsed = time.time() - start
+    assert partitions[-1].end_row == rows
+    print(
+        f"monotonicity check + merge planner: {merge_elapsed:.2f}s "
+        f"({sort_elapsed / merge_elapsed:.1f}x), {len(partitions)} partitions"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sort-based vs merge-based planning of TIME partitions"
+    )
+    parser.add_argument("--inputs", type=int, default=16)
+    parser.add_argument("--timesteps", type=int, default=2000)
+    parser.add_argument("--baselines", type=int, default=1000)
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="timesteps between the starts of consecutive inputs",
+    )
+    parser.add_argument("--partitions", type=int, default=32)
+    parser.add_argument(
+        "--row-bytes",
+        type=int,
+        default=12800,
+        help="MS bytes per row the TIME arrays stand for (DATA, FLAG, WEIGHT)",
+    )
+    args = parser.parse_args()
+    run(
+        args.inputs,
+        args.timesteps,
+        args.baselines,
+        args.offset,
+        args.partitions,
+        args.row_bytes,
+    )
@@ -0,0 +1,195 @@
+import os
+import uuid
+import time
+import asyncio
+import hashlib
+import threading
+
+from pathlib import Path
+from xml.sax.saxutils import escape
+from aiohttp import web
+
+
+class S3StandIn:
+    """Minimal S3-compatible HTTP server over a local directory.
+
+    Serves path-style GET (with Range), HEAD, PUT, DELETE, ListObjectsV2 and
+    multipart uploads, without authentication. An optional per-request
+    latency emulates the round trip to a remote object store.
+    """
+
+    def __init__(self, root: Path, latency: float = 0.0, host: str = "127.0.0.1"):
+        self.root = Path(root)
+        self.latency = latency
+        self.host = host
+        self.requests = 0
+        self.endpoint = None
+        self._uploads = {}
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+    def start(self) -> str:
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_server())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.endpoint
+
+    def stop(self):
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    async def _start_server(self):
+        app = web.Application(client_max_size=1024**3)
+        app.router.add_route("GET", "/{bucket}", self._list_objects)
+        app.router.add_route("*", "/{bucket}/{key:.+}", self._object)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.endpoint = f"http://{self.host}:{port}"
+
+    def _path(self, bucket, key) -> Path:
+        return self.root / bucket / key
+
+    @staticmethod
+    def _etag(path: Path) -> str:
+        etag_path = path.with_name(path.name + ".etag")
+        if etag_path.exists():
+            return etag_path.read_text()
+        return f'"{hashlib.md5(path.read_bytes()).hexdigest()}"'
+
+    def _write(self, path: Path, data: bytes, etag: str = None):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        etag = etag or f'"{hashlib.md5(data).hexdigest()}"'
+        path.with_name(path.name + ".etag").write_text(etag)
+        return etag
+
+    async def _delay(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _list_objects(self, request):
+        await self._delay()
+        bucket = request.match_info["bucket"]
+        prefix = request.query.get("prefix", "")
+        max_keys = int(request.query.get("max-keys", 1000))
+        token = request.query.get("continuation-token", "")
+        base = self.root / bucket
+        keys = sorted(
+            str(path.relative_to(base))
+            for path in base.rglob("*")
+            if path.is_file() and not path.name.endswith(".etag")
+        )
+        keys = [key for key in keys if key.startswith(prefix) and key > token]
+        page, truncated = keys[:max_keys], len(keys) > max_keys
+
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<Size>{(base / key).stat().st_size}</Size>"
+            f"<ETag>{escape(self._etag(base / key))}</ETag></Contents>"
+            for key in page
+        )
+        next_token = (
+            f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>"
+            if truncated
+            else ""
+        )
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"<KeyCount>{len(page)}</KeyCount>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+            f"{next_token}{contents}</ListBucketResult>"
+        )
+        return web.Response(body=body.encode(), content_type="application/xml")
+
+    async def _object(self, request):
+        await self._delay()
+        bucket = request.match_info["bucket"]
+        key = request.match_info["key"]
+        path = self._path(bucket, key)
+        query = request.query
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self._uploads[upload_id] = {}
+            body = (
+                "<InitiateMultipartUploadResult>"
+                f"<Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            )
+            return web.Response(body=body.encode(), content_type="application/xml")
+
+        if request.method == "PUT" and "uploadId" in query:
+            data = await request.read()
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            self._uploads[query["uploadId"]][int(query["partNumber"])] = data
+            return web.Response(headers={"ETag": etag})
+
+        if request.method == "POST" and "uploadId" in query:
+            parts = self._uploads.pop(query["uploadId"])
+            await request.read()
+            data = b"".join(parts[number] for number in sorted(parts))
+            etag = self._write(path, data, f'"{uuid.uuid4().hex}-{len(parts)}"')
+            body = (
+                "<CompleteMultipartUploadResult>"
+                f"<Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag>"
+                "</CompleteMultipartUploadResult>"
+            )
+            return web.Response(body=body.encode(), content_type="application/xml")
+
+        if request.method == "DELETE" and "uploadId" in query:
+            self._uploads.pop(query["uploadId"], None)
+            return web.Response(status=204)
+
+        if request.method == "PUT":
+            etag = self._write(path, await request.read())
+            return web.Response(headers={"ETag": etag})
+
+        if request.method == "DELETE":
+            path.unlink(missing_ok=True)
+            path.with_name(path.name + ".etag").unlink(missing_ok=True)
+            return web.Response(status=204)
+
+        if not path.is_file():
+            return web.Response(
+                status=404, body=b"<Error><Code>NoSuchKey</Code></Error>"
+            )
+
+        size = path.stat().st_size
+        headers = {"ETag": self._etag(path), "Last-Modified": time.ctime()}
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(size)
+            return web.Response(headers=headers)
+
+        start, end, status = 0, size - 1, 200
+        if "Range" in request.headers:
+            first, last = request.headers["Range"].replace("bytes=", "").split("-")
+            start, end, status = int(first), min(int(last), size - 1), 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        with open(path, "rb") as f:
+            data = os.pread(f.fileno(), end - start + 1, start)
+        return web.Response(status=status, body=data, headers=headers)
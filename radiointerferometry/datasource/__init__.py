@@ -1,2 +1,7 @@
-from .datasource import DataSource, InputS3, OutputS3, LocalPath
+from .datasource import DataSource, InputS3, OutputS3, LocalPath, ObjectMetadata
 from .lithops_datasource import LithopsDataSource, s3_to_local_path, local_path_to_s3
+from .cache import DownloadCache
+from .async_datasource import AsyncioDataSource, AsyncS3Client
+from .local_datasource import LocalDataSource
+from .factory import create_datasource
+from .scheduler import RequestScheduler, request_scheduler
@@ -0,0 +1,469 @@
+import os
+import io
+import time
+import asyncio
+import logging
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+import aiohttp
+from yarl import URL
+from lithops import Storage
+from lithops.storage.utils import StorageNoSuchKeyError
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from .datasource import DataSource
+from .cache import object_etag
+from .codecs import StoredCodec, detect_codec
+from .remote_zip import extract_remote_zip
+from .lithops_datasource import s3_to_local_path, output_key
+from radiointerferometry.datasource import InputS3, OutputS3, ObjectMetadata
+
+KB = 1024
+MB = KB * KB
+
+DEFAULT_MAX_CONCURRENCY = 128
+DEFAULT_RANGE_SIZE = 16 * MB
+DEFAULT_PART_SIZE = 32 * MB
+# Parts are read into memory, so uploads keep far fewer requests in flight.
+DEFAULT_UPLOAD_CONCURRENCY = 8
+STREAM_BUFFER_SIZE = 1 * MB
+
+S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+class S3RequestError(IOError):
+    def __init__(self, method: str, url: str, status: int, body: str):
+        super().__init__(f"{method} {url} failed with HTTP {status}: {body[:200]}")
+        self.status = status
+
+
+def s3_connection_config(storage_config: dict) -> dict:
+    """Endpoint and credentials of an S3-compatible lithops storage backend."""
+    backend = storage_config["backend"]
+    config = storage_config[backend]
+    region = config.get("region", "us-east-1")
+    return {
+        "endpoint": config.get("endpoint", f"https://s3.{region}.amazonaws.com"),
+        "access_key_id": config.get("access_key_id"),
+        "secret_access_key": config.get("secret_access_key"),
+        "session_token": config.get("session_token"),
+        "region": region,
+    }
+
+
+class AsyncS3Client:
+    """Path-style S3 REST client on one pooled aiohttp session."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key_id: str = None,
+        secret_access_key: str = None,
+        session_token: str = None,
+        region: str = "us-east-1",
+        max_connections: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.region = region
+        self.max_connections = max_connections
+        self.credentials = (
+            Credentials(access_key_id, secret_access_key, session_token)
+            if access_key_id
+            else None
+        )
+        self._session = None
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    def _url(self, bucket: str, key: str = "", params: dict = None) -> str:
+        url = f"{self.endpoint}/{bucket}"
+        if key:
+            url += "/" + urllib.parse.quote(key, safe="/~")
+        if params:
+            url += "?" + urllib.parse.urlencode(
+                sorted(params.items()), quote_via=urllib.parse.quote
+            )
+        return url
+
+    def _sign(self, method: str, url: str, headers: dict, body: bytes) -> dict:
+        if self.credentials is None:
+            return headers
+        request = AWSRequest(method=method, url=url, headers=headers, data=body)
+        S3SigV4Auth(self.credentials, "s3", self.region).add_auth(request)
+        return dict(request.headers.items())
+
+    async def request(
+        self,
+        method: str,
+        bucket: str,
+        key: str = "",
+        params: dict = None,
+        headers: dict = None,
+        body: bytes = b"",
+    ) -> aiohttp.ClientResponse:
+        """Send a signed request; the caller releases the response."""
+        url = self._url(bucket, key, params)
+        headers = self._sign(method, url, dict(headers or {}), body)
+        response = await self.session().request(
+            method, URL(url, encoded=True), headers=headers, data=body or None
+        )
+        if response.status >= 300:
+            text = await response.text()
+            response.release()
+            raise S3RequestError(method, url, response.status, text)
+        return response
+
+    async def head_object(self, bucket: str, key: str) -> dict:
+        response = await self.request("HEAD", bucket, key)
+        response.release()
+        return {name.lower(): value for name, value in response.headers.items()}
+
+    async def list_objects(self, bucket: str, prefix: str = "") -> list:
+        """All objects under prefix as {Key, Size, ETag}, following pagination."""
+        objects = []
+        params = {"list-type": "2", "prefix": prefix}
+        while True:
+            response = await self.request("GET", bucket, params=params)
+            root = ET.fromstring(await response.read())
+            for item in root.iter(f"{S3_NAMESPACE}Contents"):
+                objects.append(
+                    {
+                        "Key": item.findtext(f"{S3_NAMESPACE}Key"),
+                        "Size": int(item.findtext(f"{S3_NAMESPACE}Size")),
+                        "ETag": item.findtext(f"{S3_NAMESPACE}ETag"),
+                    }
+                )
+            if root.findtext(f"{S3_NAMESPACE}IsTruncated") != "true":
+                return objects
+            params["continuation-token"] = root.findtext(
+                f"{S3_NAMESPACE}NextContinuationToken"
+            )
+
+    async def get_range_into(
+        self, bucket: str, key: str, fd: int, offset: int, length: int, ranged: bool
+    ) -> int:
+        """Stream bytes [offset, offset + length) of an object to the same offset of fd."""
+        headers = {"Range": f"bytes={offset}-{offset + length - 1}"} if ranged else {}
+        response = await self.request("GET", bucket, key, headers=headers)
+        position = offset
+        try:
+            async for chunk in response.content.iter_chunked(STREAM_BUFFER_SIZE):
+                os.pwrite(fd, chunk, position)
+                position += len(chunk)
+        finally:
+            response.release()
+        return position - offset
+
+    async def get_object(self, bucket: str, key: str, headers: dict = None) -> bytes:
+        response = await self.request("GET", bucket, key, headers=headers)
+        try:
+            return await response.read()
+        finally:
+            response.release()
+
+    async def put_object(self, bucket: str, key: str, body: bytes):
+        response = await self.request("PUT", bucket, key, body=body)
+        response.release()
+
+    async def create_multipart_upload(self, bucket: str, key: str) -> str:
+        response = await self.request("POST", bucket, key, params={"uploads": ""})
+        root = ET.fromstring(await response.read())
+        return root.findtext(f"{S3_NAMESPACE}UploadId") or root.findtext("UploadId")
+
+    async def upload_part(
+        self, bucket: str, key: str, upload_id: str, part_number: int, body: bytes
+    ) -> str:
+        params = {"partNumber": str(part_number), "uploadId": upload_id}
+        response = await self.request("PUT", bucket, key, params=params, body=body)
+        response.release()
+        return response.headers["ETag"]
+
+    async def complete_multipart_upload(
+        self, bucket: str, key: str, upload_id: str, etags: list
+    ):
+        parts = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in enumerate(etags, start=1)
+        )
+        body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode()
+        response = await self.request(
+            "POST", bucket, key, params={"uploadId": upload_id}, body=body
+        )
+        response.release()
+
+    async def abort_multipart_upload(self, bucket: str, key: str, upload_id: str):
+        response = await self.request(
+            "DELETE", bucket, key, params={"uploadId": upload_id}
+        )
+        response.release()
+
+
+class AsyncioStorage:
+    """Blocking object-style access (get/put/head_object) through an AsyncioDataSource.
+
+    Partition manifests and range-read archives use it like a lithops Storage.
+    """
+
+    def __init__(self, data_source: "AsyncioDataSource"):
+        self.data_source = data_source
+
+    def _run(self, bucket: str, key: str, coroutine):
+        try:
+            return self.data_source._run(coroutine)
+        except S3RequestError as e:
+            if e.status == 404:
+                raise StorageNoSuchKeyError(bucket, key) from e
+            raise
+
+    def get_object(
+        self, bucket: str, key: str, stream: bool = False, extra_get_args: dict = None
+    ):
+        client = self.data_source.client
+        data = self._run(bucket, key, client.get_object(bucket, key, extra_get_args))
+        return io.BytesIO(data) if stream else data
+
+    def put_object(self, bucket: str, key: str, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        client = self.data_source.client
+        self._run(bucket, key, client.put_object(bucket, key, body))
+
+    def head_object(self, bucket: str, key: str) -> dict:
+        client = self.data_source.client
+        return self._run(bucket, key, client.head_object(bucket, key))
+
+
+class AsyncioDataSource(DataSource):
+    """DataSource on asyncio, keeping up to max_concurrency requests in flight.
+
+    The *_async coroutines can be awaited directly. The synchronous DataSource
+    methods run them on a private event loop thread, which also keeps the
+    connection pool warm between calls, so steps can use this backend like
+    LithopsDataSource.
+    """
+
+    def __init__(
+        self,
+        client: AsyncS3Client = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        range_size: int = DEFAULT_RANGE_SIZE,
+        part_size: int = DEFAULT_PART_SIZE,
+        upload_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+    ):
+        super().__init__()
+        if client is None:
+            client = AsyncS3Client(
+                **s3_connection_config(Storage().get_storage_config()),
+                max_connections=max_concurrency,
+            )
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.range_size = range_size
+        self.part_size = part_size
+        self.upload_concurrency = upload_concurrency
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.storage = AsyncioStorage(self)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        self._run(self.client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def exists(self, path: OutputS3) -> bool:
+        return self._run(self.exists_async(path))
+
+    def list_metadata(self, bucket: str, prefix: str = "") -> List[ObjectMetadata]:
+        """Key, size and ETag of every object under prefix from one paginated listing."""
+        return [
+            ObjectMetadata(key=obj["Key"], size=obj["Size"], etag=object_etag(obj))
+            for obj in self._run(self.client.list_objects(bucket, prefix))
+            if not obj["Key"].endswith("/")
+        ]
+
+    def download_file(self, read_path: InputS3, base_path: Path = Path("/tmp")):
+        return self._run(self.download_file_async(read_path, base_path))
+
+    def download(self, read_path: InputS3, base_path: Path = Path("/tmp")):
+        return self._run(self.download_async(read_path, base_path))
+
+    def upload(self, local_path: Path, output_s3: OutputS3):
+        return self._run(self.upload_async(local_path, output_s3))
+
+    def extract_zip(
+        self,
+        read_path: InputS3,
+        base_path: Path = Path("/tmp"),
+        member_filter: Optional[Callable[[str], bool]] = None,
+    ) -> Path:
+        """Download a zipped MS and extract it, like download + unzip.
+
+        With a member_filter, only the selected members of a STORED archive
+        are range-read, as LithopsDataSource.extract_zip does.
+        """
+        if member_filter is None:
+            return self.unzip(self.download_file(read_path, base_path))
+
+        header = self.storage.get_object(
+            read_path.bucket, read_path.key, extra_get_args={"Range": "bytes=0-3"}
+        )
+        codec = detect_codec(header)
+        if codec is not None and codec.name != StoredCodec.name:
+            # Compressed archives have no member offsets to range-read.
+            return self.unzip(self.download_file(read_path, base_path))
+
+        local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
+        os.makedirs(local_path.parent, exist_ok=True)
+        self.last_transfer_bytes = extract_remote_zip(
+            self.storage,
+            read_path.bucket,
+            read_path.key,
+            local_path.parent,
+            member_filter=member_filter,
+            batch_size=self.range_size,
+        )
+        return local_path.parent / local_path.stem
+
+    def upload_zipped(self, ms, output_s3: OutputS3):
+        zip_filepath = self.zip_without_compression(ms)
+        self.upload(zip_filepath, output_s3)
+        os.remove(zip_filepath)
+
+    async def exists_async(self, path: OutputS3) -> bool:
+        """Check if a file exists in an S3 bucket."""
+        return len(await self.client.list_objects(path.bucket, path.key)) > 0
+
+    async def download_file_async(
+        self, read_path: InputS3, base_path: Path = Path("/tmp")
+    ) -> Path:
+        local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
+        headers = await self.client.head_object(read_path.bucket, read_path.key)
+        size = int(headers["content-length"])
+        self.last_transfer_bytes = await self._download_objects(
+            read_path.bucket, [(read_path.key, size, local_path)]
+        )
+        return local_path
+
+    async def download_async(
+        self, read_path: InputS3, base_path: Path = Path("/tmp")
+    ) -> Path:
+        """Download from S3 and returns the local path."""
+        objects = await self.client.list_objects(read_path.bucket, read_path.key)
+        pending = []
+        for obj in objects:
+            if obj["Key"].endswith("/"):
+                continue
+            s3_file_path = InputS3(bucket=read_path.bucket, key=obj["Key"])
+            local_path = s3_to_local_path(s3_file_path, base_local_dir=str(base_path))
+            pending.append((obj["Key"], obj["Size"], local_path))
+
+        start_time = time.time()
+        total_bytes = await self._download_objects(read_path.bucket, pending)
+        elapsed = time.time() - start_time
+        self.last_transfer_bytes = total_bytes
+        if elapsed > 0 and total_bytes:
+            logging.info(
+                f"Downloaded {len(pending)} objects ({total_bytes / MB:.2f} MB) "
+                f"at {total_bytes / MB / elapsed:.2f} MB/s "
+                f"with {self.max_concurrency} concurrent requests"
+            )
+        return s3_to_local_path(read_path, base_local_dir=str(base_path))
+
+    async def _download_objects(self, bucket: str, objects: list) -> int:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(key, part_path, offset, length, size):
+            async with semaphore:
+                fd = os.open(part_path, os.O_WRONLY)
+                try:
+                    received = await self.client.get_range_into(
+                        bucket, key, fd, offset, length, ranged=length < size
+                    )
+                finally:
+                    os.close(fd)
+            if received != length:
+                raise IOError(
+                    f"Short read for {bucket}/{key} at offset {offset}: "
+                    f"expected {length} bytes, got {received}"
+                )
+
+        requests = []
+        for key, size, local_path in objects:
+            os.makedirs(local_path.parent, exist_ok=True)
+            part_path = local_path.with_name(local_path.name + ".part")
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            for offset in range(0, size, self.range_size):
+                length = min(self.range_size, size - offset)
+                requests.append(fetch(key, part_path, offset, length, size))
+
+        try:
+            await asyncio.gather(*requests)
+        except Exception:
+            for _, _, local_path in objects:
+                local_path.with_name(local_path.name + ".part").unlink(missing_ok=True)
+            raise
+
+        for _, _, local_path in objects:
+            os.replace(local_path.with_name(local_path.name + ".part"), local_path)
+        return sum(size for _, size, _ in objects)
+
+    async def upload_async(self, local_path: Path, output_s3: OutputS3):
+        """Uploads a single file, in concurrent parts when it is larger than part_size."""
+        if not os.path.isfile(local_path):
+            raise ValueError(f"The path {local_path} is not a file.")
+        bucket = output_s3.bucket
+        key = output_key(local_path.name, output_s3)
+        file_size = os.path.getsize(local_path)
+
+        with open(local_path, "rb") as f:
+            if file_size <= self.part_size:
+                await self.client.put_object(bucket, key, f.read())
+            else:
+                await self._multipart_upload(bucket, key, f.fileno(), file_size)
+        self.last_transfer_bytes = file_size
+
+    async def _multipart_upload(self, bucket: str, key: str, fd: int, file_size: int):
+        upload_id = await self.client.create_multipart_upload(bucket, key)
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+
+        async def send(part_number, offset):
+            async with semaphore:
+                data = os.pread(fd, self.part_size, offset)
+                return await self.client.upload_part(
+                    bucket, key, upload_id, part_number, data
+                )
+
+        try:
+            etags = await asyncio.gather(
+                *(
+                    send(part_number, offset)
+                    for part_number, offset in enumerate(
+                        range(0, file_size, self.part_size), start=1
+                    )
+                )
+            )
+            await self.client.complete_multipart_upload(bucket, key, upload_id, etags)
+        except Exception as e:
+            logging.error(f"Multipart upload of {bucket}/{key} failed, aborting: {e}")
+            await self.client.abort_multipart_upload(bucket, key, upload_id)
+            raise
@@ -0,0 +1,123 @@
+import os
+import hashlib
+import logging
+
+from .datasource import clone_file, copy_range
+from pathlib import Path
+
+GB = 1024**3
+
+DEFAULT_CACHE_SIZE = 2 * GB
+
+
+def object_etag(metadata: dict) -> str:
+    """ETag of an object from a listing entry or head_object headers.
+
+    Backends that do not report ETags (e.g. lithops localhost) fall back to
+    the object size, which only detects changes in length.
+    """
+    for name in ("ETag", "etag"):
+        if metadata.get(name):
+            return metadata[name].strip('"')
+    return f"size-{metadata.get('Size', metadata.get('content-length'))}"
+
+
+class DownloadCache:
+    """Worker-local cache of downloaded objects, keyed by bucket/key/ETag.
+
+    Entries are plain files named after the hash of bucket/key/ETag, so a new
+    ETag never returns stale data. The mtime of an entry is its last use and
+    the oldest entries are evicted once the cache exceeds max_bytes. Files are
+    reflinked in and out of the cache where the filesystem supports it and
+    copied otherwise. They are never hardlinked: steps update their inputs in
+    place, which would corrupt a shared inode.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, bucket: str, key: str, etag: str) -> Path:
+        digest = hashlib.sha256(f"{bucket}/{key}/{etag}".encode("utf-8")).hexdigest()
+        return self.cache_dir / digest
+
+    def fetch(self, bucket: str, key: str, etag: str, local_path: Path) -> bool:
+        """Materialize a cached object at local_path. Returns False on a miss."""
+        entry = self.entry_path(bucket, key, etag)
+        try:
+            os.utime(entry)
+            size = entry.stat().st_size
+            self._materialize(entry, local_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        self.bytes_saved += size
+        logging.debug(f"Cache hit for {bucket}/{key} ({etag})")
+        return True
+
+    def store(self, bucket: str, key: str, etag: str, local_path: Path):
+        """Add a freshly downloaded file to the cache and enforce the budget."""
+        size = os.path.getsize(local_path)
+        if size > self.max_bytes:
+            return
+        entry = self.entry_path(bucket, key, etag)
+        tmp_entry = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        clone_or_copy(local_path, tmp_entry)
+        os.replace(tmp_entry, entry)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if entry.suffix == ".tmp":
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+            logging.debug(f"Evicted {entry} ({size} bytes) from download cache")
+
+    def counters(self, since: dict = None) -> dict:
+        """Hit/miss/bytes-saved counters, optionally relative to an earlier snapshot."""
+        counters = {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_bytes_saved": self.bytes_saved,
+            "cache_evictions": self.evictions,
+        }
+        if since:
+            counters = {name: value - since[name] for name, value in counters.items()}
+        return counters
+
+    def _materialize(self, entry: Path, local_path: Path):
+        os.makedirs(local_path.parent, exist_ok=True)
+        tmp_path = local_path.with_name(local_path.name + ".part")
+        tmp_path.unlink(missing_ok=True)
+        clone_or_copy(entry, tmp_path)
+        os.replace(tmp_path, local_path)
+
+
+def clone_or_copy(source: Path, target: Path):
+    """Writes an independent copy of source at target, reflinked when possible."""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            clone_file(src.fileno(), dst.fileno())
+        except OSError:
+            copy_range(src.fileno(), dst.fileno(), 0, os.fstat(src.fileno()).st_size)
@@ -0,0 +1,228 @@
+import os
+import time
+import shutil
+import lz4.frame
+import zstandard
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+MB = 1024 * 1024
+STREAM_BUFFER_SIZE = 1 * MB
+# Bytes read from the largest files of a directory to estimate compressibility.
+SAMPLE_SIZE = 4 * MB
+SAMPLE_FILES = 4
+# S3 user metadata (x-amz-meta-codec) recording the codec of an archive.
+CODEC_METADATA_KEY = "codec"
+
+
+class ArchiveCodec(ABC):
+    """Stream codec applied on top of a STORED zip archive.
+
+    The STORED zip stays the unit of packing; a codec compresses the whole
+    archive stream. Every codec writes a format with its own magic number,
+    so readers detect the codec from the first bytes of the object.
+    """
+
+    name = None
+    magic = None
+
+    @abstractmethod
+    def writer(self, stream, threads: int = 1):
+        """Wraps stream; closing the wrapper ends the frame, not the stream."""
+        pass
+
+    @abstractmethod
+    def reader(self, stream):
+        pass
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+
+class UnclosedStream:
+    """Passes reads and writes through to stream but leaves it open on close."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+    def write(self, data) -> int:
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class StoredCodec(ArchiveCodec):
+    name = "stored"
+    magic = b"PK\x03\x04"
+
+    def writer(self, stream, threads: int = 1):
+        return UnclosedStream(stream)
+
+    def reader(self, stream):
+        return UnclosedStream(stream)
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZstdCodec(ArchiveCodec):
+    name = "zstd"
+    magic = b"\x28\xb5\x2f\xfd"
+
+    def __init__(self, level: int = 1):
+        self.level = level
+
+    def writer(self, stream, threads: int = 1):
+        compressor = zstandard.ZstdCompressor(
+            level=self.level, threads=threads if threads > 1 else 0
+        )
+        return compressor.stream_writer(stream, closefd=False)
+
+    def reader(self, stream):
+        return zstandard.ZstdDecompressor().stream_reader(stream, closefd=False)
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+
+class Lz4Codec(ArchiveCodec):
+    name = "lz4"
+    magic = b"\x04\x22\x4d\x18"
+
+    def writer(self, stream, threads: int = 1):
+        return lz4.frame.LZ4FrameFile(stream, "wb")
+
+    def reader(self, stream):
+        return lz4.frame.LZ4FrameFile(stream, "rb")
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.frame.compress(data)
+
+
+class ArchiveStream:
+    """Unseekable stream in front of a codec writer.
+
+    tell() counts the uncompressed bytes, which is what zipfile needs for the
+    member offsets it records; codec writers report compressed positions.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.writer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+CODECS = {codec.name: codec for codec in (StoredCodec(), ZstdCodec(), Lz4Codec())}
+
+
+def get_codec(name: str) -> ArchiveCodec:
+    if name not in CODECS:
+        raise ValueError(
+            f"Unknown archive codec {name}, expected one of {list(CODECS)}"
+        )
+    return CODECS[name]
+
+
+def recorded_codec(metadata: dict) -> Optional[ArchiveCodec]:
+    """Codec recorded in the head_object headers of an archive, None if absent."""
+    return CODECS.get(metadata.get(f"x-amz-meta-{CODEC_METADATA_KEY}"))
+
+
+def detect_codec(header: bytes) -> Optional[ArchiveCodec]:
+    """Codec of an archive from its first four bytes, None if unknown."""
+    for codec in CODECS.values():
+        if header[: len(codec.magic)] == codec.magic:
+            return codec
+    return None
+
+
+def decompress_archive(path: Path) -> Optional[str]:
+    """Turns a compressed archive at path into the STORED zip it wraps, in place.
+
+    Returns the name of the codec that was removed, or None if path already
+    is a plain zip (or not an archive this module knows).
+    """
+    with open(path, "rb") as f:
+        codec = detect_codec(f.read(4))
+    if codec is None or codec.name == StoredCodec.name:
+        return None
+
+    tmp_path = path.with_name(path.name + ".decoded")
+    with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(codec.reader(src), dst, STREAM_BUFFER_SIZE)
+    os.replace(tmp_path, path)
+    return codec.name
+
+
+def sample_directory(directory: Path) -> bytes:
+    """Up to SAMPLE_SIZE bytes taken from the largest files of directory.
+
+    Column data dominates an MS, so its largest files are the ones worth
+    sampling.
+    """
+    files = []
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            path = Path(root) / name
+            files.append((path.stat().st_size, path))
+    files.sort(reverse=True)
+    chunks = []
+    per_file = SAMPLE_SIZE // SAMPLE_FILES
+    for _, path in files[:SAMPLE_FILES]:
+        with open(path, "rb") as f:
+            chunks.append(f.read(per_file))
+    return b"".join(chunks)
+
+
+def choose_codec(
+    sample: bytes, network_throughput: Optional[float], cpus: int = 1
+) -> ArchiveCodec:
+    """Picks the codec with the shortest estimated transfer time.
+
+    Compression and upload are pipelined, so the time per input MB is
+    whichever is slower: compressing it (measured on sample, zstd scales
+    with cpus) or sending the compressed bytes at network_throughput MB/s.
+    Without a throughput estimate the archive is stored.
+    """
+    stored = CODECS[StoredCodec.name]
+    if not network_throughput or not sample:
+        return stored
+
+    best, best_cost = stored, 1 / network_throughput
+    for codec in CODECS.values():
+        if codec is stored:
+            continue
+        start = time.perf_counter()
+        compressed = codec.compress(sample)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        speed = len(sample) / MB / elapsed
+        if codec.name == ZstdCodec.name:
+            speed *= cpus
+        ratio = len(compressed) / len(sample)
+        cost = max(1 / speed, ratio / network_throughput)
+        if cost < best_cost:
+            best, best_cost = codec, cost
+    return best
@@ -3,8 +3,23 @@ from pathlib import Path, Path
 from s3path import S3Path
 import zipfile
 import os
+import time
+import fcntl
+import shutil
+import struct
 import logging
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from radiointerferometry.profiling import time_it
+from radiointerferometry.utils import get_available_cpus
+from .remote_zip import member_target
+from .zip_packer import pack_stored_zip
+from .codecs import ArchiveStream, StoredCodec, decompress_archive, get_codec
+
+MB = 1024 * 1024
+STREAM_BUFFER_SIZE = 1 * MB
+# ioctl(2) request that clones a whole file on btrfs, XFS and other CoW filesystems.
+FICLONE = 0x40049409
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -158,10 +173,26 @@ class OutputS3(S3PathBase):
         return f"OutputS3(bucket={self._bucket}, key={self._key}, file_ext={self._file_ext}, file_name={self._file_name}, remote_key_ow={self.remote_ow}, base_local_path={self._base_local_path})"
 
 
+@dataclass(frozen=True)
+class ObjectMetadata:
+    """Key, size in bytes and ETag of an object, as returned by a listing."""
+
+    key: str
+    size: int
+    etag: str
+
+    @property
+    def size_mb(self) -> float:
+        return round(self.size / MB, 2)
+
+
 # Four operations: download file, download directory, upload file, upload directory (Multipart) to interact with pipeline files
 class DataSource(ABC):
     def __init__(self):
         self.timings = []
+        # Bytes and counters of the last download/upload, picked up by time_it.
+        self.last_transfer_bytes = None
+        self.last_transfer_counters = None
 
     @abstractmethod
     def exists(self, path: S3Path) -> bool:
@@ -184,11 +215,16 @@ class DataSource(ABC):
             for key, value in parset_dict.items():
                 f.write(f"{key}={value}\n")
 
-    def zip_without_compression(self, ms: LocalPath) -> LocalPath:
+    def zip_without_compression(
+        self, ms: LocalPath, max_workers: int = None
+    ) -> LocalPath:
         logging.info(f"Starting zipping process for: {ms}")
-        zip_filepath = LocalPath(
-            ms.base_local_path, ms.bucket, ms.key + ".zip", ms.file_ext
-        )
+        if isinstance(ms, LocalPath):
+            zip_filepath = LocalPath(
+                ms.base_local_path, ms.bucket, ms.key + ".zip", ms.file_ext
+            )
+        else:
+            zip_filepath = Path(f"{ms}.zip")
 
         if zip_filepath.exists() and zip_filepath.is_dir():
             logging.error(
@@ -199,12 +235,14 @@ class DataSource(ABC):
             )
 
         if ms.is_dir():
-            with zipfile.ZipFile(zip_filepath, "w", zipfile.ZIP_STORED) as zipf:
-                for root, dirs, files in os.walk(ms):
-                    for file in files:
-                        file_path = Path(root) / file
-                        arcname = ms.name / file_path.relative_to(ms)
-                        zipf.write(file_path, arcname)
+            max_workers = max_workers or get_available_cpus()
+            start_time = time.time()
+            packed_bytes = pack_stored_zip(Path(ms), zip_filepath, max_workers)
+            elapsed = time.time() - start_time
+            logging.info(
+                f"Packed {packed_bytes / MB:.2f} MB with {max_workers} threads "
+                f"at {packed_bytes / MB / max(elapsed, 1e-6):.2f} MB/s"
+            )
         else:
             logging.error(f"{ms} is not a directory.")
             raise NotADirectoryError(f"Expected a directory, got {ms}")
@@ -212,25 +250,157 @@ class DataSource(ABC):
         logging.info(f"Created zip file at {zip_filepath}")
         return zip_filepath
 
-    def unzip(self, ms: Path) -> Path:
+    def zip_to_stream(
+        self, ms: Path, stream, codec: str = StoredCodec.name, threads: int = 1
+    ) -> None:
+        """Writes a STORED zip of the directory ms to a path or a writable stream.
+
+        Unseekable streams get members with data descriptors, which unzip
+        reads the same way as the archives written to disk. With a codec
+        other than stored, the archive stream is compressed on the way out.
+        """
+        if codec != StoredCodec.name:
+            archive = ArchiveStream(get_codec(codec).writer(stream, threads))
+            try:
+                self.zip_to_stream(ms, archive)
+            finally:
+                archive.close()
+            return
+
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as zipf:
+            for root, dirs, files in os.walk(ms):
+                for file in files:
+                    file_path = Path(root) / file
+                    arcname = ms.name / file_path.relative_to(ms)
+                    zipf.write(file_path, arcname)
+
+    def unzip(self, ms: Path, max_workers: int = None) -> Path:
+        """Extracts a zip next to itself with a pool of threads and deletes it.
+
+        STORED members are copied in the kernel from their offset in the
+        archive (copy_file_range, falling back to sendfile) into preallocated
+        files, so their bytes never pass through Python buffers. Compressed
+        members are decoded by zipfile as before.
+        """
         logging.info(f"Extracting zip file at {ms}")
         if ms.suffix != ".zip":
             logging.error(f"Expected a .zip file, got {ms}")
             raise ValueError(f"Expected a .zip file, got {ms}")
 
         extract_path = ms.parent
+        max_workers = max_workers or get_available_cpus()
         logging.info(f"Extracting to directory: {extract_path}")
 
+        codec = decompress_archive(ms)
+        if codec:
+            logging.info(f"Decoded {codec} archive {ms}")
+
+        start_time = time.time()
         with zipfile.ZipFile(ms, "r") as zipf:
             zip_contents = zipf.namelist()
             logging.debug(f"Zip contents: {zip_contents}")
 
-            zipf.extractall(extract_path)
+            members = []
+            for info in zipf.infolist():
+                target = member_target(extract_path, info.filename)
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                else:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    members.append((info, target))
+
+            with open(ms, "rb") as archive, ThreadPoolExecutor(
+                max_workers=max_workers
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        self._extract_member, zipf, archive.fileno(), info, target
+                    )
+                    for info, target in members
+                ]
+                for future in as_completed(futures):
+                    future.result()
 
             extracted_dir = extract_path / ms.stem
+        elapsed = time.time() - start_time
+
+        extracted_bytes = sum(info.file_size for info, _ in members)
+        self.last_transfer_bytes = extracted_bytes
+        logging.info(
+            f"Extracted {len(members)} files ({extracted_bytes / MB:.2f} MB) "
+            f"with {max_workers} threads at {extracted_bytes / MB / max(elapsed, 1e-6):.2f} MB/s"
+        )
 
         ms.unlink()
         logging.info(f"Deleted zip file at {ms}")
 
         logging.info(f"Extracted to directory: {extracted_dir}")
         return extracted_dir
+
+    def _extract_member(
+        self, zipf: zipfile.ZipFile, archive_fd: int, info: zipfile.ZipInfo, target
+    ):
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            with zipf.open(info) as source, open(target, "wb") as f:
+                shutil.copyfileobj(source, f, STREAM_BUFFER_SIZE)
+            return
+
+        header = struct.unpack(
+            zipfile.structFileHeader,
+            os.pread(archive_fd, zipfile.sizeFileHeader, info.header_offset),
+        )
+        data_offset = (
+            info.header_offset
+            + zipfile.sizeFileHeader
+            + header[zipfile._FH_FILENAME_LENGTH]
+            + header[zipfile._FH_EXTRA_FIELD_LENGTH]
+        )
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if info.file_size:
+                try:
+                    os.posix_fallocate(fd, 0, info.file_size)
+                except OSError:
+                    pass
+            copy_range(archive_fd, fd, data_offset, info.file_size)
+        finally:
+            os.close(fd)
+
+
+def clone_file(source_fd: int, target_fd: int):
+    fcntl.ioctl(target_fd, FICLONE, source_fd)
+
+
+def copy_range(src_fd: int, dst_fd: int, src_offset: int, count: int):
+    """Copies count bytes at src_offset of src_fd to the start of dst_fd in the kernel."""
+    copied = 0
+    try:
+        while copied < count:
+            n = os.copy_file_range(
+                src_fd, dst_fd, count - copied, src_offset + copied, copied
+            )
+            if n == 0:
+                break
+            copied += n
+    except (OSError, AttributeError):
+        pass
+
+    if copied < count:
+        os.lseek(dst_fd, copied, os.SEEK_SET)
+        try:
+            while copied < count:
+                n = os.sendfile(dst_fd, src_fd, src_offset + copied, count - copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            while copied < count:
+                chunk = os.pread(
+                    src_fd, min(STREAM_BUFFER_SIZE, count - copied), src_offset + copied
+                )
+                if not chunk:
+                    break
+                copied += os.write(dst_fd, chunk)
+
+    if copied != count:
+        raise IOError(f"Short copy: expected {count} bytes, copied {copied}")
@@ -0,0 +1,110 @@
+import os
+import json
+import zlib
+import zipfile
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MB = 1024 * 1024
+CRC_CHUNK_SIZE = 4 * MB
+# Member of a delta archive that lists what to take from the base object.
+DELTA_MANIFEST_MEMBER = "__delta__.json"
+DELTA_VERSION = 1
+
+
+@dataclass
+class BaseIndex:
+    """Members of the object an MS directory was extracted from.
+
+    members maps archive names to (size, CRC-32), as recorded in the zip
+    central directory, so a later upload can tell which files changed
+    without fetching the base again.
+    """
+
+    bucket: str
+    key: str
+    etag: str
+    members: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    def save(self, path: Path):
+        tmp_path = path.with_name(path.name + ".part")
+        tmp_path.write_text(json.dumps(asdict(self)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BaseIndex"]:
+        try:
+            content = json.loads(Path(path).read_text())
+        except FileNotFoundError:
+            return None
+        content["members"] = {
+            name: tuple(value) for name, value in content["members"].items()
+        }
+        return cls(**content)
+
+
+def base_index_path(ms: Path) -> Path:
+    """Sidecar next to (not inside) an extracted MS directory."""
+    ms = Path(ms)
+    return ms.with_name(f"{ms.name}.base.json")
+
+
+def file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CRC_CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+@dataclass
+class DeltaPlan:
+    changed: List[Tuple[Path, str]]
+    unchanged: List[str]
+    changed_bytes: int
+    unchanged_bytes: int
+
+
+def plan_delta(ms: Path, base: BaseIndex, max_workers: int) -> DeltaPlan:
+    """Hashes every file of ms and splits it into changed and unchanged members.
+
+    Archive names follow zip_to_stream, <ms name>/<relative path>. A member
+    is unchanged when its size and CRC-32 match the base; base members
+    missing from ms are simply not referenced.
+    """
+    ms = Path(ms)
+    files = []
+    for root, dirs, names in os.walk(ms):
+        for name in names:
+            path = Path(root) / name
+            files.append((path, str(ms.name / path.relative_to(ms))))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        crcs = list(executor.map(lambda entry: file_crc32(entry[0]), files))
+
+    plan = DeltaPlan(changed=[], unchanged=[], changed_bytes=0, unchanged_bytes=0)
+    for (path, arcname), crc in zip(files, crcs):
+        size = path.stat().st_size
+        if base.members.get(arcname) == (size, crc):
+            plan.unchanged.append(arcname)
+            plan.unchanged_bytes += size
+        else:
+            plan.changed.append((path, arcname))
+            plan.changed_bytes += size
+    return plan
+
+
+def write_delta(stream, plan: DeltaPlan, base: BaseIndex):
+    """Writes a STORED zip of the changed members plus the delta manifest."""
+    manifest = {
+        "version": DELTA_VERSION,
+        "base": {"bucket": base.bucket, "key": base.key, "etag": base.etag},
+        "unchanged": plan.unchanged,
+    }
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as zipf:
+        zipf.writestr(DELTA_MANIFEST_MEMBER, json.dumps(manifest))
+        for path, arcname in plan.changed:
+            zipf.write(path, arcname)
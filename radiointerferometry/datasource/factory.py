@@ -0,0 +1,28 @@
+from typing import Optional
+from .datasource import DataSource
+from .cache import DownloadCache
+from .lithops_datasource import LithopsDataSource
+from .local_datasource import LocalDataSource
+from .async_datasource import AsyncioDataSource
+
+
+def create_datasource(
+    config: Optional[dict] = None, cache: DownloadCache = None
+) -> DataSource:
+    """Builds the DataSource described by config.
+
+    config is {"backend": "lithops" | "local" | "asyncio", **options}, where the options
+    are the backend's constructor arguments, e.g.
+    {"backend": "local", "root": "/mnt/shared", "link_mode": "reflink"}.
+    No config means object storage through lithops. The download cache only
+    applies to the lithops backend.
+    """
+    options = dict(config or {})
+    backend = options.pop("backend", "lithops")
+    if backend == "lithops":
+        return LithopsDataSource(cache=cache, **options)
+    if backend == "local":
+        return LocalDataSource(**options)
+    if backend == "asyncio":
+        return AsyncioDataSource(**options)
+    raise ValueError(f"Unknown datasource backend: {backend}")
@@ -1,15 +1,53 @@
 import os
+import json
+import time
+import logging
 
 from lithops import Storage
 from .datasource import DataSource
+from .cache import DownloadCache, object_etag
+from .multipart import MultipartUploadWriter
+from .remote_zip import extract_remote_zip
+from .scheduler import RequestScheduler, ScheduledStorage, request_scheduler
+from .delta import (
+    DELTA_MANIFEST_MEMBER,
+    BaseIndex,
+    base_index_path,
+    plan_delta,
+    write_delta,
+)
+from .codecs import (
+    CODEC_METADATA_KEY,
+    StoredCodec,
+    choose_codec,
+    detect_codec,
+    get_codec,
+    recorded_codec,
+    sample_directory,
+)
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from radiointerferometry.datasource import InputS3, OutputS3
-from radiointerferometry.profiling import time_it
+from typing import Callable, List, Optional
+from radiointerferometry.datasource import InputS3, OutputS3, LocalPath, ObjectMetadata
+from radiointerferometry.profiling import time_it, worker_throughput
+from radiointerferometry.utils import get_available_cpus
 
 KB = 1024
 MB = KB * KB
 
+DEFAULT_MAX_WORKERS = 16
+# Objects larger than this are fetched as several concurrent byte-range GETs.
+DEFAULT_RANGE_SIZE = 64 * MB
+STREAM_BUFFER_SIZE = 1 * MB
+
+# Files larger than one part go through a parallel multipart upload.
+DEFAULT_PART_SIZE = 32 * MB
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_PART_RETRIES = 3
+
+# upload_zipped codec that picks stored, zstd or lz4 per upload.
+ADAPTIVE_CODEC = "adaptive"
+
 
 def s3_to_local_path(s3_path: InputS3, base_local_dir: Path = Path("/tmp")) -> Path:
     local_path = os.path.join(base_local_dir, s3_path.bucket, f"{s3_path.key}/")
@@ -36,21 +74,73 @@ def local_path_to_s3(local_path: Path, base_local_dir: Path = Path("/tmp")) -> O
     )
 
 
+def output_key(name: str, output_s3: OutputS3) -> str:
+    # Use remote_key_ow if it exists, otherwise use the original key
+    if output_s3.remote_ow:
+        return os.path.join(output_s3.remote_ow, name)
+    return os.path.join(output_s3.key, name)
+
+
 class LithopsDataSource(DataSource):
-    def __init__(self):
-        self.storage = Storage()
+    def __init__(
+        self,
+        storage: Storage = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        range_size: int = DEFAULT_RANGE_SIZE,
+        part_size: int = DEFAULT_PART_SIZE,
+        upload_workers: int = DEFAULT_UPLOAD_WORKERS,
+        part_retries: int = DEFAULT_PART_RETRIES,
+        cache: DownloadCache = None,
+        codec: str = StoredCodec.name,
+        delta: bool = False,
+        scheduler: RequestScheduler = None,
+    ):
+        super().__init__()
+        if codec != ADAPTIVE_CODEC:
+            get_codec(codec)
+        # Every storage request is admitted by the worker's shared scheduler.
+        self.scheduler = scheduler if scheduler else request_scheduler
+        self.storage = ScheduledStorage(
+            storage if storage else Storage(), self.scheduler
+        )
         self.time_records = []
+        self.max_workers = max_workers
+        self.range_size = range_size
+        self.part_size = part_size
+        self.upload_workers = upload_workers
+        self.part_retries = part_retries
+        self.cache = cache
+        self.codec = codec
+        self.delta = delta
 
     def exists(self, path: OutputS3) -> bool:
         """Check if a file exists in an S3 bucket."""
         return len(self.storage.list_keys(path.bucket, prefix=path.key)) > 0
 
+    def list_metadata(self, bucket: str, prefix: str = "") -> List[ObjectMetadata]:
+        """Key, size and ETag of every object under prefix from one paginated listing."""
+        return [
+            ObjectMetadata(key=obj["Key"], size=int(obj["Size"]), etag=object_etag(obj))
+            for obj in self.storage.list_objects(bucket, prefix=prefix)
+            if not obj["Key"].endswith("/")
+        ]
+
     def download_file(self, read_path: InputS3, base_path: Path = Path("/tmp")):
         if isinstance(read_path, InputS3):
             try:
                 local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
 
-                if local_path.exists():
+                if self.cache:
+                    counters = self.cache.counters()
+                    etag = object_etag(
+                        self.storage.head_object(read_path.bucket, read_path.key)
+                    )
+                    if self.cache.fetch(
+                        read_path.bucket, read_path.key, etag, local_path
+                    ):
+                        self.last_transfer_counters = self.cache.counters(counters)
+                        return local_path
+                elif local_path.exists():
                     print(f"File {local_path} already exists locally.")
                     return local_path
 
@@ -63,38 +153,364 @@ class LithopsDataSource(DataSource):
                     str(local_path),
                 )
 
+                if self.cache:
+                    self.cache.store(read_path.bucket, read_path.key, etag, local_path)
+                    self.last_transfer_counters = self.cache.counters(counters)
                 return local_path
             except Exception as e:
                 print(f"Failed to download file {read_path.key}: {e}")
 
     def download(self, read_path: InputS3, base_path: Path = Path("/tmp")):
         """Download from S3 and returns the local path."""
-        keys = self.storage.list_keys(read_path.bucket, prefix=read_path.key)
+        objects = self.list_metadata(read_path.bucket, prefix=read_path.key)
         local_directory_path = s3_to_local_path(
             read_path, base_local_dir=str(base_path)
         )
 
-        for key in keys:
-            s3_file_path = InputS3(bucket=read_path.bucket, key=key)
-            self.download_file(s3_file_path, base_path=base_path)
+        counters = self.cache.counters() if self.cache else None
+        pending = []
+        for obj in objects:
+            s3_file_path = InputS3(bucket=read_path.bucket, key=obj.key)
+            local_path = s3_to_local_path(s3_file_path, base_local_dir=str(base_path))
+            if self.cache:
+                if self.cache.fetch(read_path.bucket, obj.key, obj.etag, local_path):
+                    continue
+            elif local_path.exists():
+                print(f"File {local_path} already exists locally.")
+                continue
+            pending.append((obj.key, obj.size, local_path))
+
+        start_time = time.time()
+        total_bytes = self._download_objects(read_path.bucket, pending)
+        elapsed = time.time() - start_time
+
+        if self.cache:
+            etags = {obj.key: obj.etag for obj in objects}
+            for key, _, local_path in pending:
+                self.cache.store(read_path.bucket, key, etags[key], local_path)
+            self.last_transfer_counters = self.cache.counters(counters)
+
+        self.last_transfer_bytes = total_bytes
+        worker_throughput.update(total_bytes, elapsed)
+        if elapsed > 0 and total_bytes:
+            logging.info(
+                f"Downloaded {len(pending)} objects ({total_bytes / MB:.2f} MB) from "
+                f"{read_path.bucket}/{read_path.key} at {total_bytes / MB / elapsed:.2f} MB/s "
+                f"with {self.max_workers} workers"
+            )
 
         return local_directory_path
 
+    def _download_objects(self, bucket: str, objects: list) -> int:
+        """Fetch (key, size, local_path) entries with a bounded pool of range GETs."""
+        ranges = []
+        for key, size, local_path in objects:
+            os.makedirs(local_path.parent, exist_ok=True)
+            part_path = local_path.with_name(local_path.name + ".part")
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            for offset in range(0, size, self.range_size):
+                length = min(self.range_size, size - offset)
+                ranges.append((key, part_path, offset, length, size))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(self._download_range, bucket, *byte_range)
+                    for byte_range in ranges
+                ]
+                for future in as_completed(futures):
+                    future.result()
+        except Exception as e:
+            logging.error(f"Failed to download objects from {bucket}: {e}")
+            for _, _, local_path in objects:
+                local_path.with_name(local_path.name + ".part").unlink(missing_ok=True)
+            raise
+
+        for _, _, local_path in objects:
+            os.replace(local_path.with_name(local_path.name + ".part"), local_path)
+
+        return sum(size for _, size, _ in objects)
+
+    def _download_range(
+        self,
+        bucket: str,
+        key: str,
+        part_path: Path,
+        offset: int,
+        length: int,
+        size: int,
+    ):
+        """Stream one byte range of an object into its preallocated local file."""
+        extra_get_args = {}
+        if length < size:
+            extra_get_args = {"Range": f"bytes={offset}-{offset + length - 1}"}
+        body = self.storage.get_object(
+            bucket, key, stream=True, extra_get_args=extra_get_args
+        )
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            position = offset
+            while True:
+                chunk = body.read(STREAM_BUFFER_SIZE)
+                if not chunk:
+                    break
+                os.pwrite(fd, chunk, position)
+                position += len(chunk)
+        finally:
+            os.close(fd)
+            body.close()
+
+        if position - offset != length:
+            raise IOError(
+                f"Short read for {bucket}/{key} at offset {offset}: "
+                f"expected {length} bytes, got {position - offset}"
+            )
+
+    def extract_zip(
+        self,
+        read_path: InputS3,
+        base_path: Path = Path("/tmp"),
+        member_filter: Optional[Callable[[str], bool]] = None,
+    ) -> Path:
+        """Extract a STORED zip object in place, without staging the archive.
+
+        member_filter selects members by archive name, e.g. only the table
+        files of the columns a step reads. Returns the extracted directory,
+        like unzip does.
+        """
+        local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
+        extract_path = local_path.parent
+        os.makedirs(extract_path, exist_ok=True)
+
+        # The HEAD also sizes the archive for the range reads, so the codec
+        # recorded by multipart uploads costs no extra request; only
+        # archives uploaded without it are probed for their magic bytes.
+        metadata = self.storage.head_object(read_path.bucket, read_path.key)
+        codec = recorded_codec(metadata)
+        if codec is None:
+            header = self.storage.get_object(
+                read_path.bucket, read_path.key, extra_get_args={"Range": "bytes=0-3"}
+            )
+            codec = detect_codec(header)
+        if codec is not None and codec.name != StoredCodec.name:
+            # Compressed archives have no member offsets to range-read.
+            self.download_file(read_path, base_path)
+            return self.unzip(local_path)
+
+        start_time = time.time()
+        self.last_transfer_bytes = 0
+        index = self._extract_object(
+            read_path.bucket, read_path.key, extract_path, member_filter, metadata
+        )
+        elapsed = time.time() - start_time
+
+        ms_path = extract_path / local_path.stem
+        # A partial extraction can't serve as the base of a later delta.
+        if member_filter is None and ms_path.is_dir():
+            index.save(base_index_path(ms_path))
+
+        written = self.last_transfer_bytes
+        worker_throughput.update(written, elapsed)
+        logging.info(
+            f"Extracted {written / MB:.2f} MB from {read_path.bucket}/{read_path.key} "
+            f"into {extract_path} in {elapsed:.2f}s"
+        )
+        return ms_path
+
+    def _extract_object(
+        self,
+        bucket: str,
+        key: str,
+        extract_path: Path,
+        member_filter: Optional[Callable[[str], bool]],
+        metadata: Optional[dict] = None,
+    ) -> BaseIndex:
+        """Range-extracts one STORED zip object, resolving delta archives.
+
+        A delta archive carries the members that changed plus a manifest
+        naming its base object and the members to take from it; those are
+        extracted from the base, which must still have the recorded ETag.
+        Returns the members of the logical (full) archive, read from the
+        central directories whatever member_filter selected; only the caller
+        knows whether the extracted tree is complete enough to be a base.
+        metadata is the object's head_object headers, if the caller has them.
+        """
+        index = {}
+        self.last_transfer_bytes += extract_remote_zip(
+            self.storage,
+            bucket,
+            key,
+            extract_path,
+            member_filter=lambda name: name == DELTA_MANIFEST_MEMBER
+            or member_filter is None
+            or member_filter(name),
+            max_workers=self.max_workers,
+            batch_size=self.range_size,
+            size=int(metadata["content-length"]) if metadata else None,
+            index=index,
+        )
+        members = index["members"]
+        etag = object_etag(
+            metadata or index["metadata"] or self.storage.head_object(bucket, key)
+        )
+
+        manifest_path = extract_path / DELTA_MANIFEST_MEMBER
+        if DELTA_MANIFEST_MEMBER in members:
+            manifest = json.loads(manifest_path.read_text())
+            manifest_path.unlink()
+            members.pop(DELTA_MANIFEST_MEMBER)
+            base = manifest["base"]
+            base_etag = object_etag(
+                self.storage.head_object(base["bucket"], base["key"])
+            )
+            if base_etag != base["etag"]:
+                raise IOError(
+                    f"Delta {bucket}/{key} was written against {base['bucket']}/"
+                    f"{base['key']} with ETag {base['etag']}, found {base_etag}"
+                )
+            unchanged = set(manifest["unchanged"])
+            base_index = self._extract_object(
+                base["bucket"],
+                base["key"],
+                extract_path,
+                lambda name: name in unchanged
+                and (member_filter is None or member_filter(name)),
+            )
+            for name in unchanged:
+                if name in base_index.members:
+                    members[name] = base_index.members[name]
+
+        return BaseIndex(bucket=bucket, key=key, etag=etag, members=members)
+
     def upload(self, local_path: Path, output_s3: OutputS3):
         """Uploads a single file to an S3 bucket based on the OutputS3 configuration."""
         if not os.path.isfile(local_path):
             raise ValueError(f"The path {local_path} is not a file.")
         bucket = output_s3.bucket
+        key = output_key(local_path.name, output_s3)
 
-        # Use remote_key_ow if it exists, otherwise use the original key
-        if output_s3.remote_ow:
-            key = os.path.join(output_s3.remote_ow, local_path.name)
+        logging.info(f"Uploading {local_path} to {bucket}/{key}")
+        file_size = os.path.getsize(local_path)
+        start_time = time.time()
+        client = self.storage.get_client()
+        if file_size > self.part_size and hasattr(client, "create_multipart_upload"):
+            # A failed upload is aborted by the writer and the error re-raised.
+            with self._multipart_writer(client, bucket, key) as writer:
+                with open(local_path, "rb") as f:
+                    for offset in range(0, file_size, self.part_size):
+                        writer.write(os.pread(f.fileno(), self.part_size, offset))
         else:
-            key = os.path.join(output_s3.key, local_path.name)
-
-        print(local_path)
-        print(f"Uploading to bucket: {bucket}, key: {key}")
-        try:
             self.storage.upload_file(str(local_path), bucket, key)
-        except Exception as e:
-            print(e)
+        self.last_transfer_bytes = file_size
+        worker_throughput.update(file_size, time.time() - start_time)
+
+    def upload_zipped(self, ms: LocalPath, output_s3: OutputS3):
+        """Zips a directory and uploads it as <name>.zip without writing the archive to disk.
+
+        The zip stream, compressed with the data source's codec, is fed
+        straight into a multipart upload, so packing overlaps with the
+        transfer. The codec is recorded in the object's metadata. Backends
+        without multipart support fall back to writing the archive locally
+        followed by upload.
+        """
+        if not os.path.isdir(ms):
+            raise NotADirectoryError(f"Expected a directory, got {ms}")
+        bucket = output_s3.bucket
+        key = output_key(f"{ms.name}.zip", output_s3)
+        if self.delta and self._upload_delta(Path(ms), bucket, key):
+            return
+        codec = self.select_codec(ms)
+        threads = get_available_cpus()
+
+        client = self.storage.get_client()
+        if not hasattr(client, "create_multipart_upload"):
+            if codec == StoredCodec.name:
+                zip_filepath = self.zip_without_compression(ms)
+            else:
+                zip_filepath = Path(f"{ms}.zip")
+                with open(zip_filepath, "wb") as f:
+                    self.zip_to_stream(Path(ms), f, codec, threads)
+            self.upload(zip_filepath, output_s3)
+            os.remove(zip_filepath)
+            return
+
+        print(f"Streaming {codec} zip of {ms} to bucket: {bucket}, key: {key}")
+        with self._multipart_writer(
+            client, bucket, key, metadata={CODEC_METADATA_KEY: codec}
+        ) as writer:
+            self.zip_to_stream(Path(ms), writer, codec, threads)
+        self.last_transfer_bytes = writer.bytes_written
+        self.last_transfer_counters = {"codec": codec}
+
+    def _upload_delta(self, ms: Path, bucket: str, key: str) -> bool:
+        """Uploads only the files of ms that differ from the object it was
+        extracted from, as a delta archive referencing that object.
+
+        Used when a step updates an MS in place and writes it to a new key.
+        Returns False, leaving the full upload to the caller, when there is
+        no base index, the target is the base itself (the delta would refer
+        to the object it replaces) or nothing is shared with the base.
+        """
+        base = BaseIndex.load(base_index_path(ms))
+        if base is None or (base.bucket, base.key) == (bucket, key):
+            return False
+        plan = plan_delta(ms, base, self.max_workers)
+        if not plan.unchanged:
+            return False
+
+        print(
+            f"Uploading delta of {ms} to bucket: {bucket}, key: {key} "
+            f"({len(plan.changed)} changed files, {len(plan.unchanged)} from "
+            f"{base.bucket}/{base.key})"
+        )
+        start_time = time.time()
+        client = self.storage.get_client()
+        if hasattr(client, "create_multipart_upload"):
+            with self._multipart_writer(
+                client, bucket, key, metadata={CODEC_METADATA_KEY: StoredCodec.name}
+            ) as writer:
+                write_delta(writer, plan, base)
+            written = writer.bytes_written
+        else:
+            delta_path = ms.with_name(f"{ms.name}.delta.zip")
+            try:
+                with open(delta_path, "wb") as f:
+                    write_delta(f, plan, base)
+                written = delta_path.stat().st_size
+                self.storage.upload_file(str(delta_path), bucket, key)
+            finally:
+                delta_path.unlink(missing_ok=True)
+
+        self.last_transfer_bytes = written
+        self.last_transfer_counters = {
+            "delta_changed_bytes": plan.changed_bytes,
+            "delta_unchanged_bytes": plan.unchanged_bytes,
+        }
+        worker_throughput.update(written, time.time() - start_time)
+        return True
+
+    def select_codec(self, ms: Path) -> str:
+        """Codec for the next upload; adaptive mode weighs a sample of ms
+        against the network throughput this worker has measured."""
+        if self.codec != ADAPTIVE_CODEC:
+            return self.codec
+        codec = choose_codec(
+            sample_directory(ms), worker_throughput.mb_per_s, get_available_cpus()
+        )
+        logging.info(
+            f"Adaptive codec for {ms}: {codec.name} "
+            f"(network {worker_throughput.mb_per_s} MB/s)"
+        )
+        return codec.name
+
+    def _multipart_writer(self, client, bucket: str, key: str, metadata=None):
+        return MultipartUploadWriter(
+            client,
+            bucket,
+            key,
+            part_size=self.part_size,
+            max_workers=self.upload_workers,
+            part_retries=self.part_retries,
+            metadata=metadata,
+        )
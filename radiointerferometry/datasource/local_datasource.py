@@ -0,0 +1,250 @@
+import os
+import time
+import shutil
+import logging
+
+from .datasource import DataSource, InputS3, OutputS3, LocalPath, ObjectMetadata
+from .datasource import clone_file, copy_range
+from .lithops_datasource import s3_to_local_path, output_key
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from lithops.storage.utils import StorageNoSuchKeyError
+from pathlib import Path
+from typing import Callable, List, Optional
+
+MB = 1024 * 1024
+
+DEFAULT_MAX_WORKERS = 16
+LINK_MODES = ("auto", "hardlink", "reflink", "copy")
+
+
+def stage_file(source: Path, target: Path, link_mode: str = "auto") -> str:
+    """Materializes source at target without moving bytes through Python.
+
+    hardlink shares the inode, so it is only safe when neither side is
+    modified afterwards. reflink clones the extents (copy-on-write) and
+    copy uses copy_file_range, which stays in the kernel and may be
+    offloaded by the filesystem. Each mode falls back to the next one.
+    Returns the method that was used.
+    """
+    os.makedirs(target.parent, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".part")
+    tmp_path.unlink(missing_ok=True)
+
+    method = None
+    if link_mode == "hardlink":
+        try:
+            os.link(source, tmp_path)
+            method = "hardlink"
+        except OSError:
+            pass
+
+    if method is None:
+        with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+            if link_mode != "copy":
+                try:
+                    clone_file(src.fileno(), dst.fileno())
+                    method = "reflink"
+                except OSError:
+                    pass
+            if method is None:
+                copy_range(
+                    src.fileno(), dst.fileno(), 0, os.fstat(src.fileno()).st_size
+                )
+                method = "copy"
+        shutil.copymode(source, tmp_path)
+
+    os.replace(tmp_path, target)
+    return method
+
+
+class LocalStorage:
+    """Object-style access (get_object/put_object) to a LocalDataSource tree."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def get_object(self, bucket: str, key: str) -> bytes:
+        path = self.root / bucket / key
+        if not path.is_file():
+            raise StorageNoSuchKeyError(bucket, key)
+        return path.read_bytes()
+
+    def put_object(self, bucket: str, key: str, body):
+        path = self.root / bucket / key
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".part")
+        tmp_path.write_bytes(body.encode("utf-8") if isinstance(body, str) else body)
+        os.replace(tmp_path, path)
+
+
+class LocalDataSource(DataSource):
+    """DataSource over a local or shared POSIX directory tree.
+
+    <root>/<bucket>/<key> holds the object bucket/key. Files are staged with
+    hardlinks, reflinks or copy_file_range instead of being copied through
+    Python. Directories uploaded with upload_zipped are not zipped: they are
+    kept unpacked in a directory named like the archive key, which
+    extract_zip stages back the same way.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        link_mode: str = "auto",
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        super().__init__()
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"link_mode must be one of {LINK_MODES}, got {link_mode}")
+        self.root = Path(root)
+        self.link_mode = link_mode
+        self.max_workers = max_workers
+        self.storage = LocalStorage(self.root)
+
+    def _object_path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def exists(self, path: OutputS3) -> bool:
+        """Check if an object or a prefix exists in the tree."""
+        object_path = self._object_path(path.bucket, path.key)
+        if object_path.exists():
+            return True
+        return object_path.parent.is_dir() and any(
+            entry.startswith(object_path.name)
+            for entry in os.listdir(object_path.parent)
+        )
+
+    def list_metadata(self, bucket: str, prefix: str = "") -> List[ObjectMetadata]:
+        """Key, size and a size/mtime ETag of every object under prefix.
+
+        Unpacked archives count as one object, under their .zip key.
+        """
+        bucket_path = self.root / bucket
+        start = bucket_path / os.path.dirname(prefix)
+        objects = []
+        for root, dirs, files in os.walk(start):
+            archives = [d for d in dirs if d.endswith(".zip")]
+            dirs[:] = [d for d in dirs if not d.endswith(".zip")]
+            for name in files + archives:
+                path = Path(root) / name
+                key = str(path.relative_to(bucket_path))
+                if not key.startswith(prefix) or name.endswith(".part"):
+                    continue
+                stat = path.stat()
+                size = tree_size(path) if path.is_dir() else stat.st_size
+                objects.append(
+                    ObjectMetadata(
+                        key=key, size=size, etag=f"{size}-{stat.st_mtime_ns}"
+                    )
+                )
+        return sorted(objects, key=lambda obj: obj.key)
+
+    def download_file(self, read_path: InputS3, base_path: Path = Path("/tmp")):
+        local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
+        if local_path.exists():
+            print(f"File {local_path} already exists locally.")
+            return local_path
+        source = self._object_path(read_path.bucket, read_path.key)
+        self._stage([(source, local_path)])
+        return local_path
+
+    def download(self, read_path: InputS3, base_path: Path = Path("/tmp")):
+        """Stage a file or a directory tree and return the local path."""
+        source = self._object_path(read_path.bucket, read_path.key)
+        local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
+        if source.is_file():
+            pending = [(source, local_path)]
+        else:
+            pending = [
+                (path, local_path / path.relative_to(source))
+                for path in walk_files(source)
+                if not (local_path / path.relative_to(source)).exists()
+            ]
+        self._stage(pending)
+        return local_path
+
+    def upload(self, local_path: Path, output_s3: OutputS3):
+        """Stage a single file into the tree based on the OutputS3 configuration."""
+        if not os.path.isfile(local_path):
+            raise ValueError(f"The path {local_path} is not a file.")
+        key = output_key(local_path.name, output_s3)
+        print(f"Staging {local_path} to {output_s3.bucket}/{key}")
+        self._stage([(Path(local_path), self._object_path(output_s3.bucket, key))])
+
+    def upload_zipped(self, ms: LocalPath, output_s3: OutputS3):
+        """Stage the directory ms under <name>.zip, without building the archive."""
+        if not os.path.isdir(ms):
+            raise NotADirectoryError(f"Expected a directory, got {ms}")
+        ms = Path(ms)
+        key = output_key(f"{ms.name}.zip", output_s3)
+        archive_dir = self._object_path(output_s3.bucket, key)
+        # Replace the whole object, as a PUT would.
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        print(f"Staging {ms} to {output_s3.bucket}/{key}")
+        self._stage(
+            [
+                (path, archive_dir / ms.name / path.relative_to(ms))
+                for path in walk_files(ms)
+            ]
+        )
+
+    def extract_zip(
+        self,
+        read_path: InputS3,
+        base_path: Path = Path("/tmp"),
+        member_filter: Optional[Callable[[str], bool]] = None,
+    ) -> Path:
+        """Stage the members of an archive and return the extracted directory.
+
+        Archives kept unpacked are staged file by file; real zip files are
+        staged and unzipped.
+        """
+        local_path = s3_to_local_path(read_path, base_local_dir=str(base_path))
+        extract_path = local_path.parent
+        source = self._object_path(read_path.bucket, read_path.key)
+        if source.is_dir():
+            pending = []
+            for path in walk_files(source):
+                member = str(path.relative_to(source))
+                if member_filter is None or member_filter(member):
+                    pending.append((path, extract_path / member))
+            self._stage(pending)
+            return extract_path / local_path.stem
+
+        self._stage([(source, local_path)])
+        return self.unzip(local_path)
+
+    def _stage(self, pending: list) -> int:
+        """Stage (source, target) pairs with a pool of threads."""
+        counters = {"hardlink": 0, "reflink": 0, "copy": 0}
+        total_bytes = sum(os.path.getsize(source) for source, _ in pending)
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(stage_file, source, target, self.link_mode)
+                for source, target in pending
+            ]
+            for future in as_completed(futures):
+                counters[future.result()] += 1
+        elapsed = time.time() - start_time
+
+        self.last_transfer_bytes = total_bytes
+        self.last_transfer_counters = counters
+        if pending:
+            logging.info(
+                f"Staged {len(pending)} files ({total_bytes / MB:.2f} MB) in {elapsed:.2f}s "
+                f"({counters['hardlink']} hardlinks, {counters['reflink']} reflinks, "
+                f"{counters['copy']} copies)"
+            )
+        return total_bytes
+
+
+def walk_files(directory: Path):
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            yield Path(root) / file
+
+
+def tree_size(directory: Path) -> int:
+    return sum(os.path.getsize(path) for path in walk_files(directory))
@@ -0,0 +1,132 @@
+import time
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class MultipartUploadWriter:
+    """Write-only stream that uploads everything written to it as one object.
+
+    Bytes are cut into part_size parts and uploaded by a pool of
+    max_workers threads, so the producer keeps writing while earlier parts
+    are on the wire. At most max_workers parts are in flight, which bounds
+    memory to roughly (max_workers + 1) * part_size. Leaving the context
+    manager with an exception aborts the upload instead of completing it.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        key: str,
+        part_size: int,
+        max_workers: int,
+        part_retries: int,
+        metadata: dict = None,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.part_retries = part_retries
+        self.bytes_written = 0
+        extra_args = {"Metadata": metadata} if metadata else {}
+        self.upload_id = client.create_multipart_upload(
+            Bucket=bucket, Key=key, **extra_args
+        )["UploadId"]
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._buffer = bytearray()
+        self._in_flight = set()
+        self._completed_parts = []
+        self._part_number = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._abort_and_keep_error()
+            return
+        try:
+            self.complete()
+        except Exception:
+            self._abort_and_keep_error()
+            raise
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[: self.part_size])
+            del self._buffer[: self.part_size]
+            self._submit(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def complete(self):
+        if self._buffer or self._part_number == 0:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        done, _ = wait(self._in_flight)
+        self._in_flight = set()
+        self._completed_parts.extend(future.result() for future in done)
+        self._executor.shutdown()
+
+        self._completed_parts.sort(key=lambda part: part["PartNumber"])
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self._completed_parts},
+        )
+        logging.info(
+            f"Uploaded {self.bucket}/{self.key} in {len(self._completed_parts)} parts "
+            f"with {self.max_workers} workers"
+        )
+
+    def abort(self):
+        logging.error(f"Multipart upload of {self.bucket}/{self.key} failed, aborting")
+        self._executor.shutdown(cancel_futures=True)
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+        )
+
+    def _abort_and_keep_error(self):
+        """Aborts the upload; a failing abort is logged, not raised over the error."""
+        try:
+            self.abort()
+        except Exception as e:
+            logging.error(f"Aborting {self.bucket}/{self.key} failed too: {e}")
+
+    def _submit(self, data: bytes):
+        if len(self._in_flight) >= self.max_workers:
+            done, self._in_flight = wait(self._in_flight, return_when=FIRST_COMPLETED)
+            self._completed_parts.extend(future.result() for future in done)
+        self._part_number += 1
+        self._in_flight.add(
+            self._executor.submit(self._upload_part, self._part_number, data)
+        )
+
+    def _upload_part(self, part_number: int, data: bytes) -> dict:
+        """Upload one part, retrying with exponential backoff."""
+        for attempt in range(self.part_retries + 1):
+            try:
+                response = self.client.upload_part(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    PartNumber=part_number,
+                    Body=data,
+                )
+                return {"PartNumber": part_number, "ETag": response["ETag"]}
+            except Exception as e:
+                if attempt == self.part_retries:
+                    raise
+                logging.warning(
+                    f"Part {part_number} of {self.bucket}/{self.key} failed "
+                    f"(attempt {attempt + 1}): {e}. Retrying."
+                )
+                time.sleep(2**attempt * 0.5)
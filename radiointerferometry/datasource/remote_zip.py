@@ -0,0 +1,252 @@
+import io
+import os
+import struct
+import zipfile
+import zlib
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, List, Optional
+
+KB = 1024
+MB = KB * KB
+
+# The tail fetched up front covers the end-of-central-directory record, the
+# zip64 locator and, for typical measurement sets, the whole central directory.
+TAIL_PREFETCH_SIZE = 1 * MB
+STREAM_BUFFER_SIZE = 1 * MB
+
+
+class ObjectRangeFile(io.RawIOBase):
+    """Read-only seekable file over an object, served by range GETs."""
+
+    def __init__(self, storage, bucket: str, key: str, size: int = None):
+        self.storage = storage
+        self.bucket = bucket
+        self.key = key
+        self.metadata = None
+        if size is None:
+            self.metadata = storage.head_object(bucket, key)
+            size = int(self.metadata["content-length"])
+        self.size = size
+        self.position = 0
+        self.requests = 0
+        self._tail_offset = max(0, size - TAIL_PREFETCH_SIZE)
+        self._tail = self.get_range(self._tail_offset, size) if size else b""
+
+    def get_range(self, start: int, end: int, stream: bool = False):
+        """GET bytes [start, end) of the object."""
+        self.requests += 1
+        return self.storage.get_object(
+            self.bucket,
+            self.key,
+            stream=stream,
+            extra_get_args={"Range": f"bytes={start}-{end - 1}"},
+        )
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise OSError(f"Negative seek position {position}")
+        self.position = position
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        end = min(self.size, self.position + size)
+        if end <= self.position:
+            return b""
+        if self.position >= self._tail_offset:
+            data = self._tail[
+                self.position - self._tail_offset : end - self._tail_offset
+            ]
+        else:
+            data = self.get_range(self.position, end)
+        self.position = end
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def member_target(extract_path: Path, filename: str) -> Path:
+    """Local path of an archive member, refusing names that escape extract_path."""
+    extract_root = Path(os.path.realpath(extract_path))
+    target = Path(os.path.realpath(extract_root / filename))
+    if extract_root not in target.parents and target != extract_root:
+        raise ValueError(f"Member {filename} escapes {extract_path}")
+    return target
+
+
+def read_exact(body, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = body.read(min(size, STREAM_BUFFER_SIZE))
+        if not chunk:
+            raise IOError(f"Unexpected end of stream, {size} bytes missing")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def plan_member_batches(
+    infos: List[zipfile.ZipInfo],
+    central_directory_offset: int,
+    selected: Callable[[zipfile.ZipInfo], bool],
+    batch_size: int,
+):
+    """Group adjacent selected members into contiguous byte ranges.
+
+    Returns a list of (start, end, [(info, record_end), ...]) where each member
+    record spans from its local header to the next member's header.
+    """
+    batches = []
+    current = None
+    for index, info in enumerate(infos):
+        record_end = (
+            infos[index + 1].header_offset
+            if index + 1 < len(infos)
+            else central_directory_offset
+        )
+        if not selected(info):
+            current = None
+            continue
+        if current is None or record_end - current[0] > batch_size:
+            current = [info.header_offset, record_end, []]
+            batches.append(current)
+        current[1] = record_end
+        current[2].append((info, record_end))
+    return [tuple(batch) for batch in batches]
+
+
+def extract_batch(range_file: ObjectRangeFile, batch, extract_path: Path) -> int:
+    """Stream one contiguous range and write each member it holds to disk."""
+    start, end, members = batch
+    body = range_file.get_range(start, end, stream=True)
+    position = start
+    written = 0
+    try:
+        for info, record_end in members:
+            header = struct.unpack(
+                zipfile.structFileHeader, read_exact(body, zipfile.sizeFileHeader)
+            )
+            if header[0] != zipfile.stringFileHeader:
+                raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+            read_exact(
+                body,
+                header[zipfile._FH_FILENAME_LENGTH]
+                + header[zipfile._FH_EXTRA_FIELD_LENGTH],
+            )
+            data_start = (
+                position
+                + zipfile.sizeFileHeader
+                + header[zipfile._FH_FILENAME_LENGTH]
+                + header[zipfile._FH_EXTRA_FIELD_LENGTH]
+            )
+
+            target = extract_path / info.filename
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                crc = 0
+                remaining = info.file_size
+                with open(target, "wb") as f:
+                    while remaining:
+                        chunk = body.read(min(remaining, STREAM_BUFFER_SIZE))
+                        if not chunk:
+                            raise IOError(f"Truncated member {info.filename}")
+                        crc = zlib.crc32(chunk, crc)
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                if crc != info.CRC:
+                    raise zipfile.BadZipFile(f"Bad CRC-32 for {info.filename}")
+                written += info.file_size
+
+            # Skip any data descriptor trailing the member data.
+            read_exact(body, record_end - data_start - info.file_size)
+            position = record_end
+    finally:
+        body.close()
+    return written
+
+
+def extract_remote_zip(
+    storage,
+    bucket: str,
+    key: str,
+    extract_path: Path,
+    member_filter: Optional[Callable[[str], bool]] = None,
+    max_workers: int = 8,
+    batch_size: int = 64 * MB,
+    size: int = None,
+    index: dict = None,
+) -> int:
+    """Extract members of a STORED zip object directly into extract_path.
+
+    Only the central directory and the selected members are fetched. Returns
+    the number of member bytes written. If index is given it receives the
+    object's head metadata and the (size, CRC-32) of every member, read from
+    the central directory.
+    """
+    range_file = ObjectRangeFile(storage, bucket, key, size)
+    with zipfile.ZipFile(range_file) as zipf:
+        infos = sorted(zipf.infolist(), key=lambda info: info.header_offset)
+        central_directory_offset = zipf.start_dir
+    if index is not None:
+        index["metadata"] = range_file.metadata
+        index["members"] = {
+            info.filename: (info.file_size, info.CRC)
+            for info in infos
+            if not info.is_dir()
+        }
+
+    extract_root = Path(os.path.realpath(extract_path))
+    for info in infos:
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(
+                f"{bucket}/{key} member {info.filename} is compressed; "
+                "range extraction only supports ZIP_STORED archives"
+            )
+        member_target(extract_root, info.filename)
+
+    batches = plan_member_batches(
+        infos,
+        central_directory_offset,
+        lambda info: member_filter is None or member_filter(info.filename),
+        batch_size,
+    )
+    logging.debug(
+        f"Extracting {sum(len(b[2]) for b in batches)} of {len(infos)} members "
+        f"from {bucket}/{key} in {len(batches)} range requests"
+    )
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(extract_batch, range_file, batch, extract_root)
+            for batch in batches
+        ]
+        for future in as_completed(futures):
+            written += future.result()
+    return written
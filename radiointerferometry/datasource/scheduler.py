@@ -0,0 +1,337 @@
+import time
+import random
+import logging
+import threading
+
+from typing import Callable, Optional
+
+MB = 1024 * 1024
+
+DEFAULT_INITIAL_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 64
+# S3 sustains about 3500 writes and 5500 reads per second per prefix.
+DEFAULT_REQUESTS_PER_SECOND = 3500
+DEFAULT_THROTTLE_RETRIES = 4
+DEFAULT_BACKOFF = 0.1
+MAX_BACKOFF = 10.0
+# A request slower than this multiple of the baseline latency signals queueing.
+DEFAULT_LATENCY_TOLERANCE = 3.0
+LATENCY_DECREASE_FACTOR = 0.9
+THROTTLE_DECREASE_FACTOR = 0.5
+# Latencies below this are noise, never a sign of queueing.
+MIN_LATENCY = 0.005
+# Fraction by which the baseline latency drifts up towards slower samples.
+BASELINE_DRIFT = 0.01
+
+THROTTLE_CODES = {
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "TooManyRequests",
+    "TooManyRequestsException",
+    "ServiceUnavailable",
+    "503",
+    "429",
+}
+
+
+def is_throttle_error(exc: Exception) -> bool:
+    """Whether exc is the backend asking us to slow down (SlowDown, 503, 429)."""
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        code = str(response.get("Error", {}).get("Code", ""))
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if code in THROTTLE_CODES or status in (429, 503):
+            return True
+    message = str(exc)
+    return any(code in message for code in ("SlowDown", "Throttl", "TooManyRequests"))
+
+
+class BucketState:
+    """Concurrency limit, token budget and latency estimates of one bucket."""
+
+    def __init__(self, initial_limit: float, requests_per_second: float):
+        self.limit = initial_limit
+        self.in_flight = 0
+        self.rate = requests_per_second
+        self.tokens = requests_per_second
+        self.refilled_at = time.monotonic()
+        self.baseline = None
+        self.last_decrease = 0.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.rate, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+
+class RequestScheduler:
+    """Admission control for object-storage requests, shared by a worker.
+
+    Every request of a bucket takes a concurrency slot and a token from the
+    bucket's budget of requests_per_second. The concurrency limit follows
+    AIMD: it grows by one per window of successful requests and is cut by
+    THROTTLE_DECREASE_FACTOR on SlowDown/503 responses, and mildly when
+    latency climbs above latency_tolerance times the lowest latency seen,
+    which means requests are queueing somewhere. Limits are cut at most
+    once per window, i.e. only by requests started after the last cut.
+    Throttled requests are retried with jittered exponential backoff.
+
+    Latency is measured until the call returns; for streamed GETs that is
+    the time to first byte, and the body is read outside the slot.
+
+    A scheduler is never pickled with its state: objects shipped to another
+    process get that process's request_scheduler instead.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        throttle_retries: int = DEFAULT_THROTTLE_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+    ):
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.throttle_retries = throttle_retries
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self._buckets = {}
+        self._condition = threading.Condition()
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.errors = 0
+        self.wait_time = 0.0
+
+    def __reduce__(self):
+        return process_scheduler, ()
+
+    def limit(self, bucket: str) -> float:
+        with self._condition:
+            return self._state(bucket).limit
+
+    def counters(self, since: dict = None) -> dict:
+        """Request/throttle counters, optionally relative to an earlier snapshot."""
+        with self._condition:
+            counters = {
+                "requests": self.requests,
+                "requests_throttled": self.throttled,
+                "request_retries": self.retries,
+                "request_errors": self.errors,
+                "request_wait_s": self.wait_time,
+            }
+        if since:
+            counters = {name: value - since[name] for name, value in counters.items()}
+        return counters
+
+    def call(
+        self,
+        bucket: str,
+        function: Callable,
+        args: tuple = (),
+        kwargs: Optional[dict] = None,
+        size: int = 0,
+    ):
+        """Runs function(*args, **kwargs) as a request against bucket.
+
+        size, the bytes the request moves when known, normalises its
+        latency so large range GETs and small HEADs share one baseline.
+        """
+        kwargs = kwargs or {}
+        for attempt in range(self.throttle_retries + 1):
+            started = self._acquire(bucket)
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                self._release(bucket, started, size, throttled=throttled, failed=True)
+                if not throttled or attempt == self.throttle_retries:
+                    raise
+                delay = random.uniform(0, min(MAX_BACKOFF, self.backoff * 2**attempt))
+                logging.warning(
+                    f"Request to {bucket} throttled ({e}), retrying in {delay:.2f}s "
+                    f"with concurrency limit {self.limit(bucket):.1f}"
+                )
+                with self._condition:
+                    self.retries += 1
+                time.sleep(delay)
+            else:
+                self._release(bucket, started, size)
+                return result
+
+    def _state(self, bucket: str) -> BucketState:
+        if bucket not in self._buckets:
+            self._buckets[bucket] = BucketState(
+                self.initial_concurrency, self.requests_per_second
+            )
+        return self._buckets[bucket]
+
+    def _acquire(self, bucket: str) -> float:
+        start = time.monotonic()
+        with self._condition:
+            state = self._state(bucket)
+            while True:
+                now = time.monotonic()
+                state.refill(now)
+                if state.in_flight < int(state.limit) and state.tokens >= 1:
+                    break
+                timeout = None
+                if state.tokens < 1:
+                    timeout = (1 - state.tokens) / state.rate
+                self._condition.wait(timeout)
+            state.in_flight += 1
+            state.tokens -= 1
+            self.requests += 1
+            self.wait_time += now - start
+        return now
+
+    def _release(
+        self,
+        bucket: str,
+        started: float,
+        size: int,
+        throttled: bool = False,
+        failed: bool = False,
+    ):
+        now = time.monotonic()
+        with self._condition:
+            state = self._state(bucket)
+            state.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self._decrease(state, started, now, THROTTLE_DECREASE_FACTOR)
+            elif failed:
+                self.errors += 1
+            else:
+                latency = (now - started) / max(size / MB, 1)
+                if state.baseline is None or latency < state.baseline:
+                    state.baseline = latency
+                else:
+                    state.baseline += (latency - state.baseline) * BASELINE_DRIFT
+                if latency > self.latency_tolerance * max(state.baseline, MIN_LATENCY):
+                    self._decrease(state, started, now, LATENCY_DECREASE_FACTOR)
+                elif state.in_flight + 1 >= int(state.limit):
+                    # Only grow a limit that is actually being used.
+                    state.limit = min(
+                        self.max_concurrency, state.limit + 1 / state.limit
+                    )
+            self._condition.notify_all()
+
+    def _decrease(self, state: BucketState, started: float, now: float, factor):
+        if started < state.last_decrease:
+            return
+        state.limit = max(1.0, state.limit * factor)
+        state.last_decrease = now
+        logging.debug(f"Request concurrency limit lowered to {state.limit:.1f}")
+
+
+# Storage calls and the position of their bucket argument.
+STORAGE_REQUESTS = {
+    "get_object": 0,
+    "put_object": 0,
+    "head_object": 0,
+    "list_objects": 0,
+    "list_keys": 0,
+    "delete_object": 0,
+    "delete_objects": 0,
+    "download_file": 0,
+    "upload_file": 1,
+}
+CLIENT_REQUESTS = {
+    "create_multipart_upload",
+    "upload_part",
+    "complete_multipart_upload",
+    "abort_multipart_upload",
+    "get_object",
+    "put_object",
+    "head_object",
+}
+
+
+def request_size(kwargs: dict, body=None) -> int:
+    """Bytes moved by a request, from its Range header or body, 0 if unknown."""
+    byte_range = (kwargs.get("extra_get_args") or {}).get("Range", "")
+    if byte_range.startswith("bytes="):
+        start, _, end = byte_range[len("bytes=") :].partition("-")
+        if start and end:
+            return int(end) - int(start) + 1
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return len(body)
+    return 0
+
+
+class ScheduledStorage:
+    """lithops Storage whose requests go through a RequestScheduler.
+
+    Everything else, and the attributes the wrapped storage lacks, behave
+    exactly as on the wrapped object.
+    """
+
+    def __init__(self, storage, scheduler: RequestScheduler):
+        self.storage = storage
+        self.scheduler = scheduler
+
+    def __reduce__(self):
+        # __getattr__ would be consulted before storage is restored.
+        return ScheduledStorage, (self.storage, self.scheduler)
+
+    def get_client(self):
+        return ScheduledClient(self.storage.get_client(), self.scheduler)
+
+    def __getattr__(self, name):
+        attr = getattr(self.storage, name)
+        if name not in STORAGE_REQUESTS:
+            return attr
+        position = STORAGE_REQUESTS[name]
+
+        def scheduled(*args, **kwargs):
+            bucket = kwargs.get(
+                "bucket", args[position] if len(args) > position else None
+            )
+            body = kwargs.get("body", args[2] if len(args) > 2 else None)
+            return self.scheduler.call(
+                bucket, attr, args, kwargs, size=request_size(kwargs, body)
+            )
+
+        return scheduled
+
+
+class ScheduledClient:
+    """S3-style client (boto3 keyword calls) behind a RequestScheduler."""
+
+    def __init__(self, client, scheduler: RequestScheduler):
+        self.client = client
+        self.scheduler = scheduler
+
+    def __reduce__(self):
+        return ScheduledClient, (self.client, self.scheduler)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in CLIENT_REQUESTS:
+            return attr
+
+        def scheduled(*args, **kwargs):
+            return self.scheduler.call(
+                kwargs.get("Bucket"),
+                attr,
+                args,
+                kwargs,
+                size=request_size({}, kwargs.get("Body")),
+            )
+
+        return scheduled
+
+
+# One scheduler per worker process, shared by its data sources.
+request_scheduler = RequestScheduler()
+
+
+def process_scheduler() -> RequestScheduler:
+    """The scheduler of the current process, for unpickled data sources."""
+    return request_scheduler
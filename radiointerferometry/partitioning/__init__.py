@@ -1 +1,15 @@
 from .static_partition import StaticPartitioner
+from .writer import WriteStats, write_rows
+from .manifest import PartitionManifest, PartitionEntry, manifest_key
+from .planner import (
+    InputTimes,
+    Segment,
+    ChannelRange,
+    PlannedPartition,
+    PartitionPlan,
+    plan_partitions,
+    partition_boundaries,
+    balanced_boundaries,
+    merge_timesteps,
+    plan_channel_ranges,
+)
@@ -0,0 +1,179 @@
+import re
+import json
+import hashlib
+
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+from lithops.storage.utils import StorageNoSuchKeyError
+from radiointerferometry.datasource import ObjectMetadata
+
+MB = 1024 * 1024
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+PARTITION_NAME = re.compile(r"(?:^|/)partition_(\d+)\.ms(?:\.zip)?$")
+
+
+def manifest_key(prefix: str) -> str:
+    """Key of the manifest for the partitions under prefix.
+
+    The manifest sits next to the partition prefix, not inside it, so
+    listings of the prefix keep returning partitions only.
+    """
+    return f"{prefix.rstrip('/')}{MANIFEST_SUFFIX}"
+
+
+def file_checksum(path, chunk_size: int = 4 * MB) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return f"sha256:{sha256.hexdigest()}"
+
+
+def skew_stats(values) -> Optional[Dict[str, float]]:
+    """Spread of partition sizes; max_over_mean is the makespan cost of skew."""
+    if not values:
+        return None
+    mean = sum(values) / len(values)
+    std = (sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5
+    return {
+        "min": min(values),
+        "max": max(values),
+        "mean": mean,
+        "max_over_mean": max(values) / mean if mean else None,
+        "cv": std / mean if mean else None,
+    }
+
+
+@dataclass
+class PartitionEntry:
+    key: str
+    size: int
+    start_row: int
+    end_row: int
+    time_start: Optional[float]
+    time_end: Optional[float]
+    flagged_fraction: Optional[float]
+    # sha256 of the zip object, None for partitions staged without zipping
+    checksum: Optional[str]
+    # Channels of one spectral window for frequency partitions, None when
+    # the partition holds every channel of the inputs.
+    spectral_window: Optional[int] = None
+    start_channel: Optional[int] = None
+    end_channel: Optional[int] = None
+    freq_start: Optional[float] = None
+    freq_end: Optional[float] = None
+    # Manifest generation that published the partition
+    generation: int = 0
+
+    @property
+    def rows(self) -> int:
+        return self.end_row - self.start_row
+
+    def overlaps(self, time_start: float = None, time_end: float = None) -> bool:
+        if self.time_start is None:
+            return False
+        if time_start is not None and self.time_end < time_start:
+            return False
+        if time_end is not None and self.time_start > time_end:
+            return False
+        return True
+
+
+@dataclass
+class PartitionManifest:
+    """Index of the partitions published by the partitioner for one identifier."""
+
+    bucket: str
+    prefix: str
+    identifier: str
+    partitions: List[PartitionEntry] = field(default_factory=list)
+    version: int = MANIFEST_VERSION
+    # What partitions were balanced on and their skew in rows and bytes;
+    # absent from manifests published before balancing existed.
+    balance: Optional[str] = None
+    skew: Optional[Dict[str, Dict[str, float]]] = None
+    # Bumped by every append; downstream steps that processed generation g
+    # only recompute the partitions of later generations.
+    generation: int = 0
+    # Keys of the inputs the partitions were cut from, so appends fetch only
+    # new ones; absent from manifests published before appends tracked them.
+    inputs: Optional[List[str]] = None
+
+    @property
+    def key(self) -> str:
+        return manifest_key(self.prefix)
+
+    @property
+    def total_size(self) -> int:
+        return sum(partition.size for partition in self.partitions)
+
+    @property
+    def time_end(self) -> Optional[float]:
+        """Last TIME covered by the partitions."""
+        ends = [p.time_end for p in self.partitions if p.time_end is not None]
+        return max(ends) if ends else None
+
+    @property
+    def end_row(self) -> int:
+        """Rows covered by the partitions; appended partitions continue from it."""
+        return max((p.end_row for p in self.partitions), default=0)
+
+    @property
+    def next_index(self) -> int:
+        """Index after the highest partition_<i> published.
+
+        Empty partitions are never published, so the indices can have gaps
+        and the number of entries is not a free index.
+        """
+        matches = [PARTITION_NAME.search(p.key) for p in self.partitions]
+        return max((int(m.group(1)) for m in matches if m), default=-1) + 1
+
+    def changed_since(self, generation: int) -> List[PartitionEntry]:
+        """Partitions published after generation, the ones to recompute downstream."""
+        return [p for p in self.partitions if p.generation > generation]
+
+    def objects(
+        self,
+        time_start: float = None,
+        time_end: float = None,
+        since_generation: int = None,
+    ):
+        """Partitions as ObjectMetadata, optionally pruned to a TIME range.
+
+        With since_generation, only partitions published after it are listed.
+        """
+        partitions = self.partitions
+        if since_generation is not None:
+            partitions = self.changed_since(since_generation)
+        if time_start is not None or time_end is not None:
+            partitions = [p for p in partitions if p.overlaps(time_start, time_end)]
+        return [
+            ObjectMetadata(key=p.key, size=p.size, etag=p.checksum) for p in partitions
+        ]
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+    @classmethod
+    def from_json(cls, data) -> "PartitionManifest":
+        content = json.loads(data)
+        partitions = [PartitionEntry(**p) for p in content.pop("partitions")]
+        return cls(partitions=partitions, **content)
+
+    def publish(self, storage):
+        self.partitions.sort(key=lambda p: (p.start_row, p.freq_start or 0))
+        self.skew = {
+            "rows": skew_stats([p.rows for p in self.partitions]),
+            "bytes": skew_stats([p.size for p in self.partitions]),
+        }
+        storage.put_object(self.bucket, self.key, self.to_json().encode("utf-8"))
+
+    @classmethod
+    def load(cls, storage, bucket: str, prefix: str) -> Optional["PartitionManifest"]:
+        """Reads the manifest for prefix, or None if it was never published."""
+        try:
+            data = storage.get_object(bucket, manifest_key(prefix))
+        except StorageNoSuchKeyError:
+            return None
+        return cls.from_json(data)
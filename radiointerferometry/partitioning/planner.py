@@ -0,0 +1,360 @@
+import json
+import numpy as np
+
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+BALANCE_TIME = "time"
+BALANCE_ROWS = "rows"
+BALANCE_BYTES = "bytes"
+BALANCE_MODES = (BALANCE_TIME, BALANCE_ROWS, BALANCE_BYTES)
+
+
+@dataclass
+class InputTimes:
+    """What planning needs from one input MS: its shape and TIME column."""
+
+    name: str
+    nrows: int
+    ncols: int
+    times: np.ndarray
+    # Bytes of the MS on disk, for balancing partitions by size
+    size_bytes: int = 0
+
+    @property
+    def row_bytes(self) -> float:
+        return self.size_bytes / self.nrows if self.nrows else 0.0
+
+    def to_timesteps(self) -> dict:
+        """Compact form of a time-ordered input: its timesteps and their rows."""
+        step_times, step_rows = timesteps(self.times)
+        return {
+            "name": self.name,
+            "nrows": self.nrows,
+            "ncols": self.ncols,
+            "size_bytes": self.size_bytes,
+            "step_times": step_times,
+            "step_rows": step_rows,
+        }
+
+    @classmethod
+    def from_timesteps(cls, summary: dict) -> "InputTimes":
+        summary = dict(summary)
+        times = np.repeat(summary.pop("step_times"), summary.pop("step_rows"))
+        return cls(times=times, **summary)
+
+    @property
+    def time_start(self) -> Optional[float]:
+        return float(self.times.min()) if len(self.times) else None
+
+    @property
+    def time_end(self) -> Optional[float]:
+        return float(self.times.max()) if len(self.times) else None
+
+
+@dataclass
+class Segment:
+    """Rows [start_row, end_row) of input input_index."""
+
+    input_index: int
+    start_row: int
+    end_row: int
+
+    @property
+    def rows(self) -> int:
+        return self.end_row - self.start_row
+
+
+@dataclass
+class ChannelRange:
+    """Channels [start_channel, end_channel) of one spectral window."""
+
+    spectral_window: int
+    start_channel: int
+    end_channel: int
+
+    @property
+    def channels(self) -> int:
+        return self.end_channel - self.start_channel
+
+
+@dataclass
+class PlannedPartition:
+    """A partition as row ranges of the inputs, in output row order.
+
+    start_row and end_row are the partition's rows in the TIME-sorted
+    concatenation of all inputs, as recorded in the manifest.
+    """
+
+    index: int
+    start_row: int
+    end_row: int
+    time_start: Optional[float]
+    time_end: Optional[float]
+    segments: List[Segment] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return self.end_row - self.start_row
+
+
+@dataclass
+class PartitionPlan:
+    """Partitions of a set of inputs, serializable for remote workers."""
+
+    inputs: List[str]
+    partitions: List[PlannedPartition]
+
+    def last_use(self) -> Dict[int, int]:
+        """Index of the last partition reading each input."""
+        last = {}
+        for partition in self.partitions:
+            for segment in partition.segments:
+                last[segment.input_index] = partition.index
+        return last
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data) -> "PartitionPlan":
+        content = json.loads(data)
+        partitions = []
+        for p in content["partitions"]:
+            segments = [Segment(**s) for s in p.pop("segments")]
+            partitions.append(PlannedPartition(segments=segments, **p))
+        return cls(inputs=content["inputs"], partitions=partitions)
+
+
+def equal_duration_boundaries(
+    time_start: float, time_end: float, num_partitions: int
+) -> np.ndarray:
+    """Inner boundaries cutting [time_start, time_end] into equal durations.
+
+    A row belongs to partition p when boundaries[p - 1] <= TIME <
+    boundaries[p]; the last partition takes everything after the last
+    boundary.
+    """
+    chunk_duration = (time_end - time_start) / num_partitions
+    return time_start + chunk_duration * np.arange(1, num_partitions)
+
+
+def timesteps(times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct TIME values of a time-ordered input and the rows at each.
+
+    Runs of equal TIME are found with one comparison of neighbours, O(n)
+    instead of the O(n log n) of np.unique.
+    """
+    if not len(times):
+        return times[:0], np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], times[1:] != times[:-1])))
+    return times[starts], np.diff(np.append(starts, len(times)))
+
+
+def merge_sorted(
+    a_times: np.ndarray, a_rows: np.ndarray, b_times: np.ndarray, b_rows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges two timelines, adding the rows (or weights) of timesteps in both.
+
+    Each element's position in the merged timeline is its own index plus
+    the number of elements of the other timeline before it, found with
+    searchsorted; ties put a's element first so equal timesteps end up
+    next to each other and are added with reduceat.
+    """
+    a_position = np.arange(len(a_times)) + np.searchsorted(b_times, a_times, "left")
+    b_position = np.arange(len(b_times)) + np.searchsorted(a_times, b_times, "right")
+    times = np.empty(
+        len(a_times) + len(b_times), dtype=np.result_type(a_times, b_times)
+    )
+    rows = np.empty(len(times), dtype=np.result_type(a_rows, b_rows))
+    times[a_position], rows[a_position] = a_times, a_rows
+    times[b_position], rows[b_position] = b_times, b_rows
+    if not len(times):
+        return times, rows
+    starts = np.flatnonzero(np.concatenate(([True], times[1:] != times[:-1])))
+    return times[starts], np.add.reduceat(rows, starts)
+
+
+def merge_timesteps(
+    inputs: List[InputTimes], weigh_bytes: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """k-way merge of the TIME columns of time-ordered inputs.
+
+    Returns the distinct timesteps of all inputs together and the number
+    of rows at each, or their estimated bytes with weigh_bytes. Timelines
+    are merged pairwise in rounds, so k inputs of n rows cost O(n log k)
+    without concatenating or sorting the rows.
+    """
+    runs = []
+    for i in inputs:
+        times, rows = timesteps(i.times)
+        runs.append((times, rows * i.row_bytes) if weigh_bytes else (times, rows))
+    if not runs:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    while len(runs) > 1:
+        runs = [
+            merge_sorted(*runs[i], *runs[i + 1]) if i + 1 < len(runs) else runs[i]
+            for i in range(0, len(runs), 2)
+        ]
+    return runs[0]
+
+
+def balanced_boundaries(
+    step_times: np.ndarray, step_weights: np.ndarray, num_partitions: int
+) -> np.ndarray:
+    """Inner boundaries giving partitions of about equal total weight.
+
+    Boundaries fall on timesteps only, so a timestep is never split: each
+    cut goes to the timestep whose cumulative weight is closest to its
+    share of the total. A single timestep heavier than a share leaves the
+    partitions around it empty rather than being divided.
+    """
+    cumulative = np.concatenate(([0], np.cumsum(step_weights)))
+    targets = cumulative[-1] * np.arange(1, num_partitions) / num_partitions
+    after = np.clip(np.searchsorted(cumulative, targets), 1, len(step_times))
+    closer_before = targets - cumulative[after - 1] < cumulative[after] - targets
+    steps = np.maximum(after - closer_before, 1)
+    # A boundary past the last timestep leaves the partitions after it empty.
+    return np.append(step_times, np.inf)[steps]
+
+
+def partition_boundaries(
+    inputs: List[InputTimes], num_partitions: int, balance: str = BALANCE_TIME
+) -> np.ndarray:
+    """Inner TIME boundaries of num_partitions over time-ordered inputs.
+
+    balance is what partitions get equal amounts of: duration (time), rows
+    or estimated bytes, the last two weighing each timestep of the merged
+    timeline by its rows or its rows times the bytes per row of each input.
+    """
+    if balance not in BALANCE_MODES:
+        raise ValueError(f"balance must be one of {BALANCE_MODES}, not {balance!r}")
+    if balance == BALANCE_TIME:
+        # Only the first and last TIME of each input matter, no merge needed.
+        ordered = [i.times for i in inputs if len(i.times)]
+        if not ordered:
+            return np.zeros(num_partitions - 1)
+        return equal_duration_boundaries(
+            min(times[0] for times in ordered),
+            max(times[-1] for times in ordered),
+            num_partitions,
+        )
+    step_times, step_weights = merge_timesteps(
+        inputs, weigh_bytes=balance == BALANCE_BYTES
+    )
+    if not len(step_times):
+        return np.zeros(num_partitions - 1)
+    if not step_weights.sum() > 0:
+        return equal_duration_boundaries(step_times[0], step_times[-1], num_partitions)
+    return balanced_boundaries(step_times, step_weights, num_partitions)
+
+
+def plan_partitions(
+    inputs: List[InputTimes], boundaries: np.ndarray
+) -> List[PlannedPartition]:
+    """Maps TIME boundaries to row ranges of each time-ordered input.
+
+    Every input is cut with searchsorted at the same boundaries, so no
+    global sort or row list is built: partition p takes, from each input,
+    the rows between its cut p - 1 and its cut p. Inputs must be sorted
+    by TIME.
+    """
+    cuts = [
+        np.concatenate(
+            ([0], np.searchsorted(i.times, boundaries, side="left"), [len(i.times)])
+        )
+        for i in inputs
+    ]
+    # Inputs are visited in order of their first timestamp, which keeps the
+    # rows of time-disjoint inputs in TIME order.
+    order = sorted(
+        range(len(inputs)),
+        key=lambda i: (inputs[i].time_start is None, inputs[i].time_start or 0),
+    )
+
+    partitions = []
+    start_row = 0
+    for p in range(len(boundaries) + 1):
+        segments = [
+            Segment(i, int(cuts[i][p]), int(cuts[i][p + 1]))
+            for i in order
+            if cuts[i][p + 1] > cuts[i][p]
+        ]
+        rows = sum(segment.rows for segment in segments)
+        time_start = time_end = None
+        if segments:
+            time_start = min(
+                float(inputs[s.input_index].times[s.start_row]) for s in segments
+            )
+            time_end = max(
+                float(inputs[s.input_index].times[s.end_row - 1]) for s in segments
+            )
+        partitions.append(
+            PlannedPartition(
+                p, start_row, start_row + rows, time_start, time_end, segments
+            )
+        )
+        start_row += rows
+    return partitions
+
+
+def plan_append(
+    inputs: List[InputTimes],
+    time_after: Optional[float],
+    num_partitions: int,
+    balance: str = BALANCE_TIME,
+) -> List[PlannedPartition]:
+    """Plans num_partitions over the rows of inputs after time_after.
+
+    Rows at or before time_after are the ones already partitioned. The
+    new partitions keep row numbers in the concatenation of all inputs, so
+    they continue after the covered rows. Returns no partitions when
+    nothing is newer than time_after.
+    """
+    if time_after is None:
+        return plan_partitions(
+            inputs, partition_boundaries(inputs, num_partitions, balance)
+        )
+    first_new = np.nextafter(time_after, np.inf)
+    new = [
+        InputTimes(
+            i.name,
+            i.nrows,
+            i.ncols,
+            i.times[np.searchsorted(i.times, first_new) :],
+            i.size_bytes,
+        )
+        for i in inputs
+    ]
+    if not any(len(i.times) for i in new):
+        return []
+    # The first boundary sets the covered rows apart as partition 0.
+    boundaries = np.concatenate(
+        ([first_new], partition_boundaries(new, num_partitions, balance))
+    )
+    return plan_partitions(inputs, boundaries)[1:]
+
+
+def plan_channel_ranges(
+    num_channels: Dict[int, int], num_ranges: int
+) -> List[ChannelRange]:
+    """Splits every spectral window into num_ranges contiguous channel ranges.
+
+    num_channels maps spectral window ids to their channel counts. With
+    num_ranges=1 partitions follow the spectral windows; otherwise the
+    ranges of a window differ by at most one channel, and a window with
+    fewer channels than num_ranges gets one range per channel.
+    """
+    ranges = []
+    for spectral_window, channels in sorted(num_channels.items()):
+        n = max(1, min(num_ranges, channels))
+        edges = np.arange(n + 1) * channels // n
+        ranges.extend(
+            ChannelRange(spectral_window, int(start), int(end))
+            for start, end in zip(edges[:-1], edges[1:])
+        )
+    return ranges
+
+
+def is_time_sorted(times: np.ndarray) -> bool:
+    return bool(np.all(times[1:] >= times[:-1]))
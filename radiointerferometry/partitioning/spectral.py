@@ -0,0 +1,96 @@
+import numpy as np
+
+from pathlib import PosixPath
+from typing import Dict, List, Optional, Tuple
+from casacore.tables import table, makecoldesc
+
+from .planner import ChannelRange
+from .writer import CHUNK_ROWS, WriteStats, copy_columns, create_empty
+
+# Columns with a frequency axis, sliced when present in the MS
+FREQUENCY_COLUMNS = (
+    "DATA",
+    "FLAG",
+    "WEIGHT_SPECTRUM",
+    "SIGMA_SPECTRUM",
+    "MODEL_DATA",
+    "CORRECTED_DATA",
+)
+# Per-channel columns of the SPECTRAL_WINDOW subtable
+CHANNEL_COLUMNS = ("CHAN_FREQ", "CHAN_WIDTH", "EFFECTIVE_BW", "RESOLUTION")
+# casacore column options
+DIRECT = 1
+FIXED_SHAPE = 4
+
+
+def spectral_windows(ms_path) -> Dict[int, Tuple[int, int]]:
+    """DATA_DESC_IDs of an MS mapped to their spectral window and channel count."""
+    ms_path = PosixPath(ms_path)
+    with table(str(ms_path / "DATA_DESCRIPTION"), ack=False) as data_description:
+        windows = data_description.getcol("SPECTRAL_WINDOW_ID")
+    with table(str(ms_path / "SPECTRAL_WINDOW"), ack=False) as spectral_window:
+        num_channels = spectral_window.getcol("NUM_CHAN")
+    return {
+        data_desc_id: (int(window), int(num_channels[window]))
+        for data_desc_id, window in enumerate(windows)
+    }
+
+
+def write_channel_slice(
+    selection,
+    partition_name,
+    channels: ChannelRange,
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> WriteStats:
+    """Writes the rows of selection keeping only the channels in channels.
+
+    Frequency columns are recreated without a fixed shape, since their
+    cells shrink to the sliced channels, and read with getcolslice so only
+    the sliced channels are moved.
+    """
+    out = create_empty(selection, partition_name, columns)
+    sliced = [c for c in FREQUENCY_COLUMNS if c in out.colnames()]
+    blc = [channels.start_channel, -1]
+    trc = [channels.end_channel - 1, -1]
+    with out:
+        for column in sliced:
+            desc = selection.getcoldesc(column)
+            desc.pop("shape", None)
+            desc["option"] = desc.get("option", 0) & ~(DIRECT | FIXED_SHAPE)
+            desc["dataManagerType"] = "StandardStMan"
+            desc["dataManagerGroup"] = f"{column}_channels"
+            out.removecols(column)
+            out.addcols(makecoldesc(column, desc))
+        return copy_columns(
+            selection,
+            out,
+            slices={column: (blc, trc) for column in sliced},
+            chunk_rows=chunk_rows,
+        )
+
+
+def slice_spectral_window(
+    partition_name, channels: ChannelRange
+) -> Tuple[float, float]:
+    """Rewrites a spectral window of a partition to the sliced channels.
+
+    Returns the lowest and highest channel frequency left. The per-channel
+    columns are variable-shaped in the MS standard, so their cells can be
+    replaced by shorter arrays.
+    """
+    window = channels.spectral_window
+    start, end = channels.start_channel, channels.end_channel
+    path = str(PosixPath(partition_name) / "SPECTRAL_WINDOW")
+    with table(path, readonly=False, ack=False) as spectral_window:
+        for column in CHANNEL_COLUMNS:
+            values = spectral_window.getcell(column, window)
+            spectral_window.putcell(column, window, values[start:end])
+        frequencies = spectral_window.getcell("CHAN_FREQ", window)
+        widths = spectral_window.getcell("CHAN_WIDTH", window)
+        spectral_window.putcell("NUM_CHAN", window, channels.channels)
+        spectral_window.putcell("REF_FREQUENCY", window, float(frequencies[0]))
+        spectral_window.putcell(
+            "TOTAL_BANDWIDTH", window, float(np.sum(np.abs(widths)))
+        )
+    return float(np.min(frequencies)), float(np.max(frequencies))
@@ -1,169 +1,1055 @@
 import os
+import itertools
+import multiprocessing
+import lithops
 import concurrent.futures
 import shutil
 import numpy as np
 import hashlib
 
 from casacore.tables import table
-from radiointerferometry.datasource import LithopsDataSource, InputS3
+from radiointerferometry.datasource import (
+    InputS3,
+    OutputS3,
+    LocalDataSource,
+    create_datasource,
+)
+from radiointerferometry.datasource.lithops_datasource import output_key
 from pathlib import PosixPath
-from radiointerferometry.utils import get_dir_size, setup_logging
+from typing import Dict, List, Optional
+from radiointerferometry.utils import get_available_cpus, get_dir_size, setup_logging
+from .manifest import PartitionEntry, PartitionManifest, file_checksum
+from .writer import WriteStats, copy_columns, create_empty, write_rows
+from .spectral import (
+    slice_spectral_window,
+    spectral_windows,
+    write_channel_slice,
+)
+from .planner import (
+    ChannelRange,
+    InputTimes,
+    PartitionPlan,
+    PlannedPartition,
+    BALANCE_MODES,
+    BALANCE_TIME,
+    is_time_sorted,
+    partition_boundaries,
+    plan_append,
+    plan_channel_ranges,
+    plan_partitions,
+)
 
 MB = 1024 * 1024
+FLAG_SCAN_ROWS = 10000
+THREAD_EXECUTOR = "thread"
+PROCESS_EXECUTOR = "process"
+EXECUTORS = (THREAD_EXECUTOR, PROCESS_EXECUTOR)
 
 
 class StaticPartitioner:
-    def __init__(self, log_level="INFO"):
+    def __init__(self, log_level="INFO", datasource_config=None):
         self.__log_level = log_level
+        self.__datasource_config = datasource_config
+        self.__columns = None
+        self.__executor = THREAD_EXECUTOR
+        self.__input_keys = None
         self.__logger = setup_logging(self.__log_level)
         self.__logger.info("Started StaticPartitioner")
 
-    def __generate_concatenated_identifier(self, ms_tables, num_partitions):
+    def __generate_concatenated_identifier(
+        self,
+        inputs,
+        num_partitions,
+        balance=BALANCE_TIME,
+        channel_ranges=None,
+        columns=None,
+    ):
+        """Hash of the inputs' shapes and names; inputs are tables or InputTimes."""
         hash_md5 = hashlib.md5()
 
         total_rows = 0
         total_cols = 0
         ms_names = []
 
-        for ms in ms_tables:
-            total_rows += ms.nrows()
-            total_cols = max(total_cols, ms.ncols())
-            ms_names.append(ms.name())
+        for ms in inputs:
+            if isinstance(ms, InputTimes):
+                nrows, ncols, name = ms.nrows, ms.ncols, ms.name
+            else:
+                nrows, ncols, name = ms.nrows(), ms.ncols(), ms.name()
+            total_rows += nrows
+            total_cols = max(total_cols, ncols)
+            ms_names.append(name)
 
         metadata = f"{total_rows}_{total_cols}_{num_partitions}_{'_'.join(ms_names)}"
+        if balance != BALANCE_TIME:
+            # Time-balanced sets keep the identifiers they always had.
+            metadata = f"{metadata}_{balance}"
+        if channel_ranges is not None:
+            metadata = f"{metadata}_channels{channel_ranges}"
+        if columns is not None:
+            metadata = f"{metadata}_{'_'.join(sorted(columns))}"
         hash_md5.update(metadata.encode("utf-8"))
         identifier = hash_md5.hexdigest()
         identifier = identifier.strip("/")
         return identifier
 
-    def __create_partition(self, i, start_row, end_row, ms, msout):
-        self.datasource = LithopsDataSource()
+    def __flagged_fraction(self, partition_name):
+        with table(str(partition_name), ack=False) as partition:
+            if "FLAG" not in partition.colnames():
+                return None
+            flagged = 0
+            total = 0
+            for start in range(0, partition.nrows(), FLAG_SCAN_ROWS):
+                flags = partition.getcol("FLAG", startrow=start, nrow=FLAG_SCAN_ROWS)
+                flagged += int(np.count_nonzero(flags))
+                total += flags.size
+        return flagged / total if total else None
+
+    def __create_partition(self, i, start_row, end_row, ms, times, msout, first_row=0):
+        """Writes rows [start_row, end_row) of the sorted inputs as partition i.
+
+        ms and times hold those rows from index start_row - first_row on.
+        """
+        datasource = create_datasource(self.__datasource_config)
         self.__logger.debug(
             f"Creating partition {i} with rows from {start_row} to {end_row - 1}..."
         )
-        partition = ms.selectrows(list(range(start_row, end_row)))
         partition_name = PosixPath(f"partition_{i}.ms")
-        partition.copy(str(partition_name), deep=True)
-        partition.close()
+        stats = write_rows(
+            ms,
+            partition_name,
+            start_row - first_row,
+            end_row - start_row,
+            self.__columns,
+        )
+        self.__logger.info(f"Partition {i} written: {stats}")
+
+        first, last = start_row - first_row, end_row - 1 - first_row
+        time_start = float(times[first]) if end_row > start_row else None
+        time_end = float(times[last]) if end_row > start_row else None
+        return self.__publish_partition(
+            datasource, partition_name, start_row, end_row, time_start, time_end, msout
+        )
+
+    def __create_planned_partition(self, planned: PlannedPartition, tables, msout):
+        """Writes a partition from row ranges of one or more open inputs."""
+        datasource = create_datasource(self.__datasource_config)
+        self.__logger.debug(
+            f"Creating partition {planned.index} from {len(planned.segments)} "
+            f"input segments ({planned.rows} rows)..."
+        )
+        partition_name = PosixPath(f"partition_{planned.index}.ms")
+        first = tables[planned.segments[0].input_index]
+        out = create_empty(first, partition_name, self.__columns)
+        if time_disjoint(planned, tables):
+            # Segments follow each other in TIME and are appended as they are.
+            stats = WriteStats(0, 0, 0.0)
+            for s in planned.segments:
+                stats += copy_columns(tables[s.input_index], out, s.start_row, s.rows)
+        else:
+            # Inputs overlapping in TIME are merged, sorting only this partition.
+            parts = [
+                tables[s.input_index].query(limit=s.rows, offset=s.start_row)
+                for s in planned.segments
+            ]
+            selection = table(parts).sort("TIME")
+            stats = copy_columns(selection, out)
+            selection.close()
+            for part in parts:
+                part.close()
+        out.close()
+        self.__logger.info(f"Partition {planned.index} written: {stats}")
+
+        return self.__publish_partition(
+            datasource,
+            partition_name,
+            planned.start_row,
+            planned.end_row,
+            planned.time_start,
+            planned.time_end,
+            msout,
+        )
+
+    def __publish_partition(
+        self,
+        datasource,
+        partition_name,
+        start_row,
+        end_row,
+        time_start,
+        time_end,
+        msout,
+        **spectral,
+    ):
+        """Uploads a written partition and returns its manifest entry and size.
 
+        spectral holds the channel fields of frequency partitions' entries.
+        """
+        i = partition_name.stem.split("_")[-1]
         partition_size = get_dir_size(partition_name)
         self.__logger.debug(
             f"Partition {i} created. Size before zip: {partition_size} bytes"
         )
+        flagged_fraction = self.__flagged_fraction(partition_name)
 
-        zip_filepath = self.datasource.zip_without_compression(partition_name)
-        self.__logger.debug(f"Partition {i} zipped at {zip_filepath}")
+        if isinstance(datasource, LocalDataSource):
+            # Both ends are local, the partition is staged without zipping.
+            datasource.upload_zipped(partition_name, msout)
+            zip_file_size = partition_size
+            checksum = None
+        else:
+            zip_filepath = datasource.zip_without_compression(partition_name)
+            self.__logger.debug(f"Partition {i} zipped at {zip_filepath}")
 
-        # Get the file size before deleting the file
-        zip_file_size = os.path.getsize(zip_filepath)
-        self.__logger.debug(f"Zip file size: {zip_file_size} bytes")
+            # Get the file size and checksum before deleting the file
+            zip_file_size = os.path.getsize(zip_filepath)
+            checksum = file_checksum(zip_filepath)
+            self.__logger.debug(f"Zip file size: {zip_file_size} bytes")
 
-        self.datasource.upload_file(zip_filepath, msout)
+            datasource.upload(zip_filepath, msout)
+            os.remove(zip_filepath)
 
-        os.remove(zip_filepath)
         shutil.rmtree(partition_name)
 
         self.__logger.info(f"Partition {i} uploaded.")
 
-        return zip_filepath, partition_size
-
-    def partition_ms(self, msin, num_partitions, msout):
-        self.__logger = setup_logging(self.__log_level)
-
-        self.__logger.info(
-            f"Starting partitioning of {msin} into {num_partitions} partitions..."
+        entry = PartitionEntry(
+            key=output_key(f"{partition_name.name}.zip", msout),
+            size=zip_file_size,
+            start_row=int(start_row),
+            end_row=int(end_row),
+            time_start=time_start,
+            time_end=time_end,
+            flagged_fraction=flagged_fraction,
+            checksum=checksum,
+            **spectral,
         )
+        return entry, partition_size
 
-        self.datasource = LithopsDataSource()
-        ms_to_part = self.datasource.download_directory(msin, PosixPath("/tmp"))
+    def __stage_inputs(self, msin, keys):
+        """Downloads the inputs under msin and returns the paths of their MSs.
+
+        The paths follow keys, as listed by list_inputs, so partitions are
+        planned and named in the same input order partition_ms_distributed
+        uses.
+        """
+        ms_to_part = self.datasource.download(msin, PosixPath("/tmp"))
 
         self.__logger.debug(f"Downloaded files to: {ms_to_part}")
-        full_file_paths = [PosixPath(ms_to_part) / f for f in os.listdir(ms_to_part)]
+        full_file_paths = [PosixPath(ms_to_part) / key.split("/")[-1] for key in keys]
         self.__logger.debug(f"Files ready to be processed: {full_file_paths}")
 
-        mss = []
+        ms_paths = []
         for f_path in full_file_paths:
             if not f_path.exists():
                 self.__logger.debug(f"File not found: {f_path}")
                 continue
             self.__logger.debug(f"Processing file: {f_path}")
-            unzipped_ms = self.datasource.unzip(f_path)
+            if f_path.suffix != ".zip":
+                unzipped_ms = f_path
+            elif f_path.is_dir():
+                # Archive kept unpacked by LocalDataSource
+                unzipped_ms = f_path / f_path.stem
+            else:
+                unzipped_ms = self.datasource.unzip(f_path)
             self.__logger.debug(f"Unzipped contents at: {unzipped_ms}")
+            ms_paths.append(unzipped_ms)
+        return ms_paths
+
+    def __input_times(self, ms) -> InputTimes:
+        return InputTimes(
+            name=ms.name(),
+            nrows=ms.nrows(),
+            ncols=ms.ncols(),
+            times=np.array(ms.getcol("TIME")),
+            size_bytes=get_dir_size(ms.name()),
+        )
+
+    def __read_times(self, ms_path) -> InputTimes:
+        """Opens an input just long enough to read its shape and TIME column."""
+        with table(str(ms_path), ack=False) as ms:
+            return self.__input_times(ms)
 
+    def partition_ms(
+        self,
+        msin,
+        num_partitions,
+        msout,
+        streaming=False,
+        balance=BALANCE_TIME,
+        channel_ranges=None,
+        columns=None,
+        executor=THREAD_EXECUTOR,
+        append_to=None,
+    ):
+        """Partitions the MSs under msin into num_partitions TIME ranges.
+
+        balance picks what the partitions get equal shares of: duration
+        ("time", the default), rows ("rows") or estimated bytes ("bytes"),
+        cutting only between timesteps. Row and byte balancing keep one
+        slow partition from setting the makespan of the next step when the
+        observation has gaps or a varying number of baselines.
+
+        Inputs that are each ordered by TIME are cut at rows planned from a
+        merge of their TIME columns, without sorting the concatenated
+        table; only unordered inputs go through ms.sort("TIME").
+
+        With streaming, only the TIME columns are read to plan the
+        partitions, which are then written one at a time from the one or
+        two inputs they cover; each input is closed and deleted once its
+        last partition is uploaded. Streaming needs time-ordered inputs and
+        falls back to the concatenate-and-sort path otherwise.
+
+        With channel_ranges, partitions are also cut along frequency: every
+        spectral window of every input is split into channel_ranges ranges
+        (1 splits by spectral window only), and each of the num_partitions
+        TIME ranges is tiled by them, so with num_partitions=1 the split is
+        along frequency alone. Tiles never mix inputs or spectral windows.
+        Their start_row and end_row count rows in the same order as TIME
+        partitions do, so a tile's row range lies within the row range of
+        the TIME partition that covers the same TIME range.
+
+        Partitions are written in row blocks by partitioning.writer, keeping
+        only the given columns when columns is set.
+
+        executor="process" writes the TIME partitions in a pool of processes
+        sized to the CPUs the cgroup allows, each opening the inputs
+        read-only by path, so table copies, zipping and checksums run in
+        parallel instead of behind the GIL. Frequency partitions always use
+        threads.
+
+        append_to is the prefix of a partition set published before (what
+        partition_ms returned) for observations that keep growing: only the
+        inputs its manifest doesn't list are fetched, and their rows after
+        the last TIME it covers are partitioned into num_partitions new
+        partitions appended under that prefix. The set must be TIME
+        partitions with the same balance. msout is not used then. The
+        manifest's generation is bumped and the new entries carry it, so
+        downstream steps only recompute those.
+        """
+        self.__logger = setup_logging(self.__log_level)
+        if balance not in BALANCE_MODES:
+            raise ValueError(f"balance must be one of {BALANCE_MODES}, not {balance!r}")
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}, not {executor!r}")
+        self.__executor = executor
+
+        self.__logger.info(
+            f"Starting partitioning of {msin} into {num_partitions} partitions..."
+        )
+
+        self.datasource = create_datasource(self.__datasource_config)
+        self.__columns = columns
+        if append_to is not None:
+            return self.__partition_append(msin, num_partitions, append_to, balance)
+
+        self.__input_keys = list_inputs(self.datasource, msin)
+        ms_paths = self.__stage_inputs(msin, self.__input_keys)
+
+        if channel_ranges is not None:
+            return self.__partition_spectral(
+                ms_paths, num_partitions, channel_ranges, msout, balance
+            )
+
+        if streaming:
+            inputs = [self.__read_times(ms_path) for ms_path in ms_paths]
+            if all(is_time_sorted(i.times) for i in inputs):
+                return self.__partition_streaming(
+                    ms_paths, inputs, num_partitions, msout, balance
+                )
+            self.__logger.info("Inputs are not time-ordered, not streaming")
+
+        mss = []
+        for unzipped_ms in ms_paths:
             ms_table = table(str(unzipped_ms), ack=False)
             mss.append(ms_table)
             self.__logger.info(
                 f"Number of rows in the measurement set: {ms_table.nrows()}"
             )
-        ms = table(mss)
-        identifier = self.__generate_concatenated_identifier(mss, num_partitions)
+        identifier = self.__generate_concatenated_identifier(
+            mss, num_partitions, balance, columns=self.__columns
+        )
         self.__logger.info(
             f"Unique identifier for concatenated measurement sets: {identifier}"
         )
 
         msout.key = f"{msout.key}{identifier}/"
-        if not self.datasource.exists(msout):
-            self.__logger.info(f"Number of rows in the measurement set: {ms.nrows()}")
-            self.__logger.info(
-                f"Number of columns in the measurement set: {ms.ncols()}"
+        if not partitions_exist(self.datasource, msout):
+            manifest = PartitionManifest(
+                bucket=msout.bucket,
+                prefix=msout.key,
+                identifier=identifier,
+                balance=balance,
+                inputs=self.__input_keys,
             )
+            inputs = [self.__input_times(ms_table) for ms_table in mss]
+            if all(is_time_sorted(i.times) for i in inputs):
+                self.__logger.info(
+                    "Inputs are time-ordered, partitioning without a sort"
+                )
+                boundaries = partition_boundaries(inputs, num_partitions, balance)
+                partition_sizes = self.__partition_planned(
+                    mss, plan_partitions(inputs, boundaries), msout, manifest
+                )
+            else:
+                # Boundaries only depend on the multiset of timesteps, which
+                # sorting a copy of each TIME column gives cheaply.
+                for i in inputs:
+                    i.times = np.sort(i.times)
+                boundaries = partition_boundaries(inputs, num_partitions, balance)
+                del inputs
+                partition_sizes = self.__partition_sorted(
+                    mss, boundaries, msout, manifest
+                )
+
+            # Published last, so a manifest only exists for a complete set.
+            self.__publish_manifest(manifest, self.datasource.storage)
 
-            ms_sorted = ms.sort("TIME")
-            total_rows = ms_sorted.nrows()
-            self.__logger.info(f"Total rows in the measurement set: {total_rows}")
-            times = np.array(ms_sorted.getcol("TIME"))
-            total_duration = times[-1] - times[0]
+            total_partition_size = sum(partition_sizes)
+            self.__logger.debug(
+                f"Total size of all partitions: {total_partition_size / MB:.2f} MB"
+            )
             self.__logger.debug(
-                f"Total duration in the measurement set: {total_duration}"
-            )
-
-            chunk_duration = total_duration / num_partitions
-            partitions_info = []
-            start_time = times[0]
-            partition_count = 0
-
-            for i in range(num_partitions):
-                if i < num_partitions - 1:
-                    end_time = start_time + chunk_duration
-                    end_index = np.searchsorted(times, end_time, side="left")
-                else:
-                    end_index = total_rows
-                start_index = np.searchsorted(times, start_time, side="left")
-                partitions_info.append((partition_count, start_index, end_index))
-                start_time = end_time
-                partition_count += 1
-
-            partition_sizes = []
-            with concurrent.futures.ThreadPoolExecutor() as executor:
+                f"Partitioning completed. {len(partition_sizes)} partitions created."
+            )
+        else:
+            self.__logger.info(
+                f"Partitions already exist in {msout.bucket}/{msout.key}. Skipping partitioning."
+            )
+        for ms_table in mss:
+            ms_table.close()
+        return InputS3(bucket=msout.bucket, key=msout.key)
+
+    def __publish_manifest(self, manifest, storage):
+        manifest.publish(storage)
+        self.__logger.info(
+            f"Published manifest {manifest.bucket}/{manifest.key} with {len(manifest.partitions)} partitions"
+        )
+        for measure, stats in manifest.skew.items():
+            if stats:
+                self.__logger.info(
+                    f"Partition {measure} ({manifest.balance}-balanced): "
+                    f"min {stats['min']:.0f}, max {stats['max']:.0f}, "
+                    f"mean {stats['mean']:.0f}, max/mean {stats['max_over_mean'] or 0:.2f}, "
+                    f"cv {stats['cv'] or 0:.2f}"
+                )
+
+    def __partition_planned(self, mss, plan, msout, manifest):
+        """Cuts time-ordered inputs at the planned rows, concurrently."""
+        if self.__executor == PROCESS_EXECUTOR:
+            paths = {i: ms.name() for i, ms in enumerate(mss)}
+            with self.__process_pool() as executor:
                 futures = [
                     executor.submit(
-                        self.__create_partition,
-                        info[0],
-                        info[1],
-                        info[2],
-                        ms_sorted,
+                        run_in_process,
+                        self.__log_level,
+                        self.__datasource_config,
+                        "_create_planned_from_paths",
+                        planned,
+                        paths,
                         msout,
+                        self.__columns,
                     )
-                    for info in partitions_info
+                    for planned in plan
+                    if planned.segments
                 ]
-                for future in concurrent.futures.as_completed(futures):
-                    partition_file, partition_size = future.result()
-                    partition_sizes.append(partition_size)
-                    self.__logger.debug(
-                        f"Partition file {partition_file} with size {partition_size / MB:.2f} MB created and ready for upload."
+                return self.__collect(futures, manifest)
+
+        tables = dict(enumerate(mss))
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(self.__create_planned_partition, planned, tables, msout)
+                for planned in plan
+                # Partitions falling in a gap of the observation have no rows.
+                if planned.segments
+            ]
+            return self.__collect(futures, manifest)
+
+    def __partition_sorted(self, mss, boundaries, msout, manifest):
+        """Sorts the concatenated inputs by TIME and cuts them at boundaries."""
+        ms = table(mss)
+        self.__logger.info(f"Number of rows in the measurement set: {ms.nrows()}")
+        self.__logger.info(f"Number of columns in the measurement set: {ms.ncols()}")
+
+        ms_sorted = ms.sort("TIME")
+        total_rows = ms_sorted.nrows()
+        self.__logger.info(f"Total rows in the measurement set: {total_rows}")
+        times = np.array(ms_sorted.getcol("TIME"))
+        total_duration = times[-1] - times[0]
+        self.__logger.debug(f"Total duration in the measurement set: {total_duration}")
+
+        cuts = np.concatenate(
+            ([0], np.searchsorted(times, boundaries, side="left"), [total_rows])
+        )
+        partitions_info = [(i, cuts[i], cuts[i + 1]) for i in range(len(cuts) - 1)]
+
+        if self.__executor == PROCESS_EXECUTOR:
+            # Processes reopen the inputs, so they get the sorted order as
+            # row numbers of the concatenation instead of ms_sorted.
+            order = np.asarray(ms_sorted.rownumbers(ms))
+            paths = [ms_table.name() for ms_table in mss]
+            with self.__process_pool() as executor:
+                futures = [
+                    executor.submit(
+                        run_in_process,
+                        self.__log_level,
+                        self.__datasource_config,
+                        "_create_sorted_from_paths",
+                        i,
+                        order[start_row:end_row],
+                        paths,
+                        start_row,
+                        end_row,
+                        times[start_row:end_row],
+                        msout,
+                        self.__columns,
                     )
+                    for i, start_row, end_row in partitions_info
+                ]
+                partition_sizes = self.__collect(futures, manifest)
+            ms_sorted.close()
+            return partition_sizes
 
-            total_partition_size = sum(partition_sizes)
-            self.__logger.debug(
-                f"Total size of all partitions: {total_partition_size / MB:.2f} MB"
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(
+                    self.__create_partition,
+                    info[0],
+                    info[1],
+                    info[2],
+                    ms_sorted,
+                    times,
+                    msout,
+                )
+                for info in partitions_info
+            ]
+            partition_sizes = self.__collect(futures, manifest)
+        ms_sorted.close()
+        return partition_sizes
+
+    def __process_pool(self):
+        workers = get_available_cpus()
+        self.__logger.info(f"Writing partitions in {workers} processes")
+        # Spawned, not forked: the parent holds open tables and client threads.
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _create_planned_from_paths(self, planned, paths, msout, columns):
+        """Writes a planned partition, opening its inputs read-only from paths."""
+        self.__columns = columns
+        tables = {
+            s.input_index: table(str(paths[s.input_index]), ack=False)
+            for s in planned.segments
+        }
+        try:
+            return self.__create_planned_partition(planned, tables, msout)
+        finally:
+            for ms in tables.values():
+                ms.close()
+
+    def _create_sorted_from_paths(
+        self, i, rows, paths, start_row, end_row, times, msout, columns
+    ):
+        """Writes rows of the concatenation of the inputs at paths as partition i."""
+        self.__columns = columns
+        inputs = [table(str(path), ack=False) for path in paths]
+        ms = table(inputs)
+        selection = ms.selectrows(rows)
+        try:
+            return self.__create_partition(
+                i, start_row, end_row, selection, times, msout, first_row=start_row
             )
+        finally:
+            selection.close()
+            ms.close()
+            for ms_table in inputs:
+                ms_table.close()
 
-            ms_sorted.close()
+    def __collect(self, futures, manifest):
+        """Adds the entries of finished partitions to manifest, returns their sizes."""
+        partition_sizes = []
+        for future in concurrent.futures.as_completed(futures):
+            entry, partition_size = future.result()
+            partition_sizes.append(partition_size)
+            manifest.partitions.append(entry)
             self.__logger.debug(
-                f"Partitioning completed. {len(partition_sizes)} partitions created."
+                f"Partition file {entry.key} with size {partition_size / MB:.2f} MB created and ready for upload."
+            )
+        return partition_sizes
+
+    def __partition_append(self, msin, num_partitions, append_to, balance):
+        """Partitions the rows under msin after the last TIME append_to covers.
+
+        The manifest is checked before anything is fetched. Only the inputs
+        it doesn't list are staged, so the cost follows the new data, and
+        their rows continue after the rows it already covers. Manifests
+        published before inputs were recorded have every input staged and
+        the covered rows skipped by TIME instead; the manifest records them
+        afterwards, so later appends are incremental. New rows at or before
+        the last covered TIME are refused with a ValueError rather than
+        dropped.
+        """
+        manifest = PartitionManifest.load(
+            self.datasource.storage, append_to.bucket, append_to.key
+        )
+        if manifest is None:
+            raise ValueError(
+                f"No partition manifest under {append_to.bucket}/{append_to.key} to append to"
+            )
+        if (manifest.balance or BALANCE_TIME) != balance:
+            raise ValueError(
+                f"{manifest.key} is balanced by {manifest.balance or BALANCE_TIME}, "
+                f"can't append partitions balanced by {balance}"
             )
+        if any(p.spectral_window is not None for p in manifest.partitions):
+            raise ValueError(
+                f"{manifest.key} holds frequency partitions, which can't be appended to"
+            )
+
+        keys = list_inputs(self.datasource, msin)
+        if manifest.inputs is None:
+            ms_paths = self.__stage_inputs(msin, keys)
+            first_row = 0
         else:
+            new_keys = [key for key in keys if key not in manifest.inputs]
+            ms_paths = [
+                self.__fetch_input(InputS3(bucket=msin.bucket, key=key))
+                for key in new_keys
+            ]
+            first_row = manifest.end_row
+        inputs = [self.__read_times(ms_path) for ms_path in ms_paths]
+        if not all(is_time_sorted(i.times) for i in inputs):
+            raise ValueError("Appending partitions needs inputs ordered by TIME")
+        # Rows at or before the covered TIME would be dropped, leaving a hole
+        # in the row numbers; only the rows already partitioned may be there.
+        if manifest.time_end is not None:
+            covered = sum(
+                int(np.searchsorted(i.times, manifest.time_end, side="right"))
+                for i in inputs
+            )
+            overlapping = covered - (manifest.end_row - first_row)
+            if overlapping > 0:
+                raise ValueError(
+                    f"{overlapping} rows of the inputs under {msin.bucket}/{msin.key} "
+                    f"fall at or before TIME {manifest.time_end}, which "
+                    f"{manifest.key} already covers; only later rows can be "
+                    "appended, partition overlapping inputs into a new set"
+                )
+
+        plan = [
+            planned
+            for planned in plan_append(
+                inputs, manifest.time_end, num_partitions, balance
+            )
+            if planned.segments
+        ]
+        del inputs
+        if not plan:
+            self.__logger.info(
+                f"No rows after {manifest.time_end} in the inputs, {manifest.key} is up to date"
+            )
+            return InputS3(bucket=manifest.bucket, key=manifest.prefix)
+        # New partitions are named and numbered after the ones already published.
+        for k, planned in enumerate(plan):
+            planned.index = manifest.next_index + k
+            planned.start_row += first_row
+            planned.end_row += first_row
+
+        generation = manifest.generation + 1
+        self.__logger.info(
+            f"Appending {len(plan)} partitions after TIME {manifest.time_end} "
+            f"to {manifest.bucket}/{manifest.prefix} as generation {generation}"
+        )
+        added = PartitionManifest(
+            bucket=manifest.bucket,
+            prefix=manifest.prefix,
+            identifier=manifest.identifier,
+        )
+        mss = [table(str(ms_path), ack=False) for ms_path in ms_paths]
+        msout = OutputS3(bucket=manifest.bucket, key=manifest.prefix)
+        self.__partition_planned(mss, plan, msout, added)
+        for ms_table in mss:
+            ms_table.close()
+
+        for entry in added.partitions:
+            entry.generation = generation
+        manifest.partitions.extend(added.partitions)
+        manifest.generation = generation
+        manifest.inputs = keys
+        self.__publish_manifest(manifest, self.datasource.storage)
+        return InputS3(bucket=manifest.bucket, key=manifest.prefix)
+
+    def __create_tile(self, index, selection, channels: ChannelRange, start_row, msout):
+        """Writes the rows of selection in one channel range as a partition."""
+        datasource = create_datasource(self.__datasource_config)
+        partition_name = PosixPath(f"partition_{index}.ms")
+        times = selection.getcol("TIME")
+        self.__logger.debug(
+            f"Creating partition {index} from {selection.nrows()} rows, channels "
+            f"{channels.start_channel}-{channels.end_channel - 1} of spectral "
+            f"window {channels.spectral_window}..."
+        )
+        stats = write_channel_slice(selection, partition_name, channels, self.__columns)
+        self.__logger.info(f"Partition {index} written: {stats}")
+        freq_start, freq_end = slice_spectral_window(partition_name, channels)
+        return self.__publish_partition(
+            datasource,
+            partition_name,
+            start_row,
+            start_row + selection.nrows(),
+            float(np.min(times)),
+            float(np.max(times)),
+            msout,
+            spectral_window=channels.spectral_window,
+            start_channel=channels.start_channel,
+            end_channel=channels.end_channel,
+            freq_start=freq_start,
+            freq_end=freq_end,
+        )
+
+    def __partition_spectral(
+        self, ms_paths, num_partitions, channel_ranges, msout, balance
+    ):
+        inputs = [self.__read_times(ms_path) for ms_path in ms_paths]
+        identifier = self.__generate_concatenated_identifier(
+            inputs, num_partitions, balance, channel_ranges, self.__columns
+        )
+        self.__logger.info(
+            f"Unique identifier for concatenated measurement sets: {identifier}"
+        )
+        msout.key = f"{msout.key}{identifier}/"
+        if partitions_exist(self.datasource, msout):
+            self.__logger.info(
+                f"Partitions already exist in {msout.bucket}/{msout.key}. Skipping partitioning."
+            )
+            return InputS3(bucket=msout.bucket, key=msout.key)
+
+        # TIME ranges are shared by every input, so tiles of the same range
+        # line up across subbands.
+        unsorted = [not is_time_sorted(i.times) for i in inputs]
+        for i in inputs:
+            i.times = np.sort(i.times)
+        boundaries = partition_boundaries(inputs, num_partitions, balance)
+        edges = np.concatenate(([-np.inf], boundaries, [np.inf]))
+        del inputs
+
+        manifest = PartitionManifest(
+            bucket=msout.bucket,
+            prefix=msout.key,
+            identifier=identifier,
+            balance=balance,
+        )
+        # Rows are numbered TIME range by TIME range, then input by input in
+        # list_inputs order, like the TIME partitions count them, so the rows of
+        # every tile lie within those of the TIME partition of its range.
+        windows = [spectral_windows(ms_path) for ms_path in ms_paths]
+        mss = [table(str(ms_path), ack=False) for ms_path in ms_paths]
+        names = itertools.count()
+        start_row = 0
+        selections = []
+        futures = []
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            for time_start, time_end in zip(edges[:-1], edges[1:]):
+                for ms, ms_windows, sort in zip(mss, windows, unsorted):
+                    for data_desc_id, (window, num_channels) in ms_windows.items():
+                        conditions = [f"DATA_DESC_ID == {data_desc_id}"]
+                        conditions += time_conditions(time_start, time_end)
+                        selection = ms.query(
+                            " && ".join(conditions),
+                            sortlist="TIME" if sort else "",
+                        )
+                        selections.append(selection)
+                        if selection.nrows() == 0:
+                            continue
+                        for channels in plan_channel_ranges(
+                            {window: num_channels}, channel_ranges
+                        ):
+                            futures.append(
+                                executor.submit(
+                                    self.__create_tile,
+                                    next(names),
+                                    selection,
+                                    channels,
+                                    start_row,
+                                    msout,
+                                )
+                            )
+                        start_row += selection.nrows()
+            self.__collect(futures, manifest)
+        for selection in selections:
+            selection.close()
+        for ms in mss:
+            ms.close()
+        self.__logger.info(
+            f"Partitioned {len(ms_paths)} inputs into {len(futures)} frequency partitions"
+        )
+
+        self.__publish_manifest(manifest, self.datasource.storage)
+        return InputS3(bucket=msout.bucket, key=msout.key)
+
+    def partition_ms_distributed(
+        self,
+        msin,
+        num_partitions,
+        msout,
+        balance=BALANCE_TIME,
+        columns=None,
+        executor_config: Optional[Dict] = None,
+    ):
+        """Partitions the MSs under msin on lithops workers, one per partition.
+
+        Called from the driver. A map of planning invocations, one per
+        input, reads the TIME columns and returns only their timesteps;
+        the driver plans the partitions from them and maps one worker per
+        partition over the plan. Each worker fetches the inputs its
+        partition covers, writes and uploads it, and returns its manifest
+        entry; the driver publishes the manifest under the same
+        identifier-keyed prefix partition_ms uses. Inputs that are not
+        ordered by TIME are partitioned by partition_ms in one invocation.
+        executor_config is passed to lithops.FunctionExecutor.
+
+        The driver's data source stays out of self, which is pickled into
+        every invocation; workers create their own.
+        """
+        self.__logger = setup_logging(self.__log_level)
+        if balance not in BALANCE_MODES:
+            raise ValueError(f"balance must be one of {BALANCE_MODES}, not {balance!r}")
+        datasource = create_datasource(self.__datasource_config)
+        function_executor = lithops.FunctionExecutor(
+            log_level=self.__log_level, **(executor_config or {})
+        )
+        extra_env = {"HOME": "/tmp"}
+
+        keys = list_inputs(datasource, msin)
+        self.__logger.info(
+            f"Planning {len(keys)} inputs under {msin.bucket}/{msin.key}"
+        )
+        futures = function_executor.map(
+            self._read_input_times,
+            [{"input_s3": InputS3(bucket=msin.bucket, key=key)} for key in keys],
+            extra_env=extra_env,
+        )
+        summaries = function_executor.get_result(futures)
+        if not all(summary["sorted"] for summary in summaries):
+            self.__logger.info(
+                "Inputs are not time-ordered, partitioning in one worker"
+            )
+            future = function_executor.call_async(
+                self.partition_ms,
+                {
+                    "msin": msin,
+                    "num_partitions": num_partitions,
+                    "msout": msout,
+                    "balance": balance,
+                    "columns": columns,
+                },
+                extra_env=extra_env,
+            )
+            return function_executor.get_result(future)
+
+        inputs = [InputTimes.from_timesteps(s["timesteps"]) for s in summaries]
+        identifier = self.__generate_concatenated_identifier(
+            inputs, num_partitions, balance, columns=columns
+        )
+        self.__logger.info(
+            f"Unique identifier for concatenated measurement sets: {identifier}"
+        )
+        msout.key = f"{msout.key}{identifier}/"
+        if partitions_exist(datasource, msout):
+            self.__logger.info(
+                f"Partitions already exist in {msout.bucket}/{msout.key}. Skipping partitioning."
+            )
+            return InputS3(bucket=msout.bucket, key=msout.key)
+
+        plan = PartitionPlan(
+            inputs=keys,
+            partitions=plan_partitions(
+                inputs, partition_boundaries(inputs, num_partitions, balance)
+            ),
+        )
+        del inputs
+        plan_json = plan.to_json()
+        futures = function_executor.map(
+            self._create_partition_remote,
+            [
+                {
+                    "plan_json": plan_json,
+                    "index": planned.index,
+                    "bucket": msin.bucket,
+                    "msout": msout,
+                    "columns": columns,
+                }
+                for planned in plan.partitions
+                if planned.segments
+            ],
+            extra_env=extra_env,
+        )
+        manifest = PartitionManifest(
+            bucket=msout.bucket,
+            prefix=msout.key,
+            identifier=identifier,
+            balance=balance,
+            inputs=keys,
+        )
+        for entry, partition_size in function_executor.get_result(futures):
+            manifest.partitions.append(entry)
+            self.__logger.debug(
+                f"Partition file {entry.key} with size {partition_size / MB:.2f} MB uploaded."
+            )
+        self.__publish_manifest(manifest, datasource.storage)
+        return InputS3(bucket=msout.bucket, key=msout.key)
+
+    def __fetch_input(self, input_s3: InputS3, base_path=PosixPath("/tmp")):
+        """Stages one input, a zipped MS or an MS directory, and returns its path."""
+        if input_s3.key.endswith(".zip"):
+            return self.datasource.extract_zip(input_s3, base_path=base_path)
+        directory = InputS3(bucket=input_s3.bucket, key=f"{input_s3.key.rstrip('/')}/")
+        return self.datasource.download(directory, base_path)
+
+    def _read_input_times(self, input_s3: InputS3):
+        """Planning invocation: the timesteps of one input, not its rows."""
+        self.__logger = setup_logging(self.__log_level)
+        self.datasource = create_datasource(self.__datasource_config)
+        ms_path = self.__fetch_input(input_s3)
+        input_times = self.__read_times(ms_path)
+        shutil.rmtree(ms_path, ignore_errors=True)
+        ordered = is_time_sorted(input_times.times)
+        return {
+            "sorted": ordered,
+            "timesteps": input_times.to_timesteps() if ordered else None,
+        }
+
+    def _create_partition_remote(self, plan_json, index, bucket, msout, columns):
+        """Partition worker: writes and uploads partition index of the plan."""
+        self.__logger = setup_logging(self.__log_level)
+        self.datasource = create_datasource(self.__datasource_config)
+        plan = PartitionPlan.from_json(plan_json)
+        planned = plan.partitions[index]
+        paths = {
+            s.input_index: self.__fetch_input(
+                InputS3(bucket=bucket, key=plan.inputs[s.input_index])
+            )
+            for s in planned.segments
+        }
+        return self._create_planned_from_paths(planned, paths, msout, columns)
+
+    def __partition_streaming(self, ms_paths, inputs, num_partitions, msout, balance):
+        identifier = self.__generate_concatenated_identifier(
+            inputs, num_partitions, balance, columns=self.__columns
+        )
+        self.__logger.info(
+            f"Unique identifier for concatenated measurement sets: {identifier}"
+        )
+        msout.key = f"{msout.key}{identifier}/"
+        if partitions_exist(self.datasource, msout):
             self.__logger.info(
                 f"Partitions already exist in {msout.bucket}/{msout.key}. Skipping partitioning."
             )
+            return InputS3(bucket=msout.bucket, key=msout.key)
+
+        plan = PartitionPlan(
+            inputs=[str(path) for path in ms_paths],
+            partitions=plan_partitions(
+                inputs, partition_boundaries(inputs, num_partitions, balance)
+            ),
+        )
+        # Only the plan is kept; the TIME columns are not needed any more.
+        del inputs
+
+        last_use = plan.last_use()
+        manifest = PartitionManifest(
+            bucket=msout.bucket,
+            prefix=msout.key,
+            identifier=identifier,
+            balance=balance,
+            inputs=self.__input_keys,
+        )
+        tables = {}
+        for planned in plan.partitions:
+            if not planned.segments:
+                continue
+            for segment in planned.segments:
+                if segment.input_index not in tables:
+                    tables[segment.input_index] = table(
+                        plan.inputs[segment.input_index], ack=False
+                    )
+            entry, partition_size = self.__create_planned_partition(
+                planned, tables, msout
+            )
+            manifest.partitions.append(entry)
+            self.__logger.debug(
+                f"Partition file {entry.key} with size {partition_size / MB:.2f} MB uploaded."
+            )
+            for index in [i for i, last in last_use.items() if last == planned.index]:
+                tables.pop(index).close()
+                shutil.rmtree(plan.inputs[index], ignore_errors=True)
+                self.__logger.debug(f"Released input {plan.inputs[index]}")
+
+        self.__publish_manifest(manifest, self.datasource.storage)
         return InputS3(bucket=msout.bucket, key=msout.key)
+
+
+def run_in_process(log_level, datasource_config, method, *args):
+    """Entry point of pool processes, calling method on a fresh partitioner.
+
+    Nothing open in the parent (tables, storage clients) crosses over; the
+    process opens what it needs itself.
+    """
+    partitioner = StaticPartitioner(log_level, datasource_config)
+    return getattr(partitioner, method)(*args)
+
+
+def input_keys(keys: List[str], prefix: str) -> List[str]:
+    """Keys of the inputs under prefix: zipped MSs and MS directories."""
+    inputs = set()
+    for key in keys:
+        relative = key[len(prefix) :].lstrip("/")
+        if relative:
+            inputs.add(f"{prefix.rstrip('/')}/{relative.split('/')[0]}")
+    return sorted(inputs)
+
+
+def partitions_exist(datasource, msout) -> bool:
+    """Whether msout already holds a partition set, so partitioning can be skipped.
+
+    A manifest marks a complete set. Sets partitioned before manifests were
+    published have none, so for them any object under the prefix counts.
+    """
+    if PartitionManifest.load(datasource.storage, msout.bucket, msout.key):
+        return True
+    return datasource.exists(msout)
+
+
+def list_inputs(datasource, msin) -> List[str]:
+    """Keys of the inputs under msin, from one listing, in key order.
+
+    partition_ms and partition_ms_distributed both plan, and so name, their
+    partitions in this order.
+    """
+    return input_keys(
+        [obj.key for obj in datasource.list_metadata(msin.bucket, msin.key)],
+        msin.key,
+    )
+
+
+def time_conditions(time_start: float, time_end: float) -> List[str]:
+    """TaQL for time_start <= TIME < time_end; infinite bounds are left out."""
+    conditions = []
+    if np.isfinite(time_start):
+        conditions.append(f"TIME >= {float(time_start)!r}")
+    if np.isfinite(time_end):
+        conditions.append(f"TIME < {float(time_end)!r}")
+    return conditions
+
+
+def time_disjoint(planned: PlannedPartition, tables) -> bool:
+    """Whether the segments of a partition follow each other in TIME."""
+    previous_end = None
+    for segment in planned.segments:
+        ms = tables[segment.input_index]
+        first = ms.getcell("TIME", segment.start_row)
+        if previous_end is not None and first < previous_end:
+            return False
+        previous_end = ms.getcell("TIME", segment.end_row - 1)
+    return True
@@ -0,0 +1,149 @@
+import time
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from casacore.tables import table
+
+MB = 1024 * 1024
+CHUNK_ROWS = 10000
+
+
+@dataclass
+class WriteStats:
+    """Rows and bytes moved into one partition and how long it took."""
+
+    rows: int
+    bytes: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / MB / self.seconds if self.seconds else 0.0
+
+    def __add__(self, other: "WriteStats") -> "WriteStats":
+        return WriteStats(
+            self.rows + other.rows,
+            self.bytes + other.bytes,
+            self.seconds + other.seconds,
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows} rows, {self.bytes / MB:.2f} MB in {self.seconds:.2f}s "
+            f"({self.rows_per_second:.0f} rows/s, {self.mb_per_second:.2f} MB/s)"
+        )
+
+
+class ColumnReader:
+    """Reads blocks of one column into a reused, preallocated buffer."""
+
+    def __init__(self, source, column, slice_corners, chunk_rows, first_row=0):
+        self.source = source
+        self.column = column
+        self.slice_corners = slice_corners
+        self.buffer = None
+        first = self._get(first_row, 1)
+        if isinstance(first, np.ndarray) and first.dtype != object:
+            self.buffer = np.empty((chunk_rows, *first.shape[1:]), dtype=first.dtype)
+
+    def _get(self, start_row, nrow):
+        if self.slice_corners:
+            blc, trc = self.slice_corners
+            return self.source.getcolslice(
+                self.column, blc, trc, startrow=start_row, nrow=nrow
+            )
+        return self.source.getcol(self.column, startrow=start_row, nrow=nrow)
+
+    def read(self, start_row, nrow):
+        if self.buffer is None:
+            return self._get(start_row, nrow)
+        block = self.buffer[:nrow]
+        try:
+            if self.slice_corners:
+                blc, trc = self.slice_corners
+                self.source.getcolslicenp(
+                    self.column, block, blc, trc, startrow=start_row, nrow=nrow
+                )
+            else:
+                self.source.getcolnp(self.column, block, startrow=start_row, nrow=nrow)
+        except RuntimeError:
+            # Cell shapes differ within the block.
+            self.buffer = None
+            return self._get(start_row, nrow)
+        return block
+
+
+def create_empty(source, partition_name, columns: Optional[List[str]] = None):
+    """Creates partition_name with the description of source but no rows.
+
+    Deep copying an empty selection brings the keywords and subtables of
+    source along. Only the given columns are kept when columns is set.
+    Returns the new table, open for writing.
+    """
+    empty = source.selectrows([])
+    empty.copy(str(partition_name), deep=True)
+    empty.close()
+    out = table(str(partition_name), readonly=False, ack=False)
+    if columns is not None:
+        dropped = [c for c in out.colnames() if c not in columns]
+        if dropped:
+            out.removecols(dropped)
+    return out
+
+
+def copy_columns(
+    source,
+    out,
+    start_row: int = 0,
+    nrow: int = None,
+    slices: Dict[str, Tuple[List[int], List[int]]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> WriteStats:
+    """Appends rows [start_row, start_row + nrow) of source to out.
+
+    The columns of out are moved one at a time in blocks of chunk_rows,
+    read into a buffer allocated once per column with getcolnp, or with
+    getcolslicenp for the columns in slices, given as (blc, trc). Columns
+    whose cells can't fill a fixed buffer (strings, arrays changing shape
+    from row to row) fall back to getcol.
+    """
+    if nrow is None:
+        nrow = source.nrows() - start_row
+    slices = slices or {}
+    begin = time.time()
+    out_row = out.nrows()
+    out.addrows(nrow)
+    nbytes = 0
+    for column in out.colnames():
+        if not nrow or not source.iscelldefined(column, start_row):
+            continue
+        reader = ColumnReader(
+            source, column, slices.get(column), min(chunk_rows, nrow), start_row
+        )
+        for offset in range(0, nrow, chunk_rows):
+            n = min(chunk_rows, nrow - offset)
+            block = reader.read(start_row + offset, n)
+            out.putcol(column, block, startrow=out_row + offset, nrow=n)
+            nbytes += getattr(block, "nbytes", 0)
+    return WriteStats(nrow, nbytes, time.time() - begin)
+
+
+def write_rows(
+    source,
+    partition_name,
+    start_row: int = 0,
+    nrow: int = None,
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> WriteStats:
+    """Writes rows [start_row, start_row + nrow) of source as a new table."""
+    out = create_empty(source, partition_name, columns)
+    try:
+        return copy_columns(source, out, start_row, nrow, chunk_rows=chunk_rows)
+    finally:
+        out.close()
@@ -2,6 +2,8 @@ from .profiler import (
     Profiler,
     profiling_context,
     time_it,
+    ThroughputEstimate,
+    worker_throughput,
     CPUMetric,
     MemoryMetric,
     DiskMetric,
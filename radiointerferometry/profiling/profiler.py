@@ -1,5 +1,6 @@
 import psutil
 import time
+import threading
 import contextlib
 import json
 from dataclasses import dataclass, asdict, fields, field
@@ -20,6 +21,15 @@ class FunctionTimer:
     end_time: float
     duration: float
     operation_type: Type = field(default=None)
+    size_bytes: int = field(default=None)
+    counters: dict = field(default=None)
+
+    @property
+    def throughput(self):
+        """Aggregate MB/s moved by the timed operation, if it reported a size."""
+        if self.size_bytes is None or self.duration <= 0:
+            return None
+        return self.size_bytes / 1024.0**2 / self.duration
 
     def to_dict(self):
         dict_repr = asdict(self)
@@ -38,19 +48,64 @@ class FunctionTimer:
         return (
             f"FunctionTimer(label={self.label}, start_time={self.start_time}, "
             f"end_time={self.end_time}, duration={self.duration}, "
-            f"operation_type={self.operation_type.name if self.operation_type else 'None'})"
+            f"operation_type={self.operation_type.name if self.operation_type else 'None'}, "
+            f"size_bytes={self.size_bytes}, counters={self.counters})"
         )
 
 
+class ThroughputEstimate:
+    """Exponentially weighted MB/s of the transfers a worker has made so far."""
+
+    def __init__(self, weight: float = 0.5):
+        self.weight = weight
+        self.mb_per_s = None
+        self._lock = threading.Lock()
+
+    def update(self, size_bytes: int, duration: float):
+        if not size_bytes or duration <= 0:
+            return
+        sample = size_bytes / 1024.0**2 / duration
+        with self._lock:
+            if self.mb_per_s is None:
+                self.mb_per_s = sample
+            else:
+                self.mb_per_s += self.weight * (sample - self.mb_per_s)
+
+
+# Network throughput measured by the data sources of this worker process.
+worker_throughput = ThroughputEstimate()
+
+
 def time_it(label, function, function_type, time_records, *args, **kwargs):
     print(f"label: {label}, type of function: {type(function)}")
 
+    # Data sources expose the bytes moved by their last transfer, so bound
+    # methods like data_source.download get their throughput recorded too.
+    owner = getattr(function, "__self__", None)
+    if hasattr(owner, "last_transfer_bytes"):
+        owner.last_transfer_bytes = None
+        owner.last_transfer_counters = None
+    # Data sources behind a request scheduler also report the requests,
+    # throttles and retries seen while the call ran.
+    scheduler = getattr(owner, "scheduler", None)
+    requests_since = scheduler.counters() if scheduler else None
+
     start_time = time.time()
     result = function(*args, **kwargs)
     end_time = time.time()
 
+    counters = getattr(owner, "last_transfer_counters", None)
+    if scheduler:
+        counters = {**(counters or {}), **scheduler.counters(requests_since)}
+
     record = FunctionTimer(
-        label, start_time, end_time, (end_time - start_time), function_type
+        label,
+        start_time,
+        end_time,
+        (end_time - start_time),
+        function_type,
+        getattr(owner, "last_transfer_bytes", None),
+        counters,
     )
     time_records.append(record)
 
@@ -447,6 +502,10 @@ class Profiler:
         self.metrics = MetricCollector()
         self.function_timers = []
         self.worker_cost = None
+        # Scratch tier decisions and bytes per tier, see ScratchManager.summary
+        self.worker_scratch = None
+        # Ephemeral storage limit, peak reservation and bytes freed, see DiskBudget
+        self.worker_disk_budget = None
 
     def __len__(self):
         return len(self.metrics)
@@ -491,6 +550,12 @@ class Profiler:
 
         if "worker_ingested_key" in data:
             profiler.worker_ingested_key = data["worker_ingested_key"]
+
+        if "worker_scratch" in data:
+            profiler.worker_scratch = data["worker_scratch"]
+
+        if "worker_disk_budget" in data:
+            profiler.worker_disk_budget = data["worker_disk_budget"]
         return profiler
 
     def __repr__(self):
@@ -530,6 +595,8 @@ class Profiler:
             "worker_chunk_size": self.worker_chunk_size,
             "worker_cost": self.worker_cost,
             "worker_cold_start": self.worker_cold_start,
+            "worker_scratch": self.worker_scratch,
+            "worker_disk_budget": self.worker_disk_budget,
             "metrics": self.metrics.to_dict(),
             "function_timers": [timer.to_dict() for timer in self.function_timers],
         }
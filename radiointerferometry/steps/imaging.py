@@ -8,12 +8,16 @@ from pathlib import PosixPath
 from typing import Dict, List, Optional
 from s3path import S3Path
 from radiointerferometry.datasource import (
-    LithopsDataSource,
+    create_datasource,
     InputS3,
     s3_to_local_path,
     local_path_to_s3,
 )
-from radiointerferometry.utils import detect_runtime_environment
+from radiointerferometry.partitioning import PartitionManifest
+from radiointerferometry.utils import (
+    detect_runtime_environment,
+    DiskBudget,
+)
 from radiointerferometry.profiling import (
     profiling_context,
     CompletedStep,
@@ -25,93 +29,125 @@ from radiointerferometry.utils import setup_logging
 
 class ImagingStep:
     def __init__(
-        self, input_data_path: Dict[str, InputS3], parameters: Dict, log_level
+        self,
+        input_data_path: Dict[str, InputS3],
+        parameters: Dict,
+        log_level,
+        datasource_config: Optional[Dict] = None,
     ):
         self._input_data_path = input_data_path
         self._parameters = parameters
         self._log_level = log_level
+        self._datasource_config = datasource_config
         self._logger = setup_logging(self._log_level)
         self._logger.debug("DP3 Step initialized")
 
-    def execute_step(self, ms: List[InputS3], parameters: bytes):
+    def execute_step(
+        self, ms: List[InputS3], parameters: bytes, sizes: Optional[List[int]] = None
+    ):
         self._logger = setup_logging(self._log_level)
         working_dir = PosixPath(os.getenv("HOME"))
         time_records = []
-        data_source = LithopsDataSource()
+        data_source = create_datasource(self._datasource_config)
         params = pickle.loads(parameters)
 
-        # Cleanup the output directory if it exists
-        for idx, param in enumerate(params):
-            if param == "-name":
-                output_ms = params[idx + 1]
-                posix_source = s3_to_local_path(output_ms)
-                self._logger.debug(f"Posix source: {posix_source}")
-
-                # Ensure the subpath is correctly appended
-                posix_source = posix_source / output_ms.file_name
-                output_dir = posix_source.parent
-                if output_dir.exists():
-                    self._logger.info(f"Cleaning up existing directory: {output_dir}")
-                    for file in output_dir.iterdir():
-                        file.unlink()
-                else:
-                    output_dir.mkdir(parents=True, exist_ok=True)
-
-                params[idx + 1] = str(posix_source)
-                break
-
-        self._logger.info(f"modified params: {params}")
+        # wsclean reads every partition at once; refuse a set that can't fit
+        # next to wsclean's temporary files before downloading any of it.
+        disk_budget = DiskBudget(working_dir)
+        reservation = disk_budget.reserve(2 * sum(sizes or []), "imaging inputs")
         partitions = []
-        for partition in ms:
-            self._logger.info(f"Partition: {partition}")
-            partition_path = time_it(
-                "download_ms",
-                data_source.download,
-                Type.READ,
-                time_records,
-                partition,
-                base_path=working_dir,
-            )
-            partition_path = time_it(
-                "unzip", data_source.unzip, Type.READ, time_records, partition_path
-            )
-            partitions.append(str(partition_path))
-
-        cmd = ["wsclean"]
-        cmd.extend(params)
-        cmd.extend(partitions)
-
-        self._logger.info(f"cmd: {cmd}")
-        proc = sp.Popen(cmd, stdout=sp.PIPE, stderr=sp.PIPE, text=True)
-        stdout, stderr = proc.communicate()
-        self._logger.info("stdout:")
-        self._logger.info(stdout)
-        self._logger.info("stderr:")
-        self._logger.info(stderr)
-
-        directory_path = os.path.dirname(posix_source)
-        files_in_directory = os.listdir(directory_path)
-        image = PosixPath(
-            next(
-                (
-                    os.path.join(directory_path, file)
-                    for file in files_in_directory
-                    if file.endswith("-image.fits")
-                ),
-                None,
+        temp_dir = None
+        try:
+            if "-temp-dir" not in params:
+                params = ["-temp-dir", str(working_dir / "wsclean-tmp")] + params
+            temp_dir = PosixPath(params[params.index("-temp-dir") + 1])
+            temp_dir.mkdir(parents=True, exist_ok=True)
+
+            # Cleanup the output directory if it exists
+            for idx, param in enumerate(params):
+                if param == "-name":
+                    output_ms = params[idx + 1]
+                    posix_source = s3_to_local_path(output_ms)
+                    self._logger.debug(f"Posix source: {posix_source}")
+
+                    # Ensure the subpath is correctly appended
+                    posix_source = posix_source / output_ms.file_name
+                    output_dir = posix_source.parent
+                    if output_dir.exists():
+                        self._logger.info(
+                            f"Cleaning up existing directory: {output_dir}"
+                        )
+                        for file in output_dir.iterdir():
+                            file.unlink()
+                    else:
+                        output_dir.mkdir(parents=True, exist_ok=True)
+
+                    params[idx + 1] = str(posix_source)
+                    break
+
+            self._logger.info(f"modified params: {params}")
+            for partition in ms:
+                self._logger.info(f"Partition: {partition}")
+                partition_path = time_it(
+                    "extract_ms",
+                    data_source.extract_zip,
+                    Type.READ,
+                    time_records,
+                    partition,
+                    base_path=working_dir,
+                )
+                partitions.append(str(partition_path))
+                disk_budget.track(partition_path)
+
+            cmd = ["wsclean"]
+            cmd.extend(params)
+            cmd.extend(partitions)
+
+            self._logger.info(f"cmd: {cmd}")
+            proc = sp.Popen(cmd, stdout=sp.PIPE, stderr=sp.PIPE, text=True)
+            stdout, stderr = proc.communicate()
+            self._logger.info("stdout:")
+            self._logger.info(stdout)
+            self._logger.info("stderr:")
+            self._logger.info(stderr)
+            for partition_path in partitions:
+                disk_budget.consumed(partition_path)
+            disk_budget.consumed(temp_dir)
+
+            directory_path = os.path.dirname(posix_source)
+            files_in_directory = os.listdir(directory_path)
+            image = PosixPath(
+                next(
+                    (
+                        os.path.join(directory_path, file)
+                        for file in files_in_directory
+                        if file.endswith("-image.fits")
+                    ),
+                    None,
+                )
             )
-        )
-        self._logger.debug(f"image_dir: {image}")
-        data_source.upload(image, local_path_to_s3(image))
-        return time_records
+            self._logger.debug(f"image_dir: {image}")
+            data_source.upload(image, local_path_to_s3(image))
+            disk_budget.consumed(directory_path)
+        except BaseException:
+            for path in partitions + ([temp_dir] if temp_dir else []):
+                disk_budget.discard(path)
+            raise
+        finally:
+            disk_budget.release(reservation)
+        return time_records, disk_budget.counters()
 
     def _execute_step(self, id, *args, **kwargs):
         ms = kwargs["kwargs"]["ms"]
         parameters = kwargs["kwargs"]["parameters"]
+        sizes = kwargs["kwargs"].get("sizes")
         self._logger.info(f"Worker executing step with {len(ms)} ms paths")
         with profiling_context(os.getpid()) as profiler:
-            function_timers = self.execute_step(ms, parameters)
+            function_timers, disk_budget_counters = self.execute_step(
+                ms, parameters, sizes
+            )
         profiler.function_timers = function_timers
+        profiler.worker_disk_budget = disk_budget_counters
         profiler.worker_id = id
         env, instance_type = detect_runtime_environment()
         self._logger.info(f"Worker finished step on {env} instance {instance_type}")
@@ -126,12 +162,19 @@ class ImagingStep:
             runtime_cpu=cpus_per_worker,
             log_level=self._log_level,
         )
-        keys = lithops.Storage().list_keys(
-            bucket=self._input_data_path.bucket,
-            prefix=f"{self._input_data_path.key}/",
+        data_source = create_datasource(self._datasource_config)
+        manifest = PartitionManifest.load(
+            data_source.storage,
+            self._input_data_path.bucket,
+            self._input_data_path.key,
         )
-        if f"{self._input_data_path.key}/" in keys:
-            keys.remove(f"{self.input_data_path.key}/")
+        if manifest:
+            objects = manifest.objects()
+        else:
+            objects = data_source.list_metadata(
+                self._input_data_path.bucket, f"{self._input_data_path.key}/"
+            )
+        keys = [obj.key for obj in objects]
         ms = [
             S3Path.from_bucket_key(bucket=self._input_data_path.bucket, key=partition)
             for partition in keys
@@ -146,6 +189,7 @@ class ImagingStep:
                 "kwargs": {
                     "ms": ms,
                     "parameters": parameters,
+                    "sizes": [obj.size for obj in objects],
                 },
             },
             extra_env=extra_env,
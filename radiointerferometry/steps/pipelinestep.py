@@ -5,6 +5,9 @@ import subprocess as sp
 import copy
 import shutil
 
+from collections import deque
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from pathlib import Path
 
@@ -15,41 +18,219 @@ from radiointerferometry.profiling import (
     time_it,
 )
 from radiointerferometry.datasource import (
-    LithopsDataSource,
+    create_datasource,
+    DownloadCache,
     InputS3,
     OutputS3,
     local_path_to_s3,
     LocalPath,
 )
+from radiointerferometry.partitioning import PartitionManifest
 from radiointerferometry.utils import (
     dict_to_parset,
     setup_logging,
     detect_runtime_environment,
     get_memory_limit_cgroupv2,
+    get_memory_available_cgroupv2,
     get_cpu_limit_cgroupv2,
     get_executor_id_lithops,
+    ScratchManager,
+    DiskBudget,
+    MEMORY_TIER,
 )
+from radiointerferometry.utils.scratch import DEFAULT_MEMORY_DIR, ScratchPlacement
+
+MB = 1024 * 1024
+
+
+def lookahead_depth(requested: int, partition_bytes: int, working_dir: Path) -> int:
+    """Clamps the prefetch depth to what the disk and cgroup memory can hold.
+
+    Every partition in flight needs room for its extracted input and its
+    output. Staged files also live in the page cache (or tmpfs), which is
+    charged to the cgroup, so half of each budget is kept as headroom.
+    """
+    if requested <= 0 or partition_bytes <= 0:
+        return max(requested, 0)
+    depth = requested
+    free_disk = shutil.disk_usage(working_dir).free
+    depth = min(depth, free_disk // 2 // (2 * partition_bytes) - 1)
+    available_memory = get_memory_available_cgroupv2()
+    if available_memory is not None:
+        depth = min(depth, available_memory // 2 // partition_bytes - 1)
+    return max(0, int(depth))
+
+
+def with_local_base(params: dict, base_path: Path) -> dict:
+    """Copy of params whose outputs are written under base_path."""
+    params = dict(params)
+    for key, val in params.items():
+        if isinstance(val, OutputS3):
+            val = copy.copy(val)
+            val.base_local_path = str(base_path)
+            params[key] = val
+    return params
+
+
+@dataclass
+class StagedPartition:
+    """A partition whose inputs are in scratch, and what its later phases need."""
+
+    params: dict
+    dp3_params: dict
+    placement: ScratchPlacement
+    reservation: int
+    inputs: List[str] = field(default_factory=list)
 
 
 class DP3Step:
-    def __init__(self, parameters: List[Dict], log_level):
+    def __init__(
+        self,
+        parameters: List[Dict],
+        log_level,
+        datasource_config: Optional[Dict] = None,
+        lookahead: int = 1,
+        memory_scratch_dir: Optional[str] = DEFAULT_MEMORY_DIR,
+    ):
         if isinstance(parameters, dict):
             self.__parameters = [parameters]
         else:
             self.__parameters = parameters
         self.__log_level = log_level
+        # e.g. {"backend": "local", "root": "/mnt/shared"}, see create_datasource
+        self.__datasource_config = datasource_config
+        # Partitions staged ahead of the one DP3 is running on, 0 disables the pipeline
+        self.__lookahead = lookahead
+        # tmpfs for partitions that fit in memory, None stages everything on disk
+        self.__memory_scratch_dir = memory_scratch_dir
+        self.__scratch = None
+        self.__disk_budget = None
+        self.__partition_bytes = None
         self.__logger = setup_logging(self.__log_level)
         self.__logger.debug("DP3 Step initialized")
 
     def __call__(
-        self, func_limit: Optional[int] = None, step_name: Optional[str] = None
+        self,
+        func_limit: Optional[int] = None,
+        step_name: Optional[str] = None,
+        since_generation: Optional[int] = None,
     ):
-        return self.run(func_limit=func_limit, step_name=step_name)
+        return self.run(
+            func_limit=func_limit,
+            step_name=step_name,
+            since_generation=since_generation,
+        )
 
     def execute_step(self, params: dict, id):
         time_records = []
+        data_source = self.__create_datasource()
+        partition = self.__stage(params, data_source, time_records, id)
+        try:
+            self.run_dp3(partition.params, partition.dp3_params, time_records)
+            self.__consume_inputs(partition)
+            self.upload_outputs(partition.params, data_source, time_records)
+        except BaseException:
+            self.__finish(partition, failed=True)
+            raise
+        self.__finish(partition)
+
+        self.__logger.debug(
+            f"Worker id: {id} completed execution. Time records: {time_records}"
+        )
+        return time_records
+
+    def __create_datasource(self):
         working_dir = Path(os.getenv("HOME"))
-        data_source = LithopsDataSource()
+        # Shared inputs (strategy, sourcedb, h5parm) are fetched once per pod.
+        return create_datasource(
+            self.__datasource_config,
+            cache=DownloadCache(working_dir / ".download_cache"),
+        )
+
+    def __stage(self, params: dict, data_source, time_records: list, id):
+        """Places one partition in scratch, reserves its disk and stages its inputs.
+
+        The reservation, input plus output, is taken before anything is
+        fetched, so a partition that can't fit fails before its download.
+        Per-partition inputs are tracked to be deleted once DP3 has read
+        them, or after the upload when DP3 updates them in place.
+        """
+        if self.__scratch is None:
+            working_dir = Path(os.getenv("HOME"))
+            memory_dir = self.__memory_scratch_dir
+            self.__scratch = ScratchManager(
+                working_dir, Path(memory_dir) if memory_dir else None
+            )
+            self.__disk_budget = DiskBudget(working_dir)
+
+        label = str(params.get("msin"))
+        if self.__partition_bytes is None:
+            placement = self.__scratch.place_on_disk(label)
+        else:
+            placement = self.__scratch.place(2 * self.__partition_bytes, label)
+        disk_bytes = 0 if placement.tier == MEMORY_TIER else placement.size_bytes
+        try:
+            reservation = self.__disk_budget.reserve(disk_bytes, label)
+        except BaseException:
+            self.__scratch.release(placement)
+            raise
+
+        params = with_local_base(params, placement.path)
+        try:
+            dp3_params = self.stage_inputs(
+                params, data_source, time_records, id, placement.path
+            )
+        except BaseException:
+            self.__disk_budget.release(reservation)
+            self.__scratch.release(placement)
+            raise
+
+        outputs = {
+            str(val.get_local_path())
+            for val in params.values()
+            if isinstance(val, OutputS3)
+        }
+        inputs = [
+            dp3_params[key]
+            for key, val in params.items()
+            if isinstance(val, InputS3) and (val.key.endswith(".zip") or val.dynamic)
+        ]
+        for path in inputs:
+            self.__disk_budget.track(path, 2 if path in outputs else 1)
+        return StagedPartition(params, dp3_params, placement, reservation, inputs)
+
+    def __consume_inputs(self, partition: StagedPartition):
+        for path in partition.inputs:
+            self.__disk_budget.consumed(path)
+
+    def __finish(self, partition: StagedPartition, failed: bool = False):
+        """Frees the outputs of an uploaded partition and its scratch.
+
+        A failed partition's inputs and outputs are deleted whatever
+        consumers they had left, so nothing outlives it in a warm container.
+        """
+        if failed:
+            for path in partition.inputs:
+                self.__disk_budget.discard(path)
+        for val in partition.params.values():
+            if isinstance(val, OutputS3):
+                if failed:
+                    self.__disk_budget.discard(val.get_local_path())
+                else:
+                    self.__disk_budget.consumed(val.get_local_path())
+        self.__disk_budget.release(partition.reservation)
+        self.__scratch.release(partition.placement)
+
+    def stage_inputs(
+        self,
+        params: dict,
+        data_source,
+        time_records: list,
+        id=None,
+        working_dir: Optional[Path] = None,
+    ):
+        """Fetches the inputs of one partition and returns the DP3 parameters."""
+        working_dir = Path(working_dir or os.getenv("HOME"))
         print(params)
         dp3_params = params.copy()
         self.__logger.info(
@@ -60,7 +241,22 @@ class DP3Step:
         # To be able to do this, we need to use InputS3 and OutputS3 objects in the params dict, with a local_path attribute.
 
         for key, val in dp3_params.items():
-            if isinstance(val, InputS3):
+            if isinstance(val, InputS3) and val.key.endswith(".zip"):
+                self.__logger.info(f"Extracting zip for key {key} from S3: {val}")
+                path = time_it(
+                    "Extract zip members",
+                    data_source.extract_zip,
+                    Type.READ,
+                    time_records,
+                    val,
+                    working_dir,
+                )
+                self.__logger.info(
+                    f"Contents of {path} after extraction: {os.listdir(path)}"
+                )
+                dp3_params[key] = str(path)
+
+            elif isinstance(val, InputS3):
                 self.__logger.info(f"Downloading data for key {key} from S3: {val}")
                 path = time_it(
                     "Download directory",
@@ -110,6 +306,9 @@ class DP3Step:
                 os.makedirs(val.get_local_path().parent, exist_ok=True)
                 dp3_params[key] = str(val.get_local_path())
 
+        return dp3_params
+
+    def run_dp3(self, params: dict, dp3_params: dict, time_records: list):
         print(f"Params: {dp3_params}")
 
         self.__logger.debug(f"Final params for DP3 command: {dp3_params}")
@@ -131,6 +330,7 @@ class DP3Step:
         self.__logger.info(f"DP3 execution stdout: {stdout if stdout else 'No Output'}")
         self.__logger.info(f"DP3 execution stderr: {stderr if stderr else 'No Errors'}")
 
+    def upload_outputs(self, params: dict, data_source, time_records: list):
         print("Starting post processing")
         print(params)
         for key, remote_path in params.items():
@@ -139,18 +339,14 @@ class DP3Step:
                 try:
                     local_path = remote_path.get_local_path()
                     print(f"Local path: {local_path}")
+                    upload_label = "Upload file"
+                    upload_function = data_source.upload
                     if os.path.isdir(local_path):
-                        self.__logger.debug(f"Zipping directory: {key}")
-
-                        local_path = time_it(
-                            "Zip without compression",
-                            data_source.zip_without_compression,
-                            Type.WRITE,
-                            time_records,
-                            local_path,
-                        )
-
-                        print(f"Zipped directory: {local_path}")
+                        # Stream the STORED zip into the upload instead of
+                        # writing the whole archive next to the output MS.
+                        self.__logger.debug(f"Zipping and uploading directory: {key}")
+                        upload_label = "Zip and upload"
+                        upload_function = data_source.upload_zipped
 
                     if remote_path.remote_ow:
                         print("remote_overwrite_path")
@@ -174,16 +370,20 @@ class DP3Step:
                             local_path.file_ext,
                         )
 
-                        s3_path = local_path_to_s3(new_local_path)
+                        s3_path = local_path_to_s3(
+                            new_local_path, Path(local_path.base_local_path)
+                        )
                         print(f"remote overwrite path: {s3_path}")
                     else:
-                        s3_path = local_path_to_s3(local_path)
+                        s3_path = local_path_to_s3(
+                            local_path, Path(local_path.base_local_path)
+                        )
                         print(f"normal_path: {s3_path}")
 
                     print(f"Uploading zip file to S3: {s3_path}")
                     time_it(
-                        "Upload file",
-                        data_source.upload,
+                        upload_label,
+                        upload_function,
                         Type.WRITE,
                         time_records,
                         local_path,
@@ -193,38 +393,55 @@ class DP3Step:
                 except IsADirectoryError as e:
                     self.__logger.error(f"Error while zipping: {e}")
 
-        self.__logger.debug(
-            f"Worker id: {id} completed execution. Time records: {time_records}"
-        )
-        return time_records
-
-    def _execute_step(self, id, parameter_list: List[Dict]):
+    def _execute_step(
+        self, id, parameter_list: List[Dict], chunk_size: Optional[float] = None
+    ):
         self.__logger = setup_logging(self.__log_level)
         memory_limit = get_memory_limit_cgroupv2()
         cpu_limit = get_cpu_limit_cgroupv2()
         print(parameter_list)
-        msin = parameter_list[0]["msin"]
-        chunk_size = round(
-            int(lithops.Storage().head_object(msin.bucket, msin.key)["content-length"])
-            / 1024**2,
-            2,
-        )
+        if chunk_size is None:
+            # Payloads built without the listing metadata still carry only msin.
+            msin = parameter_list[0]["msin"]
+            chunk_size = round(
+                int(
+                    lithops.Storage().head_object(msin.bucket, msin.key)[
+                        "content-length"
+                    ]
+                )
+                / 1024**2,
+                2,
+            )
 
         self.__logger.info(f"Memory Limit: {memory_limit} GB")
         self.__logger.info(f"CPU Limit: {cpu_limit}")
         self.__logger.info(f"Worker {id} executing step")
         # self.__logger.info(f"parameter list: {parameter_list}")
 
+        self.__partition_bytes = int(chunk_size * MB)
+        lookahead = lookahead_depth(
+            self.__lookahead, int(chunk_size * MB), Path(os.getenv("HOME"))
+        )
+        self.__logger.info(f"Prefetch lookahead: {lookahead}")
+
         with profiling_context(os.getpid()) as profiler:
             function_timers = []
-            for param in parameter_list:
-                timers = self.execute_step(param, id=id)
-                function_timers.extend(timers)
+            if lookahead and len(parameter_list) > 1:
+                function_timers = self.__execute_pipelined(
+                    parameter_list, id, lookahead
+                )
+            else:
+                for param in parameter_list:
+                    timers = self.execute_step(param, id=id)
+                    function_timers.extend(timers)
 
         profiler.worker_id = id
         profiler.worker_chunk_size = chunk_size
         profiler.worker_ingested_key = parameter_list[0]["msin"]
         profiler.function_timers = function_timers
+        if self.__scratch is not None:
+            profiler.worker_scratch = self.__scratch.summary()
+            profiler.worker_disk_budget = self.__disk_budget.counters()
 
         env, instance_type = detect_runtime_environment()
         self.__logger.info(
@@ -238,6 +455,69 @@ class DP3Step:
         self.__logger.info("ENV VARIABLES")
         return {"profiler": profiler, "env": env, "instance_type": instance_type}
 
+    def __execute_pipelined(self, parameter_list: List[Dict], id, lookahead: int):
+        """Runs DP3 on partition i while i+1..i+lookahead are staged and i-1 uploads.
+
+        One thread stages inputs in order and one thread uploads outputs.
+        Every entry is staged in its own scratch directory, so entries with
+        the same msin never extract into tables DP3 is still using. Each
+        phase records its own FunctionTimers, whose start and end times show
+        the overlap.
+        """
+        staged = deque()
+        uploads = []
+        time_records = []
+
+        def stage(params):
+            records = []
+            partition = self.__stage(params, self.__create_datasource(), records, id)
+            return partition, records
+
+        def upload(partition):
+            records = []
+            try:
+                self.upload_outputs(
+                    partition.params, self.__create_datasource(), records
+                )
+            except BaseException:
+                self.__finish(partition, failed=True)
+                raise
+            self.__finish(partition)
+            return records
+
+        with ThreadPoolExecutor(max_workers=1) as stager, ThreadPoolExecutor(
+            max_workers=1
+        ) as uploader:
+            next_index = 0
+            try:
+                for _ in parameter_list:
+                    while next_index < len(parameter_list) and len(staged) <= lookahead:
+                        staged.append(stager.submit(stage, parameter_list[next_index]))
+                        next_index += 1
+
+                    partition, records = staged.popleft().result()
+                    time_records.extend(records)
+                    try:
+                        self.run_dp3(
+                            partition.params, partition.dp3_params, time_records
+                        )
+                        self.__consume_inputs(partition)
+                    except BaseException:
+                        self.__finish(partition, failed=True)
+                        raise
+                    uploads.append(uploader.submit(upload, partition))
+            except BaseException:
+                # Partitions staged ahead of a failure never run.
+                for future in staged:
+                    if future.exception() is None:
+                        self.__finish(future.result()[0], failed=True)
+                raise
+
+            for future in uploads:
+                time_records.extend(future.result())
+
+        return sorted(time_records, key=lambda record: record.start_time)
+
     def __construct_params_for_key(self, base_params, key, bucket):
         new_params = copy.deepcopy(base_params)
         file_name_suffix = key.split("/")[-1].split(".")[0]
@@ -270,43 +550,63 @@ class DP3Step:
             log_file.write(f"STDOUT:\n{stdout}\nSTDERR:\n{stderr}")
         return stdout, stderr
 
-    def run(self, func_limit: Optional[int] = None, step_name: Optional[str] = None):
+    def run(
+        self,
+        func_limit: Optional[int] = None,
+        step_name: Optional[str] = None,
+        since_generation: Optional[int] = None,
+    ):
         runtime_memory = 4096
         cpus_per_worker = 4
         extra_env = {"HOME": "/tmp", "OPENBLAS_NUM_THREADS": "1"}
 
         lithops_fexec_parameters = {"log_level": self.__log_level}
 
-        function_executor = lithops.FunctionExecutor(
-            log_level=self.__log_level,
-            runtime_memory=runtime_memory,
-            runtime_cpu=cpus_per_worker,
-        )
-
         bucket = self.__parameters[0]["msin"].bucket
         prefix = self.__parameters[0]["msin"].key
 
-        keys = lithops.Storage().list_keys(bucket=bucket, prefix=prefix)[:func_limit]
+        # Plan from the partition manifest when the partitioner published one,
+        # otherwise from one paginated listing. Either way workers get their
+        # chunk size in the payload instead of issuing a HEAD each.
+        # since_generation limits the step to partitions appended after a
+        # generation it already processed; only the partitioner publishes
+        # manifests, so it applies to steps reading its partitions.
+        data_source = create_datasource(self.__datasource_config)
+        manifest = PartitionManifest.load(data_source.storage, bucket, prefix)
+        if manifest:
+            objects = manifest.objects(since_generation=since_generation)[:func_limit]
+        elif since_generation is not None:
+            raise ValueError(
+                f"since_generation needs a partition manifest for {bucket}/{prefix}; "
+                "DP3 outputs publish none, run steps reading them without it"
+            )
+        else:
+            objects = data_source.list_metadata(bucket, prefix)[:func_limit]
 
-        self.__logger.info(f"keys : {keys}")
+        self.__logger.info(f"keys : {[obj.key for obj in objects]}")
+        if not objects:
+            self.__logger.info(f"Nothing to process under {bucket}/{prefix}")
+            return None
 
-        step_ingested_size = sum(
-            round(
-                int(lithops.Storage().head_object(bucket, key)["content-length"])
-                / 1024**2,
-                2,
-            )
-            for key in keys
+        function_executor = lithops.FunctionExecutor(
+            log_level=self.__log_level,
+            runtime_memory=runtime_memory,
+            runtime_cpu=cpus_per_worker,
         )
 
+        step_ingested_size = sum(obj.size_mb for obj in objects)
+
         ingested_data = 0
 
         function_params = [
-            [
-                self.__construct_params_for_key(params, key, bucket)
-                for params in self.__parameters
-            ]
-            for key in keys
+            {
+                "parameter_list": [
+                    self.__construct_params_for_key(params, obj.key, bucket)
+                    for params in self.__parameters
+                ],
+                "chunk_size": obj.size_mb,
+            }
+            for obj in objects
         ]
 
         self.__logger.info(
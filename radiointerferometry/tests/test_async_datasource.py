@@ -0,0 +1,119 @@
+import os
+import logging
+import pytest
+
+from radiointerferometry.benchmarks.s3_stand_in import S3StandIn
+from radiointerferometry.datasource import (
+    AsyncioDataSource,
+    AsyncS3Client,
+    InputS3,
+    OutputS3,
+)
+from radiointerferometry.partitioning import PartitionManifest
+from radiointerferometry.steps import pipelinestep
+from radiointerferometry.steps.pipelinestep import DP3Step
+
+
+def test_asyncio_data_source_round_trip(tmp_path):
+    with S3StandIn(tmp_path / "s3") as server:
+        data_source = AsyncioDataSource(
+            client=AsyncS3Client(server.endpoint, "key", "secret"),
+            max_concurrency=8,
+            range_size=100,
+            part_size=256,
+        )
+        files = {"table.f0": os.urandom(1000), "table.dat": os.urandom(50)}
+        for name, data in files.items():
+            local_path = tmp_path / "upload" / name
+            local_path.parent.mkdir(exist_ok=True)
+            local_path.write_bytes(data)
+            data_source.upload(local_path, OutputS3(bucket="bucket", key="ms"))
+
+        assert data_source.exists(OutputS3(bucket="bucket", key="ms/"))
+        assert not data_source.exists(OutputS3(bucket="bucket", key="missing/"))
+
+        path = data_source.download(InputS3(bucket="bucket", key="ms/"), tmp_path)
+        single = data_source.download_file(
+            InputS3(bucket="bucket", key="ms/table.dat"), tmp_path / "single"
+        )
+        data_source.close()
+
+    for name, data in files.items():
+        assert (path / name).read_bytes() == data
+    assert single.read_bytes() == files["table.dat"]
+
+
+def test_asyncio_data_source_storage_listing_and_filtered_extract(tmp_path):
+    ms = tmp_path / "partition_0.ms"
+    ms.mkdir()
+    (ms / "table.f0").write_bytes(os.urandom(500))
+    (ms / "table.dat").write_bytes(b"header")
+
+    with S3StandIn(tmp_path / "s3") as server:
+        data_source = AsyncioDataSource(
+            client=AsyncS3Client(server.endpoint, "key", "secret")
+        )
+        data_source.upload_zipped(ms, OutputS3(bucket="bucket", key="partitions"))
+        data_source.storage.put_object("bucket", "partitions/note.txt", "note")
+
+        listing = data_source.list_metadata("bucket", "partitions/")
+        note = data_source.storage.get_object("bucket", "partitions/note.txt")
+        missing = PartitionManifest.load(data_source.storage, "bucket", "partitions/")
+        path = data_source.extract_zip(
+            InputS3(bucket="bucket", key="partitions/partition_0.ms.zip"),
+            tmp_path / "out",
+            member_filter=lambda name: name.endswith("table.dat"),
+        )
+        data_source.close()
+
+    assert [obj.key for obj in listing] == [
+        "partitions/note.txt",
+        "partitions/partition_0.ms.zip",
+    ]
+    assert all(obj.etag for obj in listing)
+    assert note == b"note"
+    assert missing is None
+    assert sorted(os.listdir(path)) == ["table.dat"]
+    assert (path / "table.dat").read_bytes() == b"header"
+
+
+class Planned(Exception):
+    pass
+
+
+def test_dp3_step_plans_through_the_asyncio_backend(tmp_path, monkeypatch):
+    planned = []
+
+    class PlanningExecutor:
+        def __init__(self, **kwargs):
+            pass
+
+        def map(self, func, function_params, **kwargs):
+            planned.extend(function_params)
+            raise Planned()
+
+    monkeypatch.setattr(pipelinestep.lithops, "FunctionExecutor", PlanningExecutor)
+    with S3StandIn(tmp_path / "s3") as server:
+        client = AsyncS3Client(server.endpoint, "key", "secret")
+        data_source = AsyncioDataSource(client=client)
+        for index in range(2):
+            local_path = tmp_path / f"partition_{index}.ms.zip"
+            local_path.write_bytes(os.urandom(100))
+            data_source.upload(local_path, OutputS3(bucket="bucket", key="parts"))
+        data_source.close()
+
+        step = DP3Step(
+            {"msin": InputS3(bucket="bucket", key="parts/")},
+            logging.INFO,
+            datasource_config={
+                "backend": "asyncio",
+                "client": AsyncS3Client(server.endpoint, "key", "secret"),
+            },
+        )
+        with pytest.raises(Planned):
+            step.run()
+
+    assert [p["parameter_list"][0]["msin"].key for p in planned] == [
+        "parts/partition_0.ms.zip",
+        "parts/partition_1.ms.zip",
+    ]
@@ -0,0 +1,73 @@
+import os
+import uuid
+
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, DownloadCache, InputS3
+from radiointerferometry.profiling import time_it, Type
+
+
+def test_cache_hit_miss_and_lru_eviction(tmp_path):
+    cache = DownloadCache(tmp_path / "cache", max_bytes=250)
+    for name in ("a", "b", "c"):
+        source = tmp_path / name
+        source.write_bytes(os.urandom(100))
+        cache.store("bucket", name, "etag-1", source)
+        if name == "a":
+            os.utime(cache.entry_path("bucket", "a", "etag-1"), (1, 1))
+
+    assert not cache.fetch("bucket", "a", "etag-1", tmp_path / "out" / "a")
+    assert cache.fetch("bucket", "c", "etag-1", tmp_path / "out" / "c")
+    assert not cache.fetch("bucket", "c", "etag-2", tmp_path / "out" / "c2")
+    assert (tmp_path / "out" / "c").read_bytes() == (tmp_path / "c").read_bytes()
+    assert cache.counters() == {
+        "cache_hits": 1,
+        "cache_misses": 2,
+        "cache_bytes_saved": 100,
+        "cache_evictions": 1,
+    }
+
+
+def test_download_reuses_cache_until_object_changes(tmp_path):
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    storage.put_object(bucket, "strategies/LOFAR.lua", b"strategy v1")
+    cache = DownloadCache(tmp_path / "cache")
+
+    time_records = []
+    for attempt in range(2):
+        data_source = LithopsDataSource(storage=storage, cache=cache)
+        time_it(
+            "Download directory",
+            data_source.download,
+            Type.READ,
+            time_records,
+            InputS3(bucket=bucket, key="strategies/"),
+            tmp_path / f"run{attempt}",
+        )
+    storage.put_object(bucket, "strategies/LOFAR.lua", b"strategy v2 longer")
+    path = LithopsDataSource(storage=storage, cache=cache).download(
+        InputS3(bucket=bucket, key="strategies/"), tmp_path / "run0"
+    )
+
+    assert time_records[0].counters["cache_misses"] == 1
+    assert time_records[1].counters["cache_hits"] == 1
+    assert time_records[1].counters["cache_bytes_saved"] == 11
+    assert time_records[1].size_bytes == 0
+    assert (path / "LOFAR.lua").read_bytes() == b"strategy v2 longer"
+
+
+def test_fetched_files_do_not_share_the_cache_entry(tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    source = tmp_path / "table.f0"
+    source.write_bytes(b"original")
+    cache.store("bucket", "table.f0", "etag-1", source)
+    with open(source, "r+b") as f:
+        f.write(b"modified")
+
+    fetched = tmp_path / "out" / "table.f0"
+    assert cache.fetch("bucket", "table.f0", "etag-1", fetched)
+    with open(fetched, "r+b") as f:
+        f.write(b"updated!")
+
+    assert cache.fetch("bucket", "table.f0", "etag-1", tmp_path / "again")
+    assert (tmp_path / "again").read_bytes() == b"original"
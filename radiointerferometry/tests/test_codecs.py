@@ -0,0 +1,114 @@
+import io
+import os
+import uuid
+import pytest
+
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, InputS3, OutputS3
+from radiointerferometry.datasource.codecs import (
+    ArchiveCodec,
+    choose_codec,
+    detect_codec,
+    get_codec,
+)
+from radiointerferometry.tests.test_lithops_datasource import MultipartStorage
+
+
+def make_ms(path):
+    files = {
+        "table.f0": os.urandom(2000),
+        # FLAG-like column: long runs of identical bytes
+        "table.f1": bytes(20000),
+        "ANTENNA/table.dat": os.urandom(50),
+    }
+    for relative, data in files.items():
+        (path / relative).parent.mkdir(parents=True, exist_ok=True)
+        (path / relative).write_bytes(data)
+    return files
+
+
+@pytest.mark.parametrize("codec", ["zstd", "lz4"])
+def test_compressed_upload_records_codec_and_extracts(tmp_path, codec):
+    storage = MultipartStorage(Storage(backend="localhost"))
+    data_source = LithopsDataSource(storage=storage, part_size=1000, codec=codec)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    ms = tmp_path / "out" / "partition_0.ms"
+    files = make_ms(ms)
+
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="out"))
+
+    assert storage.metadata == {"codec": codec}
+    body = storage.get_object(bucket, "out/partition_0.ms.zip")
+    assert detect_codec(body).name == codec
+    assert len(body) < 10000
+
+    extracted = data_source.extract_zip(
+        InputS3(bucket=bucket, key="out/partition_0.ms.zip"), tmp_path / "dst"
+    )
+    assert extracted == tmp_path / "dst" / bucket / "out" / "partition_0.ms"
+    for relative, data in files.items():
+        assert (extracted / relative).read_bytes() == data
+
+
+@pytest.mark.parametrize("codec", ["stored", "zstd"])
+def test_recorded_codec_saves_the_magic_probe(tmp_path, codec):
+    storage = MultipartStorage(Storage(backend="localhost"))
+    data_source = LithopsDataSource(storage=storage, part_size=1000, codec=codec)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    ms = tmp_path / "out" / "partition_0.ms"
+    files = make_ms(ms)
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="out"))
+
+    ranges = []
+    get_object = storage.storage.get_object
+
+    def recording_get_object(*args, extra_get_args=None, **kwargs):
+        ranges.append((extra_get_args or {}).get("Range"))
+        return get_object(*args, extra_get_args=extra_get_args or {}, **kwargs)
+
+    storage.storage.get_object = recording_get_object
+    extracted = data_source.extract_zip(
+        InputS3(bucket=bucket, key="out/partition_0.ms.zip"), tmp_path / "dst"
+    )
+
+    assert "bytes=0-3" not in ranges
+    for relative, data in files.items():
+        assert (extracted / relative).read_bytes() == data
+
+
+def test_compressed_upload_without_multipart(tmp_path):
+    storage = Storage(backend="localhost")
+    data_source = LithopsDataSource(storage=storage, codec="zstd")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    ms = tmp_path / "out" / "partition_1.ms"
+    files = make_ms(ms)
+
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="out"))
+
+    assert not (ms.parent / "partition_1.ms.zip").exists()
+    path = data_source.download_file(
+        InputS3(bucket=bucket, key="out/partition_1.ms.zip"), tmp_path / "dst"
+    )
+    extracted = data_source.unzip(path)
+    for relative, data in files.items():
+        assert (extracted / relative).read_bytes() == data
+
+
+def test_choose_codec_trades_cpu_for_network():
+    compressible = bytes(4 * 1024 * 1024)
+    assert choose_codec(compressible, network_throughput=None).name == "stored"
+    assert choose_codec(compressible, network_throughput=1.0).name != "stored"
+    assert choose_codec(os.urandom(1024 * 1024), 1.0).name == "stored"
+
+
+def test_stored_codec_passes_streams_through():
+    with pytest.raises(TypeError):
+        ArchiveCodec()
+    stored = get_codec("stored")
+    stream = io.BytesIO()
+    writer = stored.writer(stream)
+    writer.write(b"PK\x03\x04data")
+    writer.close()
+    assert not stream.closed
+    stream.seek(0)
+    assert stored.reader(stream).read() == b"PK\x03\x04data"
@@ -0,0 +1,82 @@
+import io
+import os
+import zipfile
+
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, LocalPath
+
+FILES = {
+    "table.dat": os.urandom(300),
+    "table.f0": os.urandom(200_000),
+    "table.f1": b"",
+    "ANTENNA/table.dat": os.urandom(120),
+}
+
+
+def make_ms(base_path, name="partition_0.ms"):
+    ms = base_path / "bucket" / name
+    (ms / "ANTENNA").mkdir(parents=True)
+    for relative, data in FILES.items():
+        (ms / relative).write_bytes(data)
+    return LocalPath(str(base_path), "bucket", name)
+
+
+def assert_extracted(path):
+    for relative, data in FILES.items():
+        assert (path / relative).read_bytes() == data
+
+
+def test_unzip_extracts_stored_archive_in_parallel(tmp_path):
+    data_source = LithopsDataSource(storage=Storage(backend="localhost"))
+    zip_path = data_source.zip_without_compression(make_ms(tmp_path / "src"))
+    archive = tmp_path / "dst" / "partition_0.ms.zip"
+    archive.parent.mkdir()
+    os.replace(zip_path, archive)
+
+    path = data_source.unzip(archive, max_workers=4)
+
+    assert path == tmp_path / "dst" / "partition_0.ms"
+    assert_extracted(path)
+    assert not archive.exists()
+    assert data_source.last_transfer_bytes == sum(len(d) for d in FILES.values())
+
+
+def test_unzip_handles_streamed_and_compressed_members(tmp_path):
+    data_source = LithopsDataSource(storage=Storage(backend="localhost"))
+    ms = make_ms(tmp_path / "src")
+
+    class Unseekable(io.RawIOBase):
+        def __init__(self, f):
+            self.f = f
+
+        def writable(self):
+            return True
+
+        def write(self, data):
+            return self.f.write(data)
+
+    streamed = tmp_path / "streamed" / "partition_0.ms.zip"
+    streamed.parent.mkdir()
+    with open(streamed, "wb") as f:
+        data_source.zip_to_stream(ms, Unseekable(f))
+    assert_extracted(data_source.unzip(streamed))
+
+    deflated = tmp_path / "deflated" / "partition_0.ms.zip"
+    deflated.parent.mkdir()
+    with zipfile.ZipFile(deflated, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for relative, data in FILES.items():
+            zipf.writestr(f"partition_0.ms/{relative}", data)
+    assert_extracted(data_source.unzip(deflated, max_workers=2))
+
+
+def test_parallel_packing_matches_sequential_zipfile(tmp_path):
+    data_source = LithopsDataSource(storage=Storage(backend="localhost"))
+    ms = make_ms(tmp_path / "src")
+    sequential = tmp_path / "sequential.zip"
+    data_source.zip_to_stream(ms, sequential)
+
+    zip_path = data_source.zip_without_compression(ms, max_workers=4)
+
+    assert zip_path.path.read_bytes() == sequential.read_bytes()
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.testzip() is None
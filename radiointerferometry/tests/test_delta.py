@@ -0,0 +1,93 @@
+import os
+import uuid
+import pytest
+
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, InputS3, OutputS3
+from radiointerferometry.datasource.delta import base_index_path
+from radiointerferometry.tests.test_lithops_datasource import MultipartStorage
+
+
+def read_tree(path):
+    return {
+        str(file.relative_to(path)): file.read_bytes()
+        for file in path.rglob("*")
+        if file.is_file()
+    }
+
+
+def stage_base(storage, tmp_path):
+    """Publishes a partition and extracts it the way a step does."""
+    data_source = LithopsDataSource(storage=storage, part_size=1000, delta=True)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    ms = tmp_path / "partitioner" / "partition_0.ms"
+    for relative in ("table.f0", "table.f1", "ANTENNA/table.dat"):
+        (ms / relative).parent.mkdir(parents=True, exist_ok=True)
+        (ms / relative).write_bytes(os.urandom(20000))
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="partitions"))
+
+    extracted = data_source.extract_zip(
+        InputS3(bucket=bucket, key="partitions/partition_0.ms.zip"), tmp_path / "work"
+    )
+    assert base_index_path(extracted).exists()
+    return data_source, bucket, extracted
+
+
+@pytest.mark.parametrize("multipart", [True, False])
+def test_in_place_update_uploads_only_changed_files(tmp_path, multipart):
+    storage = Storage(backend="localhost")
+    if multipart:
+        storage = MultipartStorage(storage)
+    data_source, bucket, ms = stage_base(storage, tmp_path)
+
+    # applycal rewrites a column and adds a table file.
+    (ms / "table.f1").write_bytes(os.urandom(20000))
+    (ms / "table.f2").write_bytes(b"new")
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="applycal"))
+
+    assert data_source.last_transfer_counters["delta_unchanged_bytes"] == 40000
+    assert len(storage.get_object(bucket, "applycal/partition_0.ms.zip")) < 25000
+
+    extracted = data_source.extract_zip(
+        InputS3(bucket=bucket, key="applycal/partition_0.ms.zip"), tmp_path / "next"
+    )
+    assert read_tree(extracted) == read_tree(ms)
+
+    # The rebuilt MS can itself be the base of the next step's delta.
+    (extracted / "table.f0").write_bytes(b"calibrated")
+    data_source.upload_zipped(extracted, OutputS3(bucket=bucket, key="imaging"))
+    counters = data_source.last_transfer_counters
+    # Only table.f0 changed; the base's own members still count as unchanged.
+    assert counters["delta_changed_bytes"] == len(b"calibrated")
+    assert counters["delta_unchanged_bytes"] == 40003
+    final = data_source.extract_zip(
+        InputS3(bucket=bucket, key="imaging/partition_0.ms.zip"), tmp_path / "final"
+    )
+    assert read_tree(final) == read_tree(extracted)
+
+
+def test_delta_refuses_a_replaced_base(tmp_path):
+    storage = Storage(backend="localhost")
+    data_source, bucket, ms = stage_base(storage, tmp_path)
+    (ms / "table.f1").write_bytes(b"changed")
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="applycal"))
+
+    storage.put_object(bucket, "partitions/partition_0.ms.zip", b"replaced")
+    with pytest.raises(IOError):
+        data_source.extract_zip(
+            InputS3(bucket=bucket, key="applycal/partition_0.ms.zip"),
+            tmp_path / "next",
+        )
+
+
+def test_upload_to_the_base_key_is_a_full_upload(tmp_path):
+    storage = Storage(backend="localhost")
+    data_source, bucket, ms = stage_base(storage, tmp_path)
+    (ms / "table.f1").write_bytes(b"changed")
+    data_source.upload_zipped(ms, OutputS3(bucket=bucket, key="partitions"))
+
+    extracted = data_source.extract_zip(
+        InputS3(bucket=bucket, key="partitions/partition_0.ms.zip"),
+        tmp_path / "next",
+    )
+    assert read_tree(extracted) == read_tree(ms)
@@ -0,0 +1,64 @@
+import time
+import threading
+import pytest
+
+from radiointerferometry.utils import DiskBudget, DiskBudgetExceededError
+
+
+def test_work_larger_than_the_budget_is_refused(tmp_path):
+    budget = DiskBudget(tmp_path, limit_bytes=100)
+    with pytest.raises(DiskBudgetExceededError):
+        budget.reserve(101, "partition_0")
+    assert budget.counters()["disk_refused"] == 1
+
+
+def test_reservations_wait_for_earlier_ones(tmp_path):
+    budget = DiskBudget(tmp_path, limit_bytes=100)
+    first = budget.reserve(60, "partition_0")
+    granted = threading.Event()
+
+    def reserve_second():
+        budget.reserve(60, "partition_1")
+        granted.set()
+
+    thread = threading.Thread(target=reserve_second)
+    thread.start()
+    time.sleep(0.1)
+    assert not granted.is_set()
+
+    budget.release(first)
+    thread.join(timeout=5)
+    assert granted.is_set()
+    assert budget.counters()["disk_peak_reserved_bytes"] == 60
+
+
+def test_paths_are_deleted_by_their_last_consumer(tmp_path):
+    budget = DiskBudget(tmp_path, limit_bytes=100)
+    ms = tmp_path / "partition_0.ms"
+    ms.mkdir()
+    (ms / "table.f0").write_bytes(b"x" * 10)
+    zip_path = tmp_path / "partition_0.ms.zip"
+    zip_path.write_bytes(b"y" * 5)
+
+    # Updated in place: DP3 reads it, then the upload does.
+    budget.track(ms, consumers=2)
+    budget.consumed(ms)
+    assert ms.exists()
+    budget.consumed(ms)
+    assert not ms.exists()
+
+    budget.consumed(zip_path)
+    assert not zip_path.exists()
+    assert budget.counters()["disk_freed_bytes"] == 15
+
+
+def test_discarded_paths_go_whatever_their_consumers(tmp_path):
+    budget = DiskBudget(tmp_path, limit_bytes=100)
+    ms = tmp_path / "partition_0.ms"
+    ms.mkdir()
+    budget.track(ms, consumers=2)
+
+    budget.discard(ms)
+    assert not ms.exists()
+    # A later consumer finds nothing left to delete.
+    budget.consumed(ms)
@@ -0,0 +1,164 @@
+import os
+import uuid
+import pytest
+
+from lithops import Storage
+from radiointerferometry.datasource import (
+    LithopsDataSource,
+    InputS3,
+    OutputS3,
+    LocalPath,
+)
+from radiointerferometry.profiling import time_it, Type
+
+
+def make_bucket(storage, objects):
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    for key, data in objects.items():
+        storage.put_object(bucket, key, data)
+    return bucket
+
+
+def test_download_splits_large_objects_into_ranges(tmp_path):
+    storage = Storage(backend="localhost")
+    objects = {
+        "ms/partition_0.ms.zip": os.urandom(1000),
+        "ms/partition_1.ms.zip": os.urandom(10),
+        "ms/empty": b"",
+    }
+    bucket = make_bucket(storage, objects)
+    data_source = LithopsDataSource(storage=storage, max_workers=4, range_size=64)
+
+    time_records = []
+    path = time_it(
+        "Download directory",
+        data_source.download,
+        Type.READ,
+        time_records,
+        InputS3(bucket=bucket, key="ms/"),
+        tmp_path,
+    )
+
+    assert path == tmp_path / bucket / "ms"
+    for key, data in objects.items():
+        assert (tmp_path / bucket / key).read_bytes() == data
+    assert not list(path.glob("*.part"))
+    assert time_records[0].size_bytes == 1010
+
+
+def test_list_metadata_returns_sizes_without_head_requests():
+    storage = Storage(backend="localhost")
+    objects = {
+        "partitions/partition_0.ms.zip": os.urandom(3 * 1024 * 1024),
+        "partitions/partition_1.ms.zip": os.urandom(10),
+    }
+    bucket = make_bucket(storage, objects)
+    data_source = LithopsDataSource(storage=storage)
+
+    head_object = storage.head_object
+    storage.head_object = None
+    try:
+        metadata = data_source.list_metadata(bucket, "partitions/")
+    finally:
+        storage.head_object = head_object
+
+    assert {obj.key: obj.size for obj in metadata} == {
+        key: len(data) for key, data in objects.items()
+    }
+    assert all(obj.etag for obj in metadata)
+    assert sorted(obj.size_mb for obj in metadata) == [0.0, 3.0]
+
+
+class MultipartStorage:
+    """Localhost storage whose client also speaks the S3 multipart calls."""
+
+    def __init__(self, storage, failing_parts=()):
+        self.storage = storage
+        self.failing_parts = set(failing_parts)
+        self.parts = {}
+        self.aborted = []
+        self.object_metadata = {}
+
+    def get_client(self):
+        return self
+
+    def head_object(self, bucket, key):
+        headers = self.storage.head_object(bucket, key)
+        for name, value in self.object_metadata.get((bucket, key), {}).items():
+            headers[f"x-amz-meta-{name}"] = value
+        return headers
+
+    def create_multipart_upload(self, Bucket, Key, Metadata=None):
+        self.metadata = Metadata
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber in self.failing_parts:
+            raise ConnectionError("SlowDown")
+        self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        body = b"".join(self.parts[number] for number in numbers)
+        self.storage.put_object(Bucket, Key, body)
+        self.object_metadata[(Bucket, Key)] = self.metadata or {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+
+def test_upload_uses_multipart_for_large_files(tmp_path):
+    storage = MultipartStorage(Storage(backend="localhost"))
+    data_source = LithopsDataSource(storage=storage, part_size=100, upload_workers=3)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    local_path = tmp_path / "partition_0.ms.zip"
+    data = os.urandom(1050)
+    local_path.write_bytes(data)
+
+    data_source.upload(local_path, OutputS3(bucket=bucket, key="out"))
+
+    assert len(storage.parts) == 11
+    assert storage.get_object(bucket, "out/partition_0.ms.zip") == data
+    assert data_source.last_transfer_bytes == 1050
+
+
+def test_failed_multipart_upload_is_aborted(tmp_path):
+    storage = MultipartStorage(Storage(backend="localhost"), failing_parts=[2])
+    data_source = LithopsDataSource(storage=storage, part_size=100, part_retries=0)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    local_path = tmp_path / "partition_0.ms.zip"
+    local_path.write_bytes(os.urandom(450))
+
+    with pytest.raises(ConnectionError):
+        data_source.upload(local_path, OutputS3(bucket=bucket, key="out"))
+
+    assert storage.aborted == ["upload-1"]
+    assert not storage.list_keys(bucket, prefix="out/")
+
+
+def test_upload_zipped_streams_a_standard_zip(tmp_path):
+    storage = MultipartStorage(Storage(backend="localhost"))
+    data_source = LithopsDataSource(storage=storage, part_size=100, upload_workers=2)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    ms = tmp_path / "bucket" / "out" / "partition_0.ms"
+    (ms / "ANTENNA").mkdir(parents=True)
+    files = {"table.f0": os.urandom(700), "ANTENNA/table.dat": os.urandom(50)}
+    for relative, data in files.items():
+        (ms / relative).write_bytes(data)
+
+    data_source.upload_zipped(
+        LocalPath(str(tmp_path), "bucket", "out/partition_0.ms"),
+        OutputS3(bucket=bucket, key="out"),
+    )
+
+    assert not (ms.parent / "partition_0.ms.zip").exists()
+    assert len(storage.parts) > 1
+    extracted = data_source.extract_zip(
+        InputS3(bucket=bucket, key="out/partition_0.ms.zip"), tmp_path / "dst"
+    )
+    for relative, data in files.items():
+        assert (extracted / relative).read_bytes() == data
@@ -0,0 +1,81 @@
+import os
+
+from radiointerferometry.datasource import (
+    LocalDataSource,
+    InputS3,
+    OutputS3,
+    create_datasource,
+)
+from radiointerferometry.partitioning import PartitionManifest
+
+
+def make_ms(path, files):
+    for name, data in files.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_bytes(data)
+    return path
+
+
+def test_upload_zipped_keeps_archive_unpacked_and_extract_zip_stages_it(tmp_path):
+    files = {"table.dat": os.urandom(100), "sub/table.f0": os.urandom(5000)}
+    ms = make_ms(tmp_path / "work" / "partition_0.ms", files)
+    data_source = LocalDataSource(tmp_path / "shared", link_mode="hardlink")
+
+    data_source.upload_zipped(ms, OutputS3(bucket="bucket", key="partitions/abc"))
+
+    metadata = data_source.list_metadata("bucket", "partitions/")
+    assert [obj.key for obj in metadata] == ["partitions/abc/partition_0.ms.zip"]
+    assert metadata[0].size == 5100
+    assert not list((tmp_path / "shared").rglob("*.zip.part"))
+
+    path = data_source.extract_zip(
+        InputS3(bucket="bucket", key="partitions/abc/partition_0.ms.zip"),
+        tmp_path / "stage",
+    )
+    assert (
+        path == tmp_path / "stage" / "bucket" / "partitions" / "abc" / "partition_0.ms"
+    )
+    for name, data in files.items():
+        assert (path / name).read_bytes() == data
+    staged = path / "table.dat"
+    assert os.stat(staged).st_ino == os.stat(ms / "table.dat").st_ino
+    assert data_source.last_transfer_counters["hardlink"] == 2
+
+
+def test_copy_mode_and_real_zip_objects(tmp_path):
+    ms = make_ms(tmp_path / "work" / "partition_1.ms", {"table.dat": b"x" * 1000})
+    data_source = LocalDataSource(tmp_path / "shared", link_mode="copy")
+
+    # A zip produced elsewhere is staged and unzipped like a downloaded one.
+    zip_path = data_source.zip_without_compression(ms)
+    data_source.upload(zip_path, OutputS3(bucket="bucket", key="partitions"))
+    assert (tmp_path / "shared" / "bucket" / "partitions" / zip_path.name).is_file()
+
+    path = data_source.extract_zip(
+        InputS3(bucket="bucket", key=f"partitions/{zip_path.name}"),
+        tmp_path / "stage",
+    )
+    assert (path / "table.dat").read_bytes() == b"x" * 1000
+    staged = tmp_path / "stage" / "bucket" / "partitions" / "partition_1.ms"
+    assert path == staged
+
+    downloaded = data_source.download(
+        InputS3(bucket="bucket", key="partitions/"), tmp_path / "dl"
+    )
+    assert (downloaded / zip_path.name).read_bytes() == zip_path.read_bytes()
+    assert os.stat(downloaded / zip_path.name).st_ino != os.stat(zip_path).st_ino
+
+
+def test_create_datasource_and_manifest_on_local_tree(tmp_path):
+    data_source = create_datasource({"backend": "local", "root": tmp_path})
+    assert isinstance(data_source, LocalDataSource)
+
+    manifest = PartitionManifest(
+        bucket="bucket", prefix="partitions/abc/", identifier="abc"
+    )
+    manifest.publish(data_source.storage)
+    assert (
+        PartitionManifest.load(data_source.storage, "bucket", "partitions/abc/")
+        == manifest
+    )
+    assert PartitionManifest.load(data_source.storage, "bucket", "other/") is None
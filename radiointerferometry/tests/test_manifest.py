@@ -0,0 +1,94 @@
+import json
+import uuid
+
+from lithops import Storage
+from radiointerferometry.partitioning import (
+    PartitionManifest,
+    PartitionEntry,
+    manifest_key,
+)
+
+
+def make_entry(i, size, time_start, time_end):
+    return PartitionEntry(
+        key=f"partitions/abc/partition_{i}.ms.zip",
+        size=size,
+        start_row=i * 10,
+        end_row=(i + 1) * 10,
+        time_start=time_start,
+        time_end=time_end,
+        flagged_fraction=0.25,
+        checksum=f"sha256:{i}",
+    )
+
+
+def test_manifest_round_trip_and_pruning():
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    assert PartitionManifest.load(storage, bucket, "partitions/abc/") is None
+
+    manifest = PartitionManifest(
+        bucket=bucket, prefix="partitions/abc/", identifier="abc"
+    )
+    manifest.partitions = [
+        make_entry(1, 200, 10.0, 19.0),
+        make_entry(0, 100, 0.0, 9.0),
+    ]
+    manifest.publish(storage)
+
+    # The manifest is a sibling of the prefix, so partition listings stay clean.
+    assert storage.list_keys(bucket, prefix="partitions/abc/") == []
+    assert manifest_key("partitions/abc/") == "partitions/abc.manifest.json"
+
+    loaded = PartitionManifest.load(storage, bucket, "partitions/abc/")
+    assert loaded == manifest
+    assert [p.start_row for p in loaded.partitions] == [0, 10]
+    assert loaded.total_size == 300
+    assert [obj.key for obj in loaded.objects(time_start=12.0)] == [
+        "partitions/abc/partition_1.ms.zip"
+    ]
+    assert loaded.objects()[0].size == 100
+    assert loaded.skew["bytes"]["max_over_mean"] == 200 / 150
+    assert loaded.skew["rows"]["cv"] == 0
+
+
+def test_manifests_without_skew_still_load():
+    manifest = PartitionManifest(bucket="b", prefix="partitions/abc/", identifier="abc")
+    content = json.loads(manifest.to_json())
+    del content["balance"], content["skew"]
+
+    loaded = PartitionManifest.from_json(json.dumps(content))
+    assert loaded.skew is None and loaded.balance is None
+
+
+def test_appended_partitions_are_listed_by_generation():
+    manifest = PartitionManifest(bucket="b", prefix="partitions/abc/", identifier="abc")
+    manifest.partitions = [make_entry(0, 100, 0.0, 9.0), make_entry(1, 100, 10.0, 19.0)]
+    appended = make_entry(2, 100, 20.0, 29.0)
+    appended.generation = manifest.generation = 1
+    manifest.partitions.append(appended)
+
+    assert manifest.time_end == 29.0
+    assert manifest.changed_since(0) == [appended]
+    assert [o.key for o in manifest.objects(since_generation=0)] == [appended.key]
+    assert len(manifest.objects()) == 3
+
+
+def test_appends_continue_after_the_highest_published_index():
+    # Partitions 1 and 2 fell in a gap of the observation and were skipped.
+    manifest = PartitionManifest(bucket="b", prefix="partitions/abc/", identifier="abc")
+    assert manifest.next_index == 0 and manifest.end_row == 0
+    manifest.partitions = [make_entry(0, 100, 0.0, 9.0), make_entry(3, 100, 30.0, 39.0)]
+
+    assert manifest.next_index == 4
+    assert manifest.end_row == 40
+
+
+def test_manifests_without_inputs_still_load():
+    manifest = PartitionManifest(
+        bucket="b", prefix="partitions/abc/", identifier="abc", inputs=["obs/a.MS"]
+    )
+    assert PartitionManifest.from_json(manifest.to_json()).inputs == ["obs/a.MS"]
+    content = json.loads(manifest.to_json())
+    del content["inputs"]
+    assert PartitionManifest.from_json(json.dumps(content)).inputs is None
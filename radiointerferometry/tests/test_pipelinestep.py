@@ -0,0 +1,188 @@
+import time
+import uuid
+import logging
+import pytest
+
+from lithops import Storage
+from radiointerferometry.datasource import InputS3
+from radiointerferometry.partitioning import PartitionEntry, PartitionManifest
+from radiointerferometry.profiling import time_it, Type
+from radiointerferometry.utils import DiskBudgetExceededError
+from radiointerferometry.steps import pipelinestep
+from radiointerferometry.steps.pipelinestep import DP3Step, lookahead_depth, MB
+
+PHASE_TIME = 0.2
+
+
+class SleepingStep(DP3Step):
+    """DP3Step whose phases only sleep, to observe how they are scheduled."""
+
+    def stage_inputs(
+        self, params, data_source, time_records, id=None, working_dir=None
+    ):
+        time_it("Download", time.sleep, Type.READ, time_records, PHASE_TIME)
+        (working_dir / "partition.ms").mkdir(exist_ok=True)
+        return dict(params)
+
+    def run_dp3(self, params, dp3_params, time_records):
+        time_it(
+            "Execute DP3 command", time.sleep, Type.COMPUTE, time_records, PHASE_TIME
+        )
+
+    def upload_outputs(self, params, data_source, time_records):
+        time_it("Upload", time.sleep, Type.WRITE, time_records, PHASE_TIME)
+
+
+def overlaps(a, b):
+    return a.start_time < b.end_time and b.start_time < a.end_time
+
+
+def test_execute_step_overlaps_io_with_dp3(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    parameter_list = [{"msin": f"partition_{i}"} for i in range(4)]
+    step = SleepingStep({}, logging.INFO, lookahead=1)
+
+    start = time.time()
+    result = step._execute_step(0, parameter_list, chunk_size=1.0)
+    elapsed = time.time() - start
+
+    timers = result["profiler"].function_timers
+    assert [t.label for t in timers].count("Execute DP3 command") == 4
+    reads = [t for t in timers if t.operation_type == Type.READ]
+    computes = [t for t in timers if t.operation_type == Type.COMPUTE]
+    writes = [t for t in timers if t.operation_type == Type.WRITE]
+    # Partition i+1 is fetched and partition i-1 uploaded while DP3 runs on i.
+    assert overlaps(reads[1], computes[0])
+    assert overlaps(writes[0], computes[1])
+    # 12 phases of PHASE_TIME run in about 6 slots instead of 12.
+    assert elapsed < 9 * PHASE_TIME + 2
+
+
+def test_lookahead_depth_is_bounded_by_disk(tmp_path):
+    assert lookahead_depth(0, 1024, tmp_path) == 0
+    assert lookahead_depth(2, 1024, tmp_path) == 2
+    assert lookahead_depth(2, 1024**5, tmp_path) == 0
+
+
+def test_small_partitions_are_staged_in_memory_scratch(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    shm = tmp_path / "shm"
+    parameter_list = [{"msin": f"partition_{i}"} for i in range(3)]
+    step = SleepingStep({}, logging.INFO, lookahead=1, memory_scratch_dir=shm)
+
+    result = step._execute_step(0, parameter_list, chunk_size=1.0)
+
+    scratch = result["profiler"].worker_scratch
+    assert [p["tier"] for p in scratch["placements"]] == ["memory"] * 3
+    assert scratch["bytes_per_tier"] == {"memory": 6 * MB, "disk": 0}
+    # Each partition's scratch is released once its outputs are uploaded.
+    assert list((shm / "radiointerferometry").iterdir()) == []
+
+
+def test_partition_that_cannot_fit_is_refused_before_staging(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    step = SleepingStep({}, logging.INFO, lookahead=0, memory_scratch_dir=None)
+    staged = []
+    monkeypatch.setattr(step, "stage_inputs", lambda *args: staged.append(args))
+
+    with pytest.raises(DiskBudgetExceededError):
+        step._execute_step(0, [{"msin": "partition_0"}], chunk_size=1024.0**3)
+    assert staged == []
+
+
+class FailingStep(SleepingStep):
+    """SleepingStep whose DP3 fails on one partition."""
+
+    def run_dp3(self, params, dp3_params, time_records):
+        if params["msin"] == "partition_1":
+            raise RuntimeError("DP3 failed")
+        super().run_dp3(params, dp3_params, time_records)
+
+
+@pytest.mark.parametrize("lookahead", [0, 1])
+def test_failed_partition_releases_its_scratch(tmp_path, monkeypatch, lookahead):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    shm = tmp_path / "shm"
+    parameter_list = [{"msin": f"partition_{i}"} for i in range(3)]
+    step = FailingStep({}, logging.INFO, lookahead=lookahead, memory_scratch_dir=shm)
+
+    with pytest.raises(RuntimeError):
+        step._execute_step(0, parameter_list, chunk_size=1.0)
+
+    assert list((shm / "radiointerferometry").iterdir()) == []
+    assert step._DP3Step__disk_budget._reservations == {}
+
+
+class SharedInputStep(SleepingStep):
+    """SleepingStep that extracts msin and checks it is intact after DP3."""
+
+    def stage_inputs(
+        self, params, data_source, time_records, id=None, working_dir=None
+    ):
+        dp3_params = super().stage_inputs(
+            params, data_source, time_records, id, working_dir
+        )
+        table = working_dir / "partition.ms" / "table.f0"
+        table.write_text(params["owner"])
+        dp3_params["table"] = table
+        return dp3_params
+
+    def run_dp3(self, params, dp3_params, time_records):
+        super().run_dp3(params, dp3_params, time_records)
+        assert dp3_params["table"].read_text() == params["owner"]
+
+
+def test_entries_sharing_msin_are_staged_apart(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    parameter_list = [{"msin": "partition_0", "owner": name} for name in "abc"]
+    step = SharedInputStep({}, logging.INFO, lookahead=1, memory_scratch_dir=None)
+
+    result = step._execute_step(0, parameter_list, chunk_size=1.0)
+
+    timers = result["profiler"].function_timers
+    assert [t.label for t in timers].count("Execute DP3 command") == 3
+    assert list((tmp_path / "scratch").iterdir()) == []
+
+
+def incremental_step(monkeypatch, generation=None):
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    if generation is not None:
+        manifest = PartitionManifest(
+            bucket=bucket, prefix="partitions/abc/", identifier="abc"
+        )
+        manifest.partitions = [
+            PartitionEntry(
+                key="partitions/abc/partition_0.ms.zip",
+                size=100,
+                start_row=0,
+                end_row=10,
+                time_start=0.0,
+                time_end=9.0,
+                flagged_fraction=0.0,
+                checksum=None,
+                generation=generation,
+            )
+        ]
+        manifest.publish(storage)
+
+    def no_executor(**kwargs):
+        raise AssertionError("workers started with nothing to process")
+
+    monkeypatch.setattr(pipelinestep.lithops, "FunctionExecutor", no_executor)
+    return DP3Step(
+        {"msin": InputS3(bucket=bucket, key="partitions/abc/")},
+        logging.INFO,
+        datasource_config={"backend": "lithops", "storage": storage},
+    )
+
+
+def test_step_without_new_partitions_has_nothing_to_run(monkeypatch):
+    step = incremental_step(monkeypatch, generation=1)
+    assert step(since_generation=1) is None
+
+
+def test_since_generation_needs_a_manifest(monkeypatch):
+    step = incremental_step(monkeypatch)
+    with pytest.raises(ValueError, match="partition manifest"):
+        step.run(since_generation=0)
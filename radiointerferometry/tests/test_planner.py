@@ -0,0 +1,186 @@
+import numpy as np
+
+from radiointerferometry.partitioning import planner
+from radiointerferometry.partitioning.planner import (
+    BALANCE_BYTES,
+    BALANCE_ROWS,
+    InputTimes,
+    PartitionPlan,
+    balanced_boundaries,
+    equal_duration_boundaries,
+    is_time_sorted,
+    merge_timesteps,
+    plan_append,
+    plan_channel_ranges,
+    partition_boundaries,
+    plan_partitions,
+)
+
+
+def make_input(name, timesteps, baselines):
+    times = np.repeat(np.asarray(timesteps, dtype=float), baselines)
+    return InputTimes(name=name, nrows=len(times), ncols=20, times=times)
+
+
+def sorted_cuts(inputs, boundaries):
+    """Row boundaries the concatenate-and-sort path produces."""
+    times = np.sort(np.concatenate([i.times for i in inputs]))
+    return [0, *np.searchsorted(times, boundaries, side="left"), len(times)]
+
+
+def test_time_disjoint_inputs_are_cut_without_a_global_sort():
+    # Listed out of order: the planner visits inputs by their first TIME.
+    inputs = [
+        make_input("late.ms", range(100, 200), 3),
+        make_input("early.ms", range(0, 100), 3),
+    ]
+    boundaries = equal_duration_boundaries(0, 199, 3)
+
+    partitions = plan_partitions(inputs, boundaries)
+
+    cuts = sorted_cuts(inputs, boundaries)
+    assert [(p.start_row, p.end_row) for p in partitions] == list(
+        zip(cuts[:-1], cuts[1:])
+    )
+    assert [[s.input_index for s in p.segments] for p in partitions] == [
+        [1],
+        [1, 0],
+        [0],
+    ]
+    assert partitions[1].time_start == 67.0
+    assert partitions[1].time_end == 132.0
+    # Timesteps are never split between partitions.
+    for p in partitions[:-1]:
+        assert p.rows % 3 == 0
+
+
+def test_plan_round_trips_and_tracks_the_last_use_of_inputs():
+    inputs = [make_input("a.ms", range(10), 2), make_input("b.ms", range(10, 20), 2)]
+    plan = PartitionPlan(
+        inputs=[i.name for i in inputs],
+        partitions=plan_partitions(inputs, equal_duration_boundaries(0, 19, 4)),
+    )
+
+    assert PartitionPlan.from_json(plan.to_json()) == plan
+    assert plan.last_use() == {0: 1, 1: 3}
+
+
+def test_is_time_sorted():
+    assert is_time_sorted(np.array([1.0, 1.0, 2.0]))
+    assert not is_time_sorted(np.array([2.0, 1.0]))
+
+
+def test_merge_timesteps_matches_a_sort_of_all_rows():
+    rng = np.random.default_rng(0)
+    inputs = [
+        make_input(f"sb{i}.ms", np.unique(rng.integers(0, 50, 30)), 1 + i)
+        for i in range(5)
+    ]
+
+    step_times, step_rows = merge_timesteps(inputs)
+
+    expected_times, expected_rows = np.unique(
+        np.concatenate([i.times for i in inputs]), return_counts=True
+    )
+    np.testing.assert_array_equal(step_times, expected_times)
+    np.testing.assert_array_equal(step_rows, expected_rows)
+
+
+def test_equal_duration_plan_of_overlapping_inputs():
+    # Subbands of the same observation share every timestep.
+    inputs = [make_input(f"sb{i}.ms", range(0, 12), 2) for i in range(3)]
+
+    partitions = plan_partitions(inputs, partition_boundaries(inputs, 4))
+
+    cuts = sorted_cuts(inputs, equal_duration_boundaries(0, 11, 4))
+    assert [(p.start_row, p.end_row) for p in partitions] == list(
+        zip(cuts[:-1], cuts[1:])
+    )
+    assert all(len(p.segments) == 3 for p in partitions)
+    assert merge_timesteps([])[0].size == 0
+
+
+def test_time_balancing_reads_only_the_ends_of_each_input(monkeypatch):
+    inputs = [make_input("b.ms", range(5, 20), 2), make_input("a.ms", range(0, 9), 2)]
+
+    def no_merge(*args, **kwargs):
+        raise AssertionError("time balancing merged the timelines")
+
+    monkeypatch.setattr(planner, "merge_timesteps", no_merge)
+    np.testing.assert_array_equal(
+        partition_boundaries(inputs, 4), equal_duration_boundaries(0, 19, 4)
+    )
+    assert partition_boundaries([make_input("empty.ms", [], 2)], 3).tolist() == [0, 0]
+
+
+def test_row_balancing_evens_out_a_gap_without_splitting_timesteps():
+    # A dense first hour and a sparse tail: equal durations are skewed.
+    inputs = [make_input("a.ms", [*range(0, 60), *range(60, 240, 20)], 10)]
+
+    by_time = plan_partitions(inputs, partition_boundaries(inputs, 3))
+    by_rows = plan_partitions(
+        inputs, partition_boundaries(inputs, 3, balance=BALANCE_ROWS)
+    )
+
+    assert [p.rows for p in by_time] == [610, 40, 40]
+    assert [p.rows for p in by_rows] == [230, 230, 230]
+    assert all(p.rows % 10 == 0 for p in by_rows)
+
+
+def test_byte_balancing_weighs_rows_by_input_size():
+    # b has rows three times as large as a over the same timesteps.
+    a = make_input("a.ms", range(0, 8), 1)
+    b = make_input("b.ms", range(8, 16), 1)
+    a.size_bytes, b.size_bytes = 8 * 100, 8 * 300
+
+    by_bytes = plan_partitions(
+        [a, b], partition_boundaries([a, b], 2, balance=BALANCE_BYTES)
+    )
+
+    assert [p.rows for p in by_bytes] == [11, 5]
+
+
+def test_a_heavy_timestep_is_never_split():
+    inputs = [make_input("a.ms", [0], 100)]
+    boundaries = balanced_boundaries(*merge_timesteps(inputs), 4)
+    partitions = plan_partitions(inputs, boundaries)
+    assert sorted(p.rows for p in partitions) == [0, 0, 0, 100]
+
+
+def test_channel_ranges_split_each_spectral_window():
+    ranges = plan_channel_ranges({1: 10, 0: 64}, 3)
+
+    assert [(r.spectral_window, r.start_channel, r.end_channel) for r in ranges] == [
+        (0, 0, 21),
+        (0, 21, 42),
+        (0, 42, 64),
+        (1, 0, 3),
+        (1, 3, 6),
+        (1, 6, 10),
+    ]
+    assert [r.channels for r in plan_channel_ranges({0: 2}, 4)] == [1, 1]
+    assert [r.channels for r in plan_channel_ranges({0: 64, 1: 64}, 1)] == [64, 64]
+
+
+def test_inputs_travel_as_timesteps():
+    summary = make_input("a.ms", [0.0, 10.0, 20.0], 3).to_timesteps()
+    assert summary["step_rows"].tolist() == [3, 3, 3]
+
+    restored = InputTimes.from_timesteps(summary)
+    assert restored.nrows == 9
+    np.testing.assert_array_equal(restored.times, np.repeat([0.0, 10.0, 20.0], 3))
+
+
+def test_append_plans_only_rows_after_the_covered_time():
+    # a.ms was partitioned up to TIME 9; b.ms brings TIME 10 to 19.
+    inputs = [make_input("a.ms", range(10), 2), make_input("b.ms", range(10, 20), 2)]
+
+    partitions = plan_append(inputs, 9.0, 2)
+
+    assert [(p.start_row, p.end_row) for p in partitions] == [(20, 30), (30, 40)]
+    assert [[(s.input_index, s.start_row) for s in p.segments] for p in partitions] == [
+        [(1, 0)],
+        [(1, 10)],
+    ]
+    assert partitions[0].time_start == 10.0
+    assert plan_append(inputs, 19.0, 2) == []
@@ -0,0 +1,76 @@
+import os
+import uuid
+import zipfile
+
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, InputS3, LocalPath
+from radiointerferometry.datasource.remote_zip import ObjectRangeFile
+
+
+def make_ms(base_path, name="partition_0.ms"):
+    ms = base_path / "bucket" / name
+    (ms / "ANTENNA").mkdir(parents=True)
+    files = {
+        "table.dat": os.urandom(300),
+        "table.f0": os.urandom(5000),
+        "table.f1": b"",
+        "ANTENNA/table.dat": os.urandom(120),
+    }
+    for relative, data in files.items():
+        (ms / relative).write_bytes(data)
+    return ms, files
+
+
+def upload_zip(tmp_path, storage):
+    ms, files = make_ms(tmp_path / "src")
+    data_source = LithopsDataSource(storage=storage)
+    zip_path = data_source.zip_without_compression(
+        LocalPath(str(tmp_path / "src"), "bucket", ms.name)
+    )
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    storage.put_object(bucket, "ms/partition_0.ms.zip", zip_path.read_bytes())
+    return bucket, files
+
+
+def test_extract_zip_matches_unzip(tmp_path):
+    storage = Storage(backend="localhost")
+    bucket, files = upload_zip(tmp_path, storage)
+    data_source = LithopsDataSource(storage=storage, range_size=1024)
+
+    path = data_source.extract_zip(
+        InputS3(bucket=bucket, key="ms/partition_0.ms.zip"), tmp_path / "dst"
+    )
+
+    assert path == tmp_path / "dst" / bucket / "ms" / "partition_0.ms"
+    for relative, data in files.items():
+        assert (path / relative).read_bytes() == data
+    assert not (path.parent / "partition_0.ms.zip").exists()
+    assert data_source.last_transfer_bytes == sum(len(d) for d in files.values())
+
+
+def test_extract_zip_fetches_only_selected_members(tmp_path):
+    storage = Storage(backend="localhost")
+    bucket, files = upload_zip(tmp_path, storage)
+    data_source = LithopsDataSource(storage=storage)
+
+    path = data_source.extract_zip(
+        InputS3(bucket=bucket, key="ms/partition_0.ms.zip"),
+        tmp_path / "dst",
+        member_filter=lambda name: name.endswith("table.dat"),
+    )
+
+    assert (path / "table.dat").read_bytes() == files["table.dat"]
+    assert (path / "ANTENNA" / "table.dat").exists()
+    assert not (path / "table.f0").exists()
+
+
+def test_object_range_file_reads_central_directory_from_tail(tmp_path):
+    storage = Storage(backend="localhost")
+    bucket, files = upload_zip(tmp_path, storage)
+
+    range_file = ObjectRangeFile(storage, bucket, "ms/partition_0.ms.zip")
+    with zipfile.ZipFile(range_file) as zipf:
+        names = zipf.namelist()
+
+    assert "partition_0.ms/table.f0" in names
+    assert range_file.requests == 1
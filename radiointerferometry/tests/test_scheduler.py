@@ -0,0 +1,118 @@
+import os
+import time
+import pickle
+import uuid
+import threading
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from lithops import Storage
+from radiointerferometry.datasource import LithopsDataSource, InputS3
+from radiointerferometry.datasource.scheduler import (
+    RequestScheduler,
+    request_scheduler,
+)
+from radiointerferometry.profiling import time_it, Type
+
+
+class Throttled(Exception):
+    def __init__(self):
+        super().__init__("SlowDown")
+        self.response = {
+            "Error": {"Code": "SlowDown"},
+            "ResponseMetadata": {"HTTPStatusCode": 503},
+        }
+
+
+def test_concurrency_is_bounded_by_the_limit():
+    scheduler = RequestScheduler(initial_concurrency=4, max_concurrency=4)
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def request():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        for _ in range(64):
+            executor.submit(scheduler.call, "bucket", request)
+
+    assert peak[0] == 4
+    assert scheduler.counters()["requests"] == 64
+
+
+def test_throttles_halve_the_limit_and_are_retried():
+    scheduler = RequestScheduler(initial_concurrency=16, backoff=0.01)
+    failures = iter([Throttled(), Throttled()])
+
+    def request():
+        error = next(failures, None)
+        if error:
+            raise error
+        return "ok"
+
+    assert scheduler.call("bucket", request) == "ok"
+    counters = scheduler.counters()
+    assert counters["requests_throttled"] == 2
+    assert counters["request_retries"] == 2
+    # Both throttled attempts started after the previous cut.
+    assert scheduler.limit("bucket") == 4
+
+
+def test_limit_grows_while_requests_succeed():
+    scheduler = RequestScheduler(initial_concurrency=2, max_concurrency=8)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(200):
+            executor.submit(scheduler.call, "bucket", time.sleep, (0.001,))
+    assert 2 < scheduler.limit("bucket") <= 8
+    assert scheduler.limit("other") == 2
+
+
+def test_other_errors_are_not_retried():
+    scheduler = RequestScheduler()
+
+    def request():
+        raise FileNotFoundError("missing")
+
+    with pytest.raises(FileNotFoundError):
+        scheduler.call("bucket", request)
+    assert scheduler.counters()["request_retries"] == 0
+    assert scheduler.counters()["request_errors"] == 1
+
+
+def test_time_it_records_request_counters(tmp_path):
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    for i in range(3):
+        storage.put_object(bucket, f"ms/table.f{i}", os.urandom(100))
+    data_source = LithopsDataSource(storage=storage, scheduler=RequestScheduler())
+
+    time_records = []
+    time_it(
+        "Download",
+        data_source.download,
+        Type.READ,
+        time_records,
+        InputS3(bucket=bucket, key="ms"),
+        tmp_path,
+    )
+    counters = time_records[0].counters
+    # One listing and one GET per object.
+    assert counters["requests"] == 4
+    assert counters["requests_throttled"] == 0
+
+
+def test_data_sources_pickle_with_the_process_scheduler():
+    data_source = LithopsDataSource(
+        storage=Storage(backend="localhost"), scheduler=RequestScheduler()
+    )
+    restored = pickle.loads(pickle.dumps(data_source))
+    assert restored.scheduler is request_scheduler
+    assert restored.storage.scheduler is request_scheduler
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    restored.storage.put_object(bucket, "key", b"data")
+    assert restored.storage.get_object(bucket, "key") == b"data"
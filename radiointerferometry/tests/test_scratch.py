@@ -0,0 +1,49 @@
+from radiointerferometry.utils import ScratchManager, MEMORY_TIER, DISK_TIER
+
+MB = 1024 * 1024
+
+
+def test_partitions_that_fit_go_to_memory(tmp_path):
+    scratch = ScratchManager(tmp_path / "disk", tmp_path / "shm")
+
+    small = scratch.place(MB, "partition_0")
+    large = scratch.place(scratch.memory_budget() + 1, "partition_1")
+
+    assert small.tier == MEMORY_TIER
+    assert small.path.parent == tmp_path / "shm" / "radiointerferometry"
+    assert large.tier == DISK_TIER
+    assert large.path.parent == tmp_path / "disk" / "scratch"
+    assert scratch.summary()["bytes_per_tier"] == {
+        MEMORY_TIER: MB,
+        DISK_TIER: scratch.memory_budget() + 1,
+    }
+
+
+def test_memory_tier_is_bounded_by_what_it_holds(tmp_path):
+    scratch = ScratchManager(tmp_path, tmp_path / "shm")
+    scratch.memory_budget = lambda: 10 * MB
+    half = 6 * MB
+
+    first = scratch.place(half)
+    assert scratch.place(half).tier == DISK_TIER
+
+    (first.path / "table.f0").write_bytes(b"x")
+    scratch.release(first)
+    assert not first.path.exists()
+    assert scratch.place(half).tier == MEMORY_TIER
+
+
+def test_without_memory_dir_everything_is_on_disk(tmp_path):
+    scratch = ScratchManager(tmp_path, memory_dir=None)
+    assert scratch.place(MB).tier == DISK_TIER
+
+
+def test_disk_placements_get_their_own_directory(tmp_path):
+    scratch = ScratchManager(tmp_path, memory_dir=None)
+    first, second = scratch.place(MB), scratch.place_on_disk()
+
+    assert first.path != second.path
+    (first.path / "table.f0").write_bytes(b"x")
+    scratch.release(first)
+    assert not first.path.exists()
+    assert second.path.is_dir()
@@ -0,0 +1,446 @@
+import os
+import uuid
+import pytest
+import cloudpickle
+import multiprocessing
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from lithops import Storage
+from radiointerferometry.datasource import InputS3, OutputS3
+from radiointerferometry.partitioning import (
+    PartitionEntry,
+    PartitionManifest,
+    manifest_key,
+)
+from radiointerferometry.partitioning import static_partition
+from radiointerferometry.partitioning.planner import (
+    InputTimes,
+    PartitionPlan,
+    PlannedPartition,
+    Segment,
+)
+from radiointerferometry.partitioning.static_partition import (
+    StaticPartitioner,
+    input_keys,
+)
+from radiointerferometry.tests.test_writer import (
+    casacore_tables,
+    make_measurement_set,
+)
+
+
+class PicklingExecutor:
+    """lithops FunctionExecutor stand-in that pickles whatever it would ship.
+
+    Invocations are answered by name instead of being run, since the
+    workers need casacore.
+    """
+
+    def __init__(self, **kwargs):
+        self.shipped = []
+
+    def map(self, func, iterdata, extra_env=None):
+        return [self.call_async(func, data, extra_env) for data in iterdata]
+
+    def call_async(self, func, data, extra_env=None):
+        func, data = cloudpickle.loads(cloudpickle.dumps((func, data)))
+        self.shipped.append(func.__name__)
+        return getattr(self, func.__name__)(**data)
+
+    def get_result(self, futures):
+        return futures
+
+    def _read_input_times(self, input_s3):
+        start = 0.0 if input_s3.key.endswith("SB000.MS.zip") else 5.0
+        times = np.repeat(np.arange(start, start + 10), 3)
+        input_times = InputTimes(input_s3.key, len(times), 20, times)
+        return {"sorted": True, "timesteps": input_times.to_timesteps()}
+
+    def _create_partition_remote(self, plan_json, index, bucket, msout, columns):
+        planned = PartitionPlan.from_json(plan_json).partitions[index]
+        entry = PartitionEntry(
+            key=f"{msout.key}partition_{index}.ms.zip",
+            size=100,
+            start_row=planned.start_row,
+            end_row=planned.end_row,
+            time_start=planned.time_start,
+            time_end=planned.time_end,
+            flagged_fraction=0.0,
+            checksum=f"sha256:{index}",
+        )
+        return entry, 100
+
+
+class InlineExecutor:
+    """lithops FunctionExecutor stand-in that runs every invocation in place."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def map(self, func, iterdata, extra_env=None):
+        return [func(**data) for data in iterdata]
+
+    def call_async(self, func, data, extra_env=None):
+        return func(**data)
+
+    def get_result(self, futures):
+        return futures
+
+
+def test_input_keys_group_objects_by_input():
+    keys = [
+        "obs/SB001.MS.zip",
+        "obs/SB002.MS/table.dat",
+        "obs/SB002.MS/table.f0",
+        "obs/SB002.MS/ANTENNA/table.dat",
+        "obs/SB000.MS.zip",
+    ]
+    assert input_keys(keys, "obs/") == [
+        "obs/SB000.MS.zip",
+        "obs/SB001.MS.zip",
+        "obs/SB002.MS",
+    ]
+    assert input_keys(keys, "obs") == input_keys(keys, "obs/")
+
+
+def test_distributed_partitioning_ships_picklable_invocations(monkeypatch):
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    for name in ("SB000.MS.zip", "SB001.MS.zip"):
+        storage.put_object(bucket, f"obs/{name}", b"PK")
+    executor = PicklingExecutor()
+    monkeypatch.setattr(
+        static_partition.lithops, "FunctionExecutor", lambda **kwargs: executor
+    )
+    partitioner = StaticPartitioner(
+        datasource_config={"backend": "lithops", "storage": storage}
+    )
+
+    result = partitioner.partition_ms_distributed(
+        InputS3(bucket=bucket, key="obs/"),
+        3,
+        OutputS3(bucket=bucket, key="partitions/"),
+    )
+
+    assert (
+        executor.shipped == ["_read_input_times"] * 2 + ["_create_partition_remote"] * 3
+    )
+    assert not hasattr(partitioner, "datasource")
+    manifest = PartitionManifest.load(storage, bucket, result.key)
+    assert [p.end_row for p in manifest.partitions] == [15, 45, 60]
+
+
+def test_partitions_without_a_manifest_are_not_repartitioned(monkeypatch):
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    for name in ("SB000.MS.zip", "SB001.MS.zip"):
+        storage.put_object(bucket, f"obs/{name}", b"PK")
+    executor = PicklingExecutor()
+    monkeypatch.setattr(
+        static_partition.lithops, "FunctionExecutor", lambda **kwargs: executor
+    )
+    partitioner = StaticPartitioner(
+        datasource_config={"backend": "lithops", "storage": storage}
+    )
+    args = (InputS3(bucket=bucket, key="obs/"), 3)
+
+    first = partitioner.partition_ms_distributed(
+        *args, OutputS3(bucket=bucket, key="partitions/")
+    )
+    # A set partitioned before manifests were published.
+    storage.put_object(bucket, f"{first.key}partition_0.ms.zip", b"PK")
+    storage.delete_object(bucket, manifest_key(first.key))
+    executor.shipped.clear()
+    second = partitioner.partition_ms_distributed(
+        *args, OutputS3(bucket=bucket, key="partitions/")
+    )
+
+    assert second.key == first.key
+    assert executor.shipped == ["_read_input_times"] * 2
+
+
+def test_unknown_executor_is_refused_before_staging():
+    partitioner = StaticPartitioner()
+    with pytest.raises(ValueError):
+        partitioner.partition_ms(
+            InputS3(bucket="b", key="obs/"),
+            2,
+            OutputS3(bucket="b", key="partitions/"),
+            executor="bogus",
+        )
+    assert not hasattr(partitioner, "datasource")
+
+
+def test_process_pool_arguments_survive_spawn():
+    planned = PlannedPartition(
+        0, 0, 30, 0.0, 9.0, [Segment(0, 0, 20), Segment(1, 5, 15)]
+    )
+    args = (
+        "INFO",
+        {"backend": "lithops", "storage": Storage(backend="localhost")},
+        "_create_planned_from_paths",
+        planned,
+        {0: "/tmp/SB000.MS", 1: "/tmp/SB001.MS"},
+        OutputS3(bucket="b", key="partitions/abc/"),
+        ["DATA", "FLAG"],
+    )
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        restored = executor.submit(tuple, args).result()
+
+    log_level, config, method, restored_planned, paths, msout, columns = restored
+    assert (log_level, method, paths, columns) == (
+        "INFO",
+        "_create_planned_from_paths",
+        args[4],
+        args[6],
+    )
+    assert restored_planned == planned
+    assert config["storage"].backend == "localhost"
+    assert (msout.bucket, msout.key) == ("b", "partitions/abc/")
+
+
+@pytest.mark.parametrize(
+    "published, message",
+    [
+        (None, "No partition manifest"),
+        ({"balance": "rows"}, "balanced by rows"),
+        ({"spectral_window": 0}, "frequency partitions"),
+    ],
+)
+def test_append_checks_the_manifest_before_fetching_inputs(
+    monkeypatch, published, message
+):
+    storage = Storage(backend="localhost")
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    if published is not None:
+        manifest = PartitionManifest(
+            bucket=bucket,
+            prefix="partitions/abc/",
+            identifier="abc",
+            balance=published.get("balance", "time"),
+        )
+        manifest.partitions = [
+            PartitionEntry(
+                key="partitions/abc/partition_0.ms.zip",
+                size=100,
+                start_row=0,
+                end_row=10,
+                time_start=0.0,
+                time_end=9.0,
+                flagged_fraction=0.0,
+                checksum=None,
+                spectral_window=published.get("spectral_window"),
+            )
+        ]
+        manifest.publish(storage)
+    partitioner = StaticPartitioner(
+        datasource_config={"backend": "lithops", "storage": storage}
+    )
+
+    def list_inputs(*args):
+        raise AssertionError("inputs listed before the manifest was checked")
+
+    monkeypatch.setattr(static_partition, "list_inputs", list_inputs)
+
+    with pytest.raises(ValueError, match=message):
+        partitioner.partition_ms(
+            InputS3(bucket=bucket, key="obs/"),
+            2,
+            None,
+            append_to=InputS3(bucket=bucket, key="partitions/abc/"),
+        )
+
+
+def partition_local(tmp_path, bucket, num_partitions, **kwargs):
+    partitioner = StaticPartitioner(
+        datasource_config={"backend": "local", "root": str(tmp_path / "store")}
+    )
+    result = partitioner.partition_ms(
+        InputS3(bucket=bucket, key="obs/"),
+        num_partitions,
+        OutputS3(bucket=bucket, key="partitions/"),
+        **kwargs,
+    )
+    return PartitionManifest.load(partitioner.datasource.storage, bucket, result.key)
+
+
+def test_frequency_tiles_number_rows_like_time_partitions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    obs = tmp_path / "store" / bucket / "obs"
+    obs.mkdir(parents=True)
+    times = np.repeat(np.arange(20.0), 3)
+    # Created out of name order, so directory order is not name order.
+    make_measurement_set(obs / "SB001.MS", times, reference_frequency=1.3e8)
+    make_measurement_set(obs / "SB000.MS", times, reference_frequency=1.2e8)
+
+    time_manifest = partition_local(tmp_path, bucket, 2)
+    tile_manifest = partition_local(tmp_path, bucket, 2, channel_ranges=2)
+
+    assert len(tile_manifest.partitions) == 2 * 2 * 2
+    for tile in tile_manifest.partitions:
+        (covering,) = [
+            p
+            for p in time_manifest.partitions
+            if p.time_start <= tile.time_start and tile.time_end <= p.time_end
+        ]
+        assert covering.start_row <= tile.start_row < tile.end_row <= covering.end_row
+        ms_path = tmp_path / "store" / bucket / tile.key / tile.key.split("/")[-1][:-4]
+        with casacore_tables.table(str(ms_path), ack=False) as ms:
+            assert ms.nrows() == tile.end_row - tile.start_row
+            assert ms.getcol("DATA").shape == (ms.nrows(), 4, 4)
+            assert ms.getcol("FLAG").shape == (ms.nrows(), 4, 4)
+    # Within a TIME range, SB000 (lower frequencies) is numbered first.
+    first = min(tile_manifest.partitions, key=lambda p: (p.start_row, p.freq_start))
+    assert (first.start_row, first.freq_start) == (0, 1.2e8)
+    rows = sorted(
+        (p.start_row, p.end_row)
+        for p in tile_manifest.partitions
+        if p.start_channel == 0
+    )
+    assert rows[0][0] == 0 and rows[-1][1] == 2 * len(times)
+    assert all(a[1] == b[0] for a, b in zip(rows, rows[1:]))
+
+
+def read_partition(tmp_path, bucket, entry):
+    ms_path = tmp_path / "store" / bucket / entry.key / entry.key.split("/")[-1][:-4]
+    with casacore_tables.table(str(ms_path), ack=False) as ms:
+        return ms.getcol("TIME"), ms.getcol("DATA")
+
+
+@pytest.mark.parametrize("balance", ["rows", "bytes"])
+@pytest.mark.parametrize("ordered", [True, False])
+def test_balanced_partitions_cover_every_row_and_timestep(
+    tmp_path, monkeypatch, balance, ordered
+):
+    monkeypatch.chdir(tmp_path)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    obs = tmp_path / "store" / bucket / "obs"
+    obs.mkdir(parents=True)
+    # Uneven rows per timestep, so balanced cuts differ from TIME cuts.
+    first = np.repeat(np.arange(10.0), np.arange(1, 11))
+    second = np.repeat(np.arange(8.0, 20.0), 3)
+    if not ordered:
+        first, second = first[::-1], np.roll(second, 7)
+    make_measurement_set(obs / "SB000.MS", first)
+    make_measurement_set(obs / "SB001.MS", second)
+
+    manifest = partition_local(tmp_path, bucket, 4, balance=balance)
+
+    partitions = sorted(manifest.partitions, key=lambda p: p.start_row)
+    assert partitions[0].start_row == 0
+    assert partitions[-1].end_row == len(first) + len(second)
+    assert all(a.end_row == b.start_row for a, b in zip(partitions, partitions[1:]))
+    assert all(a.time_end < b.time_start for a, b in zip(partitions, partitions[1:]))
+    times = []
+    for entry in partitions:
+        partition_times, data = read_partition(tmp_path, bucket, entry)
+        assert len(partition_times) == entry.end_row - entry.start_row
+        assert (partition_times.min(), partition_times.max()) == (
+            entry.time_start,
+            entry.time_end,
+        )
+        assert data.shape == (len(partition_times), 8, 4)
+        times.append(partition_times)
+    np.testing.assert_array_equal(
+        np.sort(np.concatenate(times)), np.sort(np.concatenate([first, second]))
+    )
+
+
+def test_distributed_and_local_partitioning_agree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(static_partition.lithops, "FunctionExecutor", InlineExecutor)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    obs = tmp_path / "store" / bucket / "obs"
+    obs.mkdir(parents=True)
+    for name, start in (("SB002.MS", 10.0), ("SB000.MS", 0.0), ("SB001.MS", 5.0)):
+        make_measurement_set(obs / name, np.repeat(np.arange(start, start + 10), 2))
+    config = {"backend": "local", "root": str(tmp_path / "store")}
+    # Directory order must not decide the order of the inputs.
+    listdir = os.listdir
+    monkeypatch.setattr(
+        os, "listdir", lambda path=".": sorted(listdir(path), reverse=True)
+    )
+
+    local = StaticPartitioner(datasource_config=config).partition_ms(
+        InputS3(bucket=bucket, key="obs/"),
+        3,
+        OutputS3(bucket=bucket, key="local/"),
+        balance="rows",
+    )
+    distributed = StaticPartitioner(datasource_config=config).partition_ms_distributed(
+        InputS3(bucket=bucket, key="obs/"),
+        3,
+        OutputS3(bucket=bucket, key="distributed/"),
+        balance="rows",
+    )
+
+    storage = static_partition.create_datasource(config).storage
+    manifests = [
+        PartitionManifest.load(storage, bucket, result.key)
+        for result in (local, distributed)
+    ]
+    assert manifests[0].identifier == manifests[1].identifier
+    assert (
+        manifests[0].inputs
+        == manifests[1].inputs
+        == [
+            "obs/SB000.MS",
+            "obs/SB001.MS",
+            "obs/SB002.MS",
+        ]
+    )
+    entries = [
+        [
+            (p.key.split("/")[-1], p.start_row, p.end_row, p.time_start, p.time_end)
+            for p in manifest.partitions
+        ]
+        for manifest in manifests
+    ]
+    assert entries[0] == entries[1]
+
+
+def set_with_later_input(tmp_path, monkeypatch, first_new_time):
+    """Partitions one MS, then adds a second one starting at first_new_time."""
+    monkeypatch.chdir(tmp_path)
+    bucket = f"test-{uuid.uuid4().hex[:8]}"
+    obs = tmp_path / "store" / bucket / "obs"
+    obs.mkdir(parents=True)
+    make_measurement_set(obs / "SB000.MS", np.repeat(np.arange(20.0), 3))
+    published = partition_local(tmp_path, bucket, 2)
+    make_measurement_set(
+        obs / "SB001.MS", np.repeat(np.arange(first_new_time, 30.0), 3)
+    )
+    partitioner = StaticPartitioner(
+        datasource_config={"backend": "local", "root": str(tmp_path / "store")}
+    )
+    return partitioner, published, InputS3(bucket=bucket, key="obs/")
+
+
+def test_append_refuses_inputs_overlapping_the_covered_times(tmp_path, monkeypatch):
+    partitioner, published, msin = set_with_later_input(tmp_path, monkeypatch, 15.0)
+    append_to = InputS3(bucket=msin.bucket, key=published.prefix)
+
+    with pytest.raises(ValueError, match="already covers"):
+        partitioner.partition_ms(msin, 2, None, append_to=append_to)
+
+    storage = partitioner.datasource.storage
+    unchanged = PartitionManifest.load(storage, msin.bucket, published.prefix)
+    assert unchanged.to_json() == published.to_json()
+
+
+def test_append_numbers_new_rows_after_the_covered_ones(tmp_path, monkeypatch):
+    partitioner, published, msin = set_with_later_input(tmp_path, monkeypatch, 20.0)
+    append_to = InputS3(bucket=msin.bucket, key=published.prefix)
+
+    partitioner.partition_ms(msin, 2, None, append_to=append_to)
+
+    storage = partitioner.datasource.storage
+    appended = PartitionManifest.load(storage, msin.bucket, published.prefix)
+    partitions = sorted(appended.partitions, key=lambda p: p.start_row)
+    assert all(a.end_row == b.start_row for a, b in zip(partitions, partitions[1:]))
+    assert partitions[-1].end_row == 60 + 30
+    assert [p.generation for p in partitions] == [0, 0, 1, 1]
@@ -0,0 +1,181 @@
+import numpy as np
+import pytest
+
+casacore_tables = pytest.importorskip("casacore.tables")
+
+from radiointerferometry.partitioning.spectral import write_channel_slice
+from radiointerferometry.partitioning.planner import ChannelRange
+from radiointerferometry.partitioning.writer import (
+    WriteStats,
+    copy_columns,
+    write_rows,
+)
+
+NUM_CORRELATIONS = 4
+
+
+def make_measurement_set(path, times, num_channels=8, reference_frequency=1.2e8):
+    """Writes a single-window MS with the given TIME per row.
+
+    DATA holds row + channel * 1j in every correlation and FLAG marks every
+    third row, so partitions can be checked against the rows they hold.
+    """
+    times = np.asarray(times, dtype=float)
+    nrows, shape = len(times), [num_channels, NUM_CORRELATIONS]
+    ms = casacore_tables.default_ms(
+        str(path),
+        casacore_tables.maketabdesc(
+            [
+                casacore_tables.makearrcoldesc("DATA", 0j, shape=shape),
+                casacore_tables.makearrcoldesc("FLAG", False, shape=shape),
+            ]
+        ),
+    )
+    with ms:
+        ms.addrows(nrows)
+        ms.putcol("TIME", times)
+        data = np.arange(nrows)[:, None] + 1j * np.arange(num_channels)[None, :]
+        ms.putcol(
+            "DATA",
+            np.repeat(data[:, :, None], NUM_CORRELATIONS, axis=2).astype(np.complex64),
+        )
+        flags = np.zeros((nrows, *shape), dtype=bool)
+        flags[::3] = True
+        ms.putcol("FLAG", flags)
+
+    widths = np.full(num_channels, 1e5)
+    with casacore_tables.table(
+        str(path / "SPECTRAL_WINDOW"), readonly=False, ack=False
+    ) as spectral_window:
+        spectral_window.addrows(1)
+        spectral_window.putcell("NUM_CHAN", 0, num_channels)
+        spectral_window.putcell(
+            "CHAN_FREQ", 0, reference_frequency + np.arange(num_channels) * widths
+        )
+        for column in ("CHAN_WIDTH", "EFFECTIVE_BW", "RESOLUTION"):
+            spectral_window.putcell(column, 0, widths)
+        spectral_window.putcell("REF_FREQUENCY", 0, reference_frequency)
+        spectral_window.putcell("TOTAL_BANDWIDTH", 0, float(widths.sum()))
+    with casacore_tables.table(
+        str(path / "DATA_DESCRIPTION"), readonly=False, ack=False
+    ) as data_description:
+        data_description.addrows(1)
+        data_description.putcell("SPECTRAL_WINDOW_ID", 0, 0)
+    return path
+
+
+class ArrayTable:
+    """Stand-in for a casacore table holding its columns as numpy arrays."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.reads = 0
+
+    def nrows(self):
+        return len(next(iter(self.columns.values())))
+
+    def colnames(self):
+        return list(self.columns)
+
+    def iscelldefined(self, column, row):
+        return True
+
+    def addrows(self, nrows):
+        for name, values in self.columns.items():
+            extra = np.zeros((nrows, *values.shape[1:]), dtype=values.dtype)
+            self.columns[name] = np.concatenate([values, extra])
+
+    def getcol(self, column, startrow=0, nrow=-1):
+        self.reads += 1
+        return self.columns[column][startrow : startrow + nrow].copy()
+
+    def getcolnp(self, column, nparray, startrow=0, nrow=-1):
+        self.reads += 1
+        nparray[...] = self.columns[column][startrow : startrow + nrow]
+
+    def getcolslicenp(self, column, nparray, blc, trc, startrow=0, nrow=-1):
+        self.reads += 1
+        cells = self.columns[column][startrow : startrow + nrow]
+        nparray[...] = cells[:, blc[0] : trc[0] + 1]
+
+    def getcolslice(self, column, blc, trc, startrow=0, nrow=-1):
+        self.reads += 1
+        cells = self.columns[column][startrow : startrow + nrow]
+        return cells[:, blc[0] : trc[0] + 1].copy()
+
+    def putcol(self, column, value, startrow=0, nrow=-1):
+        self.columns[column][startrow : startrow + nrow] = value
+
+
+def test_rows_are_appended_in_blocks_with_sliced_channels():
+    source = ArrayTable(
+        {
+            "TIME": np.arange(25, dtype=float),
+            "DATA": np.arange(25 * 8 * 2).reshape(25, 8, 2).astype(np.complex64),
+        }
+    )
+    out = ArrayTable(
+        {
+            "TIME": np.zeros(3),
+            "DATA": np.zeros((3, 4, 2), dtype=np.complex64),
+        }
+    )
+
+    stats = copy_columns(
+        source,
+        out,
+        start_row=5,
+        nrow=17,
+        slices={"DATA": ([2, -1], [5, -1])},
+        chunk_rows=4,
+    )
+
+    np.testing.assert_array_equal(out.columns["TIME"][3:], np.arange(5, 22))
+    np.testing.assert_array_equal(
+        out.columns["DATA"][3:], source.columns["DATA"][5:22, 2:6]
+    )
+    assert stats.rows == 17
+    assert stats.bytes == 17 * 8 + 17 * 4 * 2 * 8
+    # One probe read per column, then five blocks of at most four rows.
+    assert source.reads == 2 + 2 * 5
+
+
+def test_write_stats_rates():
+    stats = WriteStats(1000, 4 * 1024 * 1024, 2.0) + WriteStats(1000, 0, 2.0)
+    assert stats.rows_per_second == 500
+    assert stats.mb_per_second == 1
+    assert "500 rows/s" in str(stats)
+
+
+def test_write_rows_to_a_measurement_set_in_blocks(tmp_path):
+    source_path = make_measurement_set(tmp_path / "source.ms", np.arange(25.0))
+    with casacore_tables.table(str(source_path), ack=False) as source:
+        stats = write_rows(source, tmp_path / "partition_0.ms", 5, 17, chunk_rows=4)
+        expected_data = source.getcol("DATA")[5:22]
+        expected_flag = source.getcol("FLAG")[5:22]
+
+    with casacore_tables.table(str(tmp_path / "partition_0.ms"), ack=False) as out:
+        assert out.nrows() == 17
+        np.testing.assert_array_equal(out.getcol("TIME"), np.arange(5.0, 22.0))
+        np.testing.assert_array_equal(out.getcol("DATA"), expected_data)
+        np.testing.assert_array_equal(out.getcol("FLAG"), expected_flag)
+        assert "SPECTRAL_WINDOW" in out.getkeywords()
+    assert stats.rows == 17
+
+
+def test_sliced_channels_are_written_in_blocks(tmp_path):
+    source_path = make_measurement_set(tmp_path / "source.ms", np.arange(10.0))
+    with casacore_tables.table(str(source_path), ack=False) as source:
+        stats = write_channel_slice(
+            source, tmp_path / "partition_0.ms", ChannelRange(0, 2, 5), chunk_rows=3
+        )
+        expected_data = source.getcol("DATA")[:, 2:5]
+        expected_flag = source.getcol("FLAG")[:, 2:5]
+
+    with casacore_tables.table(str(tmp_path / "partition_0.ms"), ack=False) as out:
+        assert out.nrows() == 10
+        assert out.getcol("DATA").shape == (10, 3, NUM_CORRELATIONS)
+        assert out.getcol("FLAG").shape == (10, 3, NUM_CORRELATIONS)
+        np.testing.assert_array_equal(out.getcol("DATA"), expected_data)
+        np.testing.assert_array_equal(out.getcol("FLAG"), expected_flag)
+    assert stats.rows == 10
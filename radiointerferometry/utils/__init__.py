@@ -3,7 +3,11 @@ from .utils import (
     dict_to_parset,
     setup_logging,
     get_memory_limit_cgroupv2,
+    get_memory_available_cgroupv2,
     get_cpu_limit_cgroupv2,
+    get_available_cpus,
     detect_runtime_environment,
     get_executor_id_lithops,
 )
+from .scratch import ScratchManager, ScratchPlacement, MEMORY_TIER, DISK_TIER
+from .disk_budget import DiskBudget, DiskBudgetExceededError
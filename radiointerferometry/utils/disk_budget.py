@@ -0,0 +1,117 @@
+import os
+import shutil
+import logging
+import itertools
+import threading
+
+from pathlib import Path
+
+from .utils import get_dir_size
+
+
+class DiskBudgetExceededError(OSError):
+    """Work that can never fit in the worker's ephemeral storage."""
+
+
+class DiskBudget:
+    """Accountant of a worker's ephemeral storage.
+
+    Work reserves its estimated footprint before it starts; a reservation
+    that does not fit waits until earlier ones are released, and one larger
+    than the whole budget is refused up front instead of failing halfway
+    through a download. Staged paths are tracked with the number of
+    consumers still to read them (e.g. DP3 for an input MS, the upload for
+    an output MS) and deleted as soon as the last one is done.
+    """
+
+    def __init__(self, root: Path, limit_bytes: int = None):
+        self.root = Path(root)
+        if limit_bytes is None:
+            limit_bytes = shutil.disk_usage(self.root).free
+        self.limit_bytes = limit_bytes
+        self._reservations = {}
+        self._consumers = {}
+        self._tokens = itertools.count()
+        self._condition = threading.Condition()
+        self.peak_reserved_bytes = 0
+        self.freed_bytes = 0
+        self.refused = 0
+
+    @property
+    def reserved_bytes(self) -> int:
+        return sum(size for _, size in self._reservations.values())
+
+    def reserve(self, size_bytes: int, label: str = None) -> int:
+        """Blocks until size_bytes fit in the budget and returns a token for release."""
+        if size_bytes > self.limit_bytes:
+            with self._condition:
+                self.refused += 1
+            raise DiskBudgetExceededError(
+                f"{label} needs {size_bytes / 1024**2:.2f} MB of scratch but the "
+                f"worker has {self.limit_bytes / 1024**2:.2f} MB under {self.root}"
+            )
+        with self._condition:
+            if self.reserved_bytes + size_bytes > self.limit_bytes:
+                logging.info(
+                    f"Waiting for {size_bytes / 1024**2:.2f} MB of scratch for {label}"
+                )
+            while self.reserved_bytes + size_bytes > self.limit_bytes:
+                self._condition.wait()
+            token = next(self._tokens)
+            self._reservations[token] = (label, size_bytes)
+            self.peak_reserved_bytes = max(
+                self.peak_reserved_bytes, self.reserved_bytes
+            )
+        return token
+
+    def release(self, token: int):
+        with self._condition:
+            self._reservations.pop(token, None)
+            self._condition.notify_all()
+
+    def track(self, path, consumers: int = 1):
+        """Registers consumers that still have to read path before it can go."""
+        with self._condition:
+            path = str(path)
+            self._consumers[path] = self._consumers.get(path, 0) + consumers
+
+    def consumed(self, path):
+        """One consumer of path is done; the last one deletes it.
+
+        Untracked paths count as having a single consumer.
+        """
+        path = str(path)
+        with self._condition:
+            remaining = self._consumers.pop(path, 1) - 1
+            if remaining > 0:
+                self._consumers[path] = remaining
+                return
+        self._delete(Path(path))
+
+    def discard(self, path):
+        """Deletes path whatever consumers it still has, e.g. after a failure."""
+        with self._condition:
+            self._consumers.pop(str(path), None)
+        self._delete(Path(path))
+
+    def counters(self) -> dict:
+        with self._condition:
+            return {
+                "disk_limit_bytes": self.limit_bytes,
+                "disk_peak_reserved_bytes": self.peak_reserved_bytes,
+                "disk_freed_bytes": self.freed_bytes,
+                "disk_refused": self.refused,
+            }
+
+    def _delete(self, path: Path):
+        if path.is_dir() and not path.is_symlink():
+            size = get_dir_size(path)
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists() or path.is_symlink():
+            size = path.lstat().st_size
+            os.unlink(path)
+        else:
+            return
+        with self._condition:
+            self.freed_bytes += size
+        logging.debug(f"Freed {size / 1024**2:.2f} MB of scratch at {path}")
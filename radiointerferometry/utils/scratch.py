@@ -0,0 +1,135 @@
+import os
+import uuid
+import shutil
+import logging
+import threading
+import psutil
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from .utils import get_memory_limit_cgroupv2, get_memory_available_cgroupv2
+
+MEMORY_TIER = "memory"
+DISK_TIER = "disk"
+DEFAULT_MEMORY_DIR = "/dev/shm"
+# tmpfs pages are charged to the cgroup, so DP3 keeps the rest of the limit.
+DEFAULT_MEMORY_FRACTION = 0.5
+
+
+@dataclass
+class ScratchPlacement:
+    """Where the inputs and intermediates of one partition are staged."""
+
+    tier: str
+    path: Path
+    size_bytes: int
+    label: str = None
+
+    def to_dict(self):
+        return {
+            "tier": self.tier,
+            "path": str(self.path),
+            "size_bytes": self.size_bytes,
+            "label": self.label,
+        }
+
+
+class ScratchManager:
+    """Places each partition in memory-backed scratch when it fits, else on disk.
+
+    The memory tier is a tmpfs (/dev/shm by default). A partition goes there
+    when its estimated footprint, added to what the tier already holds,
+    stays within memory_fraction of the cgroup memory limit (of physical
+    memory without a limit), within what the cgroup can still allocate and
+    within the free space of the tmpfs. Every placement gets its own
+    directory under its tier, removed on release, so partitions with the
+    same inputs can be staged side by side.
+    """
+
+    def __init__(
+        self,
+        disk_dir: Path,
+        memory_dir: Optional[Path] = Path(DEFAULT_MEMORY_DIR),
+        memory_fraction: float = DEFAULT_MEMORY_FRACTION,
+    ):
+        self.disk_dir = Path(disk_dir)
+        self.memory_fraction = memory_fraction
+        self.placements: List[ScratchPlacement] = []
+        self._memory_root = None
+        if memory_dir is not None:
+            root = Path(memory_dir) / "radiointerferometry"
+            try:
+                os.makedirs(root, exist_ok=True)
+                if os.access(root, os.W_OK):
+                    self._memory_root = root
+            except OSError as e:
+                logging.info(f"No memory scratch tier at {memory_dir}: {e}")
+        self._in_memory = 0
+        self._lock = threading.Lock()
+
+    def memory_budget(self) -> int:
+        """Bytes the memory tier may hold in total."""
+        memory_limit = get_memory_limit_cgroupv2()
+        if isinstance(memory_limit, float):
+            limit = memory_limit * 1024**3
+        else:
+            limit = psutil.virtual_memory().total
+        return int(limit * self.memory_fraction)
+
+    def fits_in_memory(self, size_bytes: int) -> bool:
+        if self._memory_root is None:
+            return False
+        if self._in_memory + size_bytes > self.memory_budget():
+            return False
+        available = get_memory_available_cgroupv2()
+        if available is not None and size_bytes > available * self.memory_fraction:
+            return False
+        return size_bytes <= shutil.disk_usage(self._memory_root).free
+
+    def place(self, size_bytes: int, label: str = None) -> ScratchPlacement:
+        with self._lock:
+            if self.fits_in_memory(size_bytes):
+                path = new_scratch_dir(self._memory_root)
+                self._in_memory += size_bytes
+                placement = ScratchPlacement(MEMORY_TIER, path, size_bytes, label)
+            else:
+                path = new_scratch_dir(self.disk_dir / "scratch")
+                placement = ScratchPlacement(DISK_TIER, path, size_bytes, label)
+            self.placements.append(placement)
+        logging.info(
+            f"Staging {label} ({size_bytes / 1024**2:.2f} MB) in {placement.tier} "
+            f"scratch at {placement.path}"
+        )
+        return placement
+
+    def place_on_disk(self, label: str = None) -> ScratchPlacement:
+        """Placement for a partition of unknown size."""
+        path = new_scratch_dir(self.disk_dir / "scratch")
+        placement = ScratchPlacement(DISK_TIER, path, 0, label)
+        with self._lock:
+            self.placements.append(placement)
+        return placement
+
+    def release(self, placement: ScratchPlacement):
+        shutil.rmtree(placement.path, ignore_errors=True)
+        if placement.tier == MEMORY_TIER:
+            with self._lock:
+                self._in_memory -= placement.size_bytes
+
+    def summary(self) -> dict:
+        """Decisions and bytes per tier, as recorded in the worker's profiler."""
+        bytes_per_tier = {MEMORY_TIER: 0, DISK_TIER: 0}
+        for placement in self.placements:
+            bytes_per_tier[placement.tier] += placement.size_bytes
+        return {
+            "bytes_per_tier": bytes_per_tier,
+            "placements": [placement.to_dict() for placement in self.placements],
+        }
+
+
+def new_scratch_dir(root: Path) -> Path:
+    path = root / uuid.uuid4().hex[:12]
+    os.makedirs(path)
+    return path
@@ -1,4 +1,5 @@
 import os
+import math
 import subprocess as sp
 from pathlib import PosixPath
 import logging
@@ -49,6 +50,20 @@ def get_memory_limit_cgroupv2():
         return str(e)
 
 
+def get_memory_available_cgroupv2():
+    """Bytes the cgroup may still allocate, or None without a memory limit."""
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit == "max":
+            return None
+        with open("/sys/fs/cgroup/memory.current") as f:
+            current = int(f.read().strip())
+        return max(0, int(limit) - current)
+    except (OSError, ValueError):
+        return None
+
+
 def get_cpu_limit_cgroupv2():
     try:
         with open("/sys/fs/cgroup/cpu.max") as f:
@@ -66,6 +81,15 @@ def get_cpu_limit_cgroupv2():
         return str(e)
 
 
+def get_available_cpus():
+    """Number of CPUs this process may use, honouring the cgroup v2 quota."""
+    cpus = len(os.sched_getaffinity(0))
+    cpu_limit = get_cpu_limit_cgroupv2()
+    if isinstance(cpu_limit, float):
+        cpus = min(cpus, max(1, math.ceil(cpu_limit)))
+    return cpus
+
+
 def get_dir_size(start_path="."):
     total_size = 0
     for dirpath, dirnames, filenames in os.walk(start_path):